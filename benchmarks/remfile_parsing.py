@@ -0,0 +1,56 @@
+'''Сравнивает разбор файла Remind в текущем процессе и в пуле процессов
+
+Запуск: `PYTHONPATH=. python benchmarks/remfile_parsing.py [--workers=N] [КОЛИЧЕСТВО]`
+в корне проекта.  Создаётся временный файл с заданным количеством различных
+строк C{REM} нескольких типичных видов, который затем читается объектом
+класса L{RemFileLoader<rempy.RemFile.RemFileLoader>} с разбором в текущем
+процессе (с кэшем разбора и без него) и в пуле из C{N} процессов (по
+умолчанию по количеству процессоров).
+'''
+
+import getopt
+import os
+import sys
+import tempfile
+import time
+
+from rempy.RemFile import RemFileLoader
+from rempy.StringParser import ParseCache
+
+
+TEMPLATES = [
+  'REM %(day)d MSG Monthly %(i)d',
+  'REM Mon Wed Fri MSG Weekdays %(i)d',
+  'REM June %(day)d +3 MSG Yearly %(i)d',
+  'REM Sat %(day)d -1 MSG Saturday on a day %(i)d',
+  'REM %(day)d AT 10:00 +30 *10 MSG Timed %(i)d',
+]
+
+
+def measure(filename, loader):
+  start = time.perf_counter()
+  loader.load(filename)
+  return time.perf_counter() - start
+
+
+def main(args=sys.argv):
+  options, args = getopt.gnu_getopt(args[1:], '', ['workers='])
+  count = int(args[0]) if len(args) > 0 else 50000
+  workers = int(dict(options).get('--workers', os.cpu_count() or 1))
+  with tempfile.TemporaryDirectory() as dirname:
+    filename = os.path.join(dirname, 'reminders.rem')
+    with open(filename, 'w', encoding='utf-8') as f:
+      f.write('OMIT Sun\n')
+      for i in range(count):
+        f.write(TEMPLATES[i % len(TEMPLATES)] % {'i': i, 'day': i % 28 + 1} + '\n')
+    print('%d lines, %d CPUs' % (count, os.cpu_count() or 1))
+    print('serial: %.2f s' % measure(filename, RemFileLoader(maxWorkers=1)))
+    print('serial, parse cache: %.2f s' %
+      measure(filename, RemFileLoader(maxWorkers=1, parseCache=ParseCache())))
+    parallel = RemFileLoader(maxWorkers=workers)
+    parallel.parallelThreshold = 0
+    print('%d processes: %.2f s' % (workers, measure(filename, parallel)))
+
+
+if __name__ == '__main__':
+  main()
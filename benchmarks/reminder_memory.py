@@ -0,0 +1,89 @@
+'''Измеряет объём памяти, занимаемой загруженными напоминалками
+
+Запуск: `PYTHONPATH=. python benchmarks/reminder_memory.py [--against=РЕВИЗИЯ] [КОЛИЧЕСТВО]`
+в корне проекта.  Напоминалки создаются из строк нескольких типичных видов, а
+память измеряется модулем C{tracemalloc} после того, как все временные
+объекты (парсеры и т.п.) освобождены.
+
+С опцией C{--against} то же измерение выполняется ещё и для пакета rempy из
+заданной ревизии git (пакет извлекается командой C{git archive} во временный
+каталог), и выводятся оба результата.  Для 100000 напоминалок на Python 3.11
+ревизия до перехода на C{__slots__} и битовую маску дней недели занимала
+85.8 MiB (899 байт на напоминалку), текущая -- 36.9 MiB (387 байт).
+'''
+
+import gc
+import getopt
+import io
+import os
+import subprocess
+import sys
+import tarfile
+import tempfile
+import tracemalloc
+
+
+TEMPLATES = [
+  'REM %(day)d MSG Monthly %(i)d',
+  'REM Mon Wed Fri MSG Weekdays %(i)d',
+  'REM June %(day)d +3 MSG Yearly %(i)d',
+  'REM 2010-03-%(day)02d MSG Fixed %(i)d',
+  'REM Sat %(day)d MSG Saturday on a day %(i)d',
+]
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load(count):
+  from rempy.Reminder import ShortcutReminder
+  from rempy.Runner import Runner, RunnerMode
+  runner = Runner()
+  for i in range(count):
+    string = TEMPLATES[i % len(TEMPLATES)] % {'i': i, 'day': i % 28 + 1}
+    reminder = ShortcutReminder.fromString(string)
+    # conditions are built and memoized on the first run, so include them
+    reminder.condition(RunnerMode.REMIND)
+    runner.add(reminder)
+  return runner
+
+
+def measure(count):
+  # import everything first, so that only the reminders are measured
+  load(1)
+  gc.collect()
+  tracemalloc.start()
+  before = tracemalloc.get_traced_memory()[0]
+  runner = load(count)
+  gc.collect()
+  after = tracemalloc.get_traced_memory()[0]
+  tracemalloc.stop()
+  return '%d reminders: %.1f MiB, %.0f bytes per reminder' % (
+    len(runner.reminders), (after - before) / 2**20, (after - before) / count)
+
+
+def measureIn(path, count):
+  '''Выполнить измерение в отдельном процессе для пакета rempy из каталога C{path}'''
+  env = dict(os.environ, PYTHONPATH=path)
+  result = subprocess.run([sys.executable, os.path.abspath(__file__), str(count)],
+    env=env, stdout=subprocess.PIPE, check=True, universal_newlines=True)
+  return result.stdout.strip()
+
+
+def main(args=sys.argv):
+  options, args = getopt.gnu_getopt(args[1:], '', ['against='])
+  count = int(args[0]) if len(args) > 0 else 100000
+  against = dict(options).get('--against')
+  if against is None:
+    print(measure(count))
+    return
+  with tempfile.TemporaryDirectory() as dirname:
+    archive = subprocess.run(['git', 'archive', against, 'rempy'], cwd=ROOT,
+      stdout=subprocess.PIPE, check=True).stdout
+    with tarfile.open(fileobj=io.BytesIO(archive)) as tar:
+      tar.extractall(dirname)
+    print('%s: %s' % (against, measureIn(dirname, count)))
+  print('current: %s' % measureIn(ROOT, count))
+
+
+if __name__ == '__main__':
+  main()
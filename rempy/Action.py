@@ -1,10 +1,62 @@
-'''Содержит иерархию классов L{Action}'''
+'''Содержит иерархию классов L{Action} и функции L{outputStream},
+L{outputTo} и L{captureOutput}'''
+
+import contextlib
+import contextvars
+import io
+import sys
+
+
+_output = contextvars.ContextVar('rempy.Action.output', default=None)
+
+
+def outputStream():
+  '''Получить поток, в который действия выводят текст.  По умолчанию это
+  C{sys.stdout}; поток для текущего контекста задаётся функцией L{outputTo}.
+  Действия, которые печатают прямо в C{sys.stdout} или C{sys.stderr}, при
+  выполнении в пуле потоков (см. L{Runner<Runner.Runner>}) могут выводить
+  текст не по порядку.
+
+  @returns: объект файла
+  '''
+  stream = _output.get()
+  return stream if stream is not None else sys.stdout
+
+
+@contextlib.contextmanager
+def outputTo(stream):
+  '''Контекстный менеджер, направляющий вывод действий (см. L{outputStream})
+  в заданный поток.  В отличие от C{contextlib.redirect_stdout}, действует
+  только в текущем контексте (потоке выполнения или задаче asyncio), а не во
+  всём процессе.
+
+  @param stream: объект файла
+  '''
+  token = _output.set(stream)
+  try:
+    yield stream
+  finally:
+    _output.reset(token)
+
+
+def captureOutput(func, *args):
+  '''Вызвать функцию, накапливая текст, который выводят выполняемые ею
+  действия (см. L{outputStream})
+
+  @returns: строка вывода
+  '''
+  with outputTo(io.StringIO()) as output:
+    func(*args)
+  return output.getvalue()
+
 
 class Action:
   '''Базовый класс для классов, реализующих действия, которые выполняются,
   когда для напоминалки находится подходящая дата.  Фактически, просто
   callable, а класс объявляется просто для удобства документирования.'''
 
+  __slots__ = ()
+
   def __call__(self, date):
     '''Выполнить связанное с объектом действие для заданной даты
 
@@ -13,9 +65,26 @@ class Action:
     pass
 
 
+class AsyncAction(Action):
+  '''Базовый класс для действий, выполняющих ввод-вывод (например, отправку
+  уведомлений).  В отличие от L{Action}, вызов объекта возвращает awaitable,
+  поэтому L{AsyncRunner<Runner.AsyncRunner>} может выполнять несколько таких
+  действий одновременно.  При запуске обычным объектом класса
+  L{Runner<Runner.Runner>} действие не выполняется.'''
+
+  async def __call__(self, date):
+    '''Выполнить связанное с объектом действие для заданной даты
+
+    @param date: объект класса C{datetime.date}
+    '''
+    pass
+
+
 class MessagePrinter(Action):
   '''Выполняет вывод заданного сообщения'''
 
+  __slots__ = ('message',)
+
   def __init__(self, message):
     '''Конструктор
 
@@ -25,4 +94,4 @@ class MessagePrinter(Action):
     self.message = message
 
   def __call__(self, date):
-    print(self.message)
+    print(self.message, file=outputStream())
@@ -0,0 +1,316 @@
+'''Содержит класс L{Checkpoint}, позволяющий при очередном запуске выводить
+только события, которые появились с момента предыдущего запуска
+
+При запуске из командной строки запускает присутствующие в модуле unit-тесты.'''
+
+import collections
+import datetime
+import hashlib
+import itertools
+import json
+import os
+import tempfile
+import unittest
+
+from .DateCondition import DateCondition, LimitedDateCondition
+from .Reminder import Reminder, ShortcutReminder
+from .Runner import Runner, RunnerMode
+from .utils.files import atomicWrite
+
+
+def reminderDigest(reminder):
+  '''Получить хэш «отпечатка» напоминалки
+
+  @param reminder: объект класса L{Reminder<Reminder.Reminder>}
+  @returns: строка хэша или C{None}, если «отпечаток» напоминалки неизвестен
+  @see: L{Reminder.fingerprint<Reminder.Reminder.fingerprint>}
+  '''
+  fingerprint = reminder.fingerprint()
+  if fingerprint is None:
+    return None
+  return hashlib.sha1(fingerprint.encode('utf-8')).hexdigest()
+
+
+class Checkpoint:
+  '''Состояние, сохраняемое между запусками: диапазон дат и режим последнего
+  запуска, а также хэши «отпечатков» всех напоминалок.
+
+  По этому состоянию можно построить «разностный» запуск: для напоминалок, не
+  изменившихся с момента предыдущего запуска, выводятся только события, которые
+  тогда ещё не попали в диапазон дат, а для новых и изменившихся напоминалок
+  выполняется полный запуск.  Если сопоставить напоминалки не удаётся (у
+  какой-то из них неизвестен «отпечаток», изменился режим запуска или начальная
+  дата сдвинулась в прошлое), выполняется полный запуск всех напоминалок.
+
+  @ivar fromDate: начальная дата последнего запуска
+  @ivar toDate: конечная дата последнего запуска
+  @ivar mode: режим последнего запуска (константа из «перечисления»
+    L{RunnerMode<Runner.RunnerMode>})
+  @ivar digests: список хэшей «отпечатков» напоминалок или C{None}, если
+    «отпечаток» хотя бы одной напоминалки был неизвестен
+  '''
+
+  VERSION = 1
+
+  def __init__(self, fromDate, toDate, mode, digests):
+    super(Checkpoint, self).__init__()
+    self.fromDate = fromDate
+    self.toDate = toDate
+    self.mode = mode
+    self.digests = digests
+
+  @staticmethod
+  def fromReminders(reminders, fromDate, toDate, mode):
+    '''Построить состояние для запуска заданных напоминалок
+
+    @param reminders: Iterable по объектам класса L{Reminder<Reminder.Reminder>}
+    @param fromDate: начальная дата запуска
+    @param toDate: конечная дата запуска
+    @param mode: режим запуска
+    @returns: объект класса L{Checkpoint}
+    '''
+    digests = [reminderDigest(reminder) for reminder in reminders]
+    if None in digests:
+      digests = None
+    return Checkpoint(fromDate, toDate, mode, digests)
+
+  def following(self, reminders, fromDate, toDate, mode):
+    '''Построить состояние для сохранения после запуска, выполненного вслед
+    за запуском, которому соответствует это состояние.  Если набор
+    напоминалок и режим не изменились, конечная дата не сдвигается назад:
+    события до прежней конечной даты уже были выведены, и запуск на более
+    короткий диапазон не должен приводить к их повторному выводу.
+
+    @param reminders: Iterable по объектам класса L{Reminder<Reminder.Reminder>}
+    @param fromDate: начальная дата запуска
+    @param toDate: конечная дата запуска
+    @param mode: режим запуска
+    @returns: объект класса L{Checkpoint}
+    '''
+    checkpoint = Checkpoint.fromReminders(reminders, fromDate, toDate, mode)
+    fingerprint = checkpoint.fingerprint()
+    if fingerprint is not None and fingerprint == self.fingerprint() and mode == self.mode:
+      checkpoint.toDate = max(toDate, self.toDate)
+    return checkpoint
+
+  def fingerprint(self):
+    '''Получить хэш набора напоминалок, не зависящий от их порядка
+
+    @returns: строка хэша или C{None}, если набор сопоставить невозможно
+    '''
+    if self.digests is None:
+      return None
+    return hashlib.sha1(''.join(sorted(self.digests)).encode('ascii')).hexdigest()
+
+  @staticmethod
+  def load(filename):
+    '''Прочитать состояние из файла
+
+    @param filename: имя файла
+    @returns: объект класса L{Checkpoint} или C{None}, если файл отсутствует
+      или его содержимое невозможно разобрать
+    '''
+    try:
+      with open(filename, encoding='utf-8') as f:
+        data = json.load(f)
+      if data['version'] != Checkpoint.VERSION:
+        return None
+      checkpoint = Checkpoint(
+        datetime.date.fromisoformat(data['from']),
+        datetime.date.fromisoformat(data['to']),
+        data['mode'], data['digests'])
+      if data['fingerprint'] != checkpoint.fingerprint():
+        return None
+      return checkpoint
+    except (OSError, ValueError, KeyError, TypeError):
+      return None
+
+  def save(self, filename):
+    '''Атомарно записать состояние в файл
+
+    @param filename: имя файла
+    '''
+    data = {
+      'version': self.VERSION,
+      'from': self.fromDate.isoformat(),
+      'to': self.toDate.isoformat(),
+      'mode': self.mode,
+      'fingerprint': self.fingerprint(),
+      'digests': self.digests,
+    }
+    with atomicWrite(filename, 'w', encoding='utf-8') as f:
+      json.dump(data, f)
+
+  def deltaReminders(self, reminders, fromDate, toDate, mode):
+    '''Построить список напоминалок для «разностного» запуска
+
+    @param reminders: список объектов класса L{Reminder<Reminder.Reminder>}
+    @param fromDate: начальная дата нового запуска
+    @param toDate: конечная дата нового запуска
+    @param mode: режим нового запуска
+    @returns: Список объектов класса L{Reminder<Reminder.Reminder>}, которые
+      надо добавить в объект класса L{Runner<Runner.Runner>} вместо исходных
+      напоминалок, или C{None}, если напоминалки сопоставить не удалось и
+      требуется полный запуск.
+    '''
+    if self.digests is None or mode != self.mode or fromDate < self.fromDate:
+      return None
+    digests = [reminderDigest(reminder) for reminder in reminders]
+    if None in digests:
+      return None
+
+    known = collections.Counter(self.digests)
+    ret = []
+    for reminder, digest in zip(reminders, digests):
+      if known[digest] > 0:
+        known[digest] -= 1
+        minDate = self.toDate + datetime.timedelta(days=1)
+        if mode == RunnerMode.REMIND:
+          minDate += datetime.timedelta(days=reminder.advanceWarningValue())
+        reminder = _DeltaReminder(reminder, minDate)
+      ret.append(reminder)
+    return ret
+
+
+  class Test(unittest.TestCase):
+    '''Набор unit-тестов'''
+
+    def setUp(self):
+      self.reminders = [
+        ShortcutReminder.fromString('REM 5 +2 MSG Fifth'),
+        ShortcutReminder.fromString('REM Mon MSG Monday'),
+      ]
+      self.checkpoint = Checkpoint.fromReminders(self.reminders,
+        datetime.date(2010, 3, 1), datetime.date(2010, 3, 4), RunnerMode.REMIND)
+
+    def __events(self, reminders, fromDate, toDate):
+      events = []
+      class CollectingRunner(Runner):
+        def _executeReminder(self, reminder, date):
+          events.append(date)
+      runner = CollectingRunner()
+      for reminder in reminders:
+        runner.add(reminder)
+      runner.run(fromDate, toDate, RunnerMode.REMIND)
+      return events
+
+    def test_unchanged(self):
+      fromDate = toDate = datetime.date(2010, 3, 5)
+      reminders = self.checkpoint.deltaReminders(self.reminders, fromDate, toDate,
+        RunnerMode.REMIND)
+      # "Fifth" on 2010-03-05 was reported in advance by the previous run
+      self.assertEqual(self.__events(reminders, fromDate, toDate), [])
+
+    def test_changed(self):
+      fromDate = datetime.date(2010, 3, 5)
+      toDate = datetime.date(2010, 3, 8)
+      reminders = self.checkpoint.deltaReminders(
+        [self.reminders[0], ShortcutReminder.fromString('REM Mon MSG Changed')],
+        fromDate, toDate, RunnerMode.REMIND)
+      self.assertEqual(self.__events(reminders, fromDate, toDate), [
+        datetime.date(2010, 3, 8),
+      ])
+
+    def test_unreconcilable(self):
+      reminder = ShortcutReminder.fromString('REM Mon MSG Satisfy', satisfy=bool)
+      date = datetime.date(2010, 3, 5)
+      self.assertEqual(self.checkpoint.deltaReminders([reminder], date, date,
+        RunnerMode.REMIND), None)
+      self.assertEqual(self.checkpoint.deltaReminders(self.reminders,
+        datetime.date(2010, 2, 1), date, RunnerMode.REMIND), None)
+
+    def test_saveLoad(self):
+      with tempfile.TemporaryDirectory() as dirname:
+        filename = os.path.join(dirname, 'checkpoint')
+        self.checkpoint.save(filename)
+        checkpoint = Checkpoint.load(filename)
+      self.assertEqual(checkpoint.toDate, self.checkpoint.toDate)
+      self.assertEqual(checkpoint.digests, self.checkpoint.digests)
+
+    def test_following(self):
+      date = datetime.date(2010, 3, 2)
+      # a shorter run doesn't roll the end date back
+      checkpoint = self.checkpoint.following(self.reminders, date, date, RunnerMode.REMIND)
+      self.assertEqual((checkpoint.fromDate, checkpoint.toDate), (date, datetime.date(2010, 3, 4)))
+      checkpoint = self.checkpoint.following(self.reminders, date, datetime.date(2010, 3, 9),
+        RunnerMode.REMIND)
+      self.assertEqual(checkpoint.toDate, datetime.date(2010, 3, 9))
+      # events of a new reminder after the end of the run weren't reported
+      reminders = self.reminders + [ShortcutReminder.fromString('REM 3 MSG New')]
+      checkpoint = self.checkpoint.following(reminders, date, date, RunnerMode.REMIND)
+      self.assertEqual(checkpoint.toDate, date)
+
+    def test_deltaCondition(self):
+      reminders = self.checkpoint.deltaReminders(self.reminders,
+        datetime.date(2010, 3, 5), datetime.date(2010, 3, 31), RunnerMode.REMIND)
+      cond = reminders[1].condition(RunnerMode.REMIND)
+      # the bound is visible to the analyses, and the scan starts at it
+      self.assertFalse(cond.reachability().intersects(datetime.date(2010, 3, 1), datetime.date(2010, 3, 4)))
+      self.assertIsNotNone(cond.compile())
+      self.assertEqual(next(iter(cond.scan(datetime.date(2010, 1, 1)))), datetime.date(2010, 3, 8))
+      # a start-dependent condition is still scanned from the first date of the run
+      reminder = ShortcutReminder.fromString('REM 2010-03-01 *2 MSG Every other day')
+      delta = Checkpoint.fromReminders([reminder], datetime.date(2010, 3, 1),
+        datetime.date(2010, 3, 4), RunnerMode.EVENTS).deltaReminders([reminder],
+        datetime.date(2010, 3, 2), datetime.date(2010, 3, 9), RunnerMode.EVENTS)
+      self.assertEqual(self.__eventsIn(delta, datetime.date(2010, 3, 2), datetime.date(2010, 3, 9)),
+        [datetime.date(2010, 3, 5), datetime.date(2010, 3, 7), datetime.date(2010, 3, 9)])
+
+    def __eventsIn(self, reminders, fromDate, toDate):
+      runner = Runner()
+      for reminder in reminders:
+        runner.add(reminder)
+      return [date for date, _ in runner.iterEvents(fromDate, toDate, RunnerMode.EVENTS)]
+
+
+class _DeltaReminder(Reminder):
+  '''Класс-декоратор, пропускающий события раньше заданной даты'''
+
+  def __init__(self, reminder, minDate):
+    super(_DeltaReminder, self).__init__()
+    self.reminder = reminder
+    self.minDate = minDate
+
+  def _makeCondition(self, runnerMode):
+    cond = self.reminder.condition(runnerMode)
+    if cond._startIndependent:
+      # the scan starts right at minDate, and the bound is seen by
+      # reachability() and compile()
+      return LimitedDateCondition(cond, from_=self.minDate)
+    return _SkipBeforeDateCondition(cond, self.minDate)
+
+  def advanceWarningValue(self):
+    return self.reminder.advanceWarningValue()
+
+  def execute(self, date):
+    return self.reminder.execute(date)
+
+  def fingerprint(self):
+    return self.reminder.fingerprint()
+
+
+class _SkipBeforeDateCondition(DateCondition):
+  '''Класс-декоратор, пропускающий даты раньше заданной.  В отличие от
+  L{LimitedDateCondition<DateCondition.LimitedDateCondition>}, поиск
+  начинается с исходной начальной даты, поэтому класс подходит для условий,
+  выдаваемые даты которых зависят от начальной даты.'''
+
+  __slots__ = ('cond', 'minDate')
+
+  def __init__(self, cond, minDate):
+    super(_SkipBeforeDateCondition, self).__init__()
+    self.cond = cond
+    self.minDate = minDate
+
+  def _reachability(self):
+    return self.cond.reachability().restricted(from_=self.minDate)
+
+  def scan(self, startDate):
+    return itertools.dropwhile(lambda date: date < self.minDate, self.cond.scan(startDate))
+
+  def scanBack(self, startDate):
+    return itertools.takewhile(lambda date: date >= self.minDate, self.cond.scanBack(startDate))
+
+
+if __name__ == '__main__':
+  unittest.main()
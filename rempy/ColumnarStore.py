@@ -0,0 +1,489 @@
+'''Содержит класс L{ColumnarStore}, хранящий простые напоминалки по столбцам
+
+При запуске из командной строки запускает присутствующие в модуле unit-тесты.'''
+
+from array import array
+import datetime
+import heapq
+import itertools
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import unittest
+
+from .Action import MessagePrinter
+from .DateCondition import CombinedDateCondition, LimitedDateCondition, \
+  NthWeekdayDateCondition, RepeatDateCondition, ShiftDateCondition, SimpleDateCondition
+from .Reminder import BasicReminder, Reminder, ShortcutReminder
+from .utils import FormatError
+from .utils.files import atomicWrite
+
+
+# (name, typecode); the order defines the layout of the file
+_COLUMNS = (
+  ('year', 'h'),          # 0 if not set
+  ('month', 'b'),         # 0 if not set
+  ('day', 'b'),           # 0 if not set
+  ('weekdayMask', 'b'),   # -1 if not set
+  ('flags', 'B'),         # see _NEXT_WEEKDAY and _NONEXISTING_SHIFT
+  ('shift', 'i'),
+  ('repeat', 'i'),        # 0 if not set
+  ('fromOrdinal', 'i'),   # 0 if not set
+  ('untilOrdinal', 'i'),  # 0 if not set
+  ('adv', 'i'),
+  ('messageOffset', 'I'),
+  ('messageLength', 'I'),
+)
+_COLUMN_NAMES = tuple(name for name, _ in _COLUMNS)
+
+# the row is a NthWeekdayDateCondition (this is how "REM Mon 1" is parsed)
+_NEXT_WEEKDAY = 1
+# nonexistingDaysHandling is stored in bits 1-2
+_NONEXISTING_SHIFT = 1
+
+_MAGIC = b'RMPYCOLS'
+_VERSION = 1
+_HEADER = struct.Struct('<8sHBBII')
+_ALIGNMENT = 8
+
+
+class ColumnarStore:
+  '''Хранилище простых напоминалок, упакованных в типизированные массивы
+  (по одному массиву на каждый параметр напоминалки).
+
+  В хранилище можно поместить напоминалку класса
+  L{BasicReminder<Reminder.BasicReminder>} (или
+  L{ShortcutReminder<Reminder.ShortcutReminder>}), которая выводит сообщение
+  (L{MessagePrinter<Action.MessagePrinter>}) и условие которой имеет вид,
+  порождаемый парсером L{DateConditionParser<StringParser.DateConditionParser>}
+  без функции C{satisfy}: L{SimpleDateCondition<DateCondition.SimpleDateCondition>}
+  или L{NthWeekdayDateCondition<DateCondition.NthWeekdayDateCondition>} с
+  необязательными сдвигом, повтором в днях и ограничениями C{FROM}/C{UNTIL}.
+  Остальные напоминалки хранятся как обычные объекты.
+
+  События вычисляются сразу для групп напоминалок с одинаковыми условиями:
+  для каждой группы условие строится и просматривается один раз, после чего
+  к датам применяются ограничения отдельных напоминалок.
+
+  Хранилище можно сохранить в файл методом L{save} и затем открыть методом
+  L{load}.  При открытии файл отображается в память, и массивы используют
+  его содержимое без копирования; такое хранилище доступно только для
+  чтения.
+  '''
+
+  def __init__(self):
+    super(ColumnarStore, self).__init__()
+    for name, typecode in _COLUMNS:
+      setattr(self, name, array(typecode))
+    self.messages = bytearray()
+    self.readOnly = False
+    self._groups = None
+    self._conditions = {}
+    self._mmap = None
+
+  def __len__(self):
+    return len(self.year)
+
+  @staticmethod
+  def fromReminders(reminders):
+    '''Поместить в новое хранилище все подходящие напоминалки
+
+    @param reminders: Iterable по объектам класса L{Reminder<Reminder.Reminder>}
+    @returns: кортеж (объект класса L{ColumnarStore}, список напоминалок,
+      которые поместить в хранилище не удалось)
+    '''
+    store = ColumnarStore()
+    residual = [reminder for reminder in reminders if not store.add(reminder)]
+    return store, residual
+
+  def add(self, reminder):
+    '''Поместить напоминалку в хранилище, если она подходит
+
+    @param reminder: объект класса L{Reminder<Reminder.Reminder>}
+    @returns: C{True}, если напоминалка помещена в хранилище, C{False}, если
+      она не подходит
+    '''
+    if self.readOnly:
+      raise TypeError('Store loaded from a file is read-only')
+    row = _unpack(reminder)
+    if row is None:
+      return False
+    message = row.pop().encode('utf-8')
+    row.extend((len(self.messages), len(message)))
+    self.messages.extend(message)
+    for name, value in zip(_COLUMN_NAMES, row):
+      getattr(self, name).append(value)
+    self._groups = None
+    return True
+
+  def message(self, i):
+    '''Получить сообщение напоминалки
+
+    @param i: номер напоминалки в хранилище
+    @returns: строка сообщения
+    '''
+    offset = self.messageOffset[i]
+    return bytes(self.messages[offset:offset + self.messageLength[i]]).decode('utf-8')
+
+  def fingerprint(self, i):
+    '''Получить «отпечаток» напоминалки: значения столбцов строки и
+    сообщение
+
+    @param i: номер напоминалки в хранилище
+    @returns: строка
+    @see: L{Reminder.fingerprint<Reminder.Reminder.fingerprint>}
+    '''
+    row = tuple(getattr(self, name)[i] for name in _COLUMN_NAMES
+      if name not in ('messageOffset', 'messageLength'))
+    return repr(('ColumnarStore', row, self.message(i)))
+
+  def reminder(self, i):
+    '''Получить объект напоминалки, хранящейся в хранилище
+
+    @param i: номер напоминалки в хранилище
+    @returns: объект класса L{StoreReminder}
+    '''
+    return StoreReminder(self, i)
+
+  def condition(self, i):
+    '''Построить условие напоминалки
+
+    @param i: номер напоминалки в хранилище
+    @returns: объект класса L{DateCondition<DateCondition.DateCondition>}
+    '''
+    cond = self.__groupCondition(self.__signature(i))
+    from_, until = self.__limits(i)
+    if from_ is not None or until is not None:
+      cond = LimitedDateCondition(cond, from_, until)
+    return cond
+
+  def iterEvents(self, fromDate, toDate, mode):
+    '''Перебрать события напоминалок хранилища в пределах заданного
+    диапазона дат.  Результат совпадает с тем, что выдал бы метод
+    L{Runner.iterEvents<Runner.Runner.iterEvents>} для исходных напоминалок.
+
+    @param fromDate: объект класса C{datetime.date}, задающий начальную дату
+    @param toDate: объект класса C{datetime.date}, задающий конечную дату (включительно)
+    @param mode: константа из «перечисления» L{RunnerMode<Runner.RunnerMode>}
+    @returns: Iterable по кортежам (объект класса C{datetime.date}, номер
+      напоминалки в хранилище) в порядке возрастания дат и номеров; события
+      вычисляются по мере перебора
+    '''
+    from .Runner import RunnerMode
+    streams = []
+    for signature, rows in self.__groupsByCondition().items():
+      cond = self.__groupCondition(signature)
+      maxAdv = max(self.adv[i] for i in rows) if mode == RunnerMode.REMIND else 0
+      lastDate = toDate + datetime.timedelta(days=maxAdv)
+      if not cond.reachability().intersects(fromDate, lastDate):
+        continue
+
+      # the condition is scanned once for every distinct start date, which
+      # is fromDate unless a reminder has a later FROM
+      rowsByStart = {}
+      for i in rows:
+        from_, until = self.__limits(i)
+        startDate = max(fromDate, from_) if from_ is not None else fromDate
+        rowLastDate = toDate + datetime.timedelta(days=self.adv[i]) \
+          if mode == RunnerMode.REMIND else toDate
+        if until is not None:
+          rowLastDate = min(rowLastDate, until)
+        rowsByStart.setdefault(startDate, []).append((i, rowLastDate))
+      for startDate, startRows in rowsByStart.items():
+        streams.append(_iterGroupEvents(cond, startDate, startRows))
+    return heapq.merge(*streams)
+
+  def __signature(self, i):
+    return (self.year[i], self.month[i], self.day[i], self.weekdayMask[i],
+      self.flags[i], self.shift[i], self.repeat[i])
+
+  def __limits(self, i):
+    from_ = datetime.date.fromordinal(self.fromOrdinal[i]) if self.fromOrdinal[i] else None
+    until = datetime.date.fromordinal(self.untilOrdinal[i]) if self.untilOrdinal[i] else None
+    return from_, until
+
+  def __groupsByCondition(self):
+    if self._groups is None:
+      self._groups = {}
+      for i in range(len(self)):
+        self._groups.setdefault(self.__signature(i), []).append(i)
+    return self._groups
+
+  def __groupCondition(self, signature):
+    cond = self._conditions.get(signature)
+    if cond is None:
+      cond = self._conditions[signature] = _makeCondition(*signature)
+    return cond
+
+  def save(self, filename):
+    '''Атомарно записать хранилище в файл
+
+    @param filename: имя файла
+    '''
+    header = _HEADER.pack(_MAGIC, _VERSION, sys.byteorder == 'little',
+      len(_COLUMNS), len(self), len(self.messages))
+    header += b''.join(typecode.encode('ascii') + bytes([array(typecode).itemsize])
+      for _, typecode in _COLUMNS)
+    with atomicWrite(filename) as f:
+      f.write(header)
+      for name in _COLUMN_NAMES + ('messages',):
+        f.write(bytes(-f.tell() % _ALIGNMENT))
+        f.write(getattr(self, name))
+
+  @staticmethod
+  def load(filename):
+    '''Открыть хранилище, записанное методом L{save}.  Файл отображается в
+    память, поэтому открытие не зависит от количества напоминалок.
+
+    @param filename: имя файла
+    @returns: объект класса L{ColumnarStore}, доступный только для чтения
+    @raise FormatError: файл имеет неизвестный формат или записан на
+      платформе с другим порядком байтов или размерами типов
+    '''
+    with open(filename, 'rb') as f:
+      size = os.fstat(f.fileno()).st_size
+      if size < _HEADER.size:
+        raise FormatError('Not a rempy store: %s' % filename)
+      mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, version, little, ncolumns, count, messagesLength = _HEADER.unpack_from(mm)
+    expected = b''.join(typecode.encode('ascii') + bytes([array(typecode).itemsize])
+      for _, typecode in _COLUMNS)
+    offset = _HEADER.size
+    if magic != _MAGIC or version != _VERSION or \
+        bool(little) != (sys.byteorder == 'little') or ncolumns != len(_COLUMNS) or \
+        mm[offset:offset + len(expected)] != expected:
+      raise FormatError('Unsupported rempy store: %s' % filename)
+    offset += len(expected)
+
+    store = ColumnarStore()
+    view = memoryview(mm)
+    for name, typecode in _COLUMNS + (('messages', 'B'),):
+      offset += -offset % _ALIGNMENT
+      length = (count if name != 'messages' else messagesLength) * array(typecode).itemsize
+      if offset + length > size:
+        raise FormatError('Truncated rempy store: %s' % filename)
+      setattr(store, name, view[offset:offset + length].cast(typecode))
+      offset += length
+    store.readOnly = True
+    store._mmap = mm
+    return store
+
+
+  class Test(unittest.TestCase):
+    '''Набор unit-тестов'''
+
+    STRINGS = [
+      'REM 1 MSG First',
+      'REM Mon Wed MSG Weekdays',
+      'REM Mon 1 MSG First Monday',
+      'REM June 12 +3 MSG Birthday',
+      'REM 31 MSG Last',
+      'REM 2010-03-05 MSG Once',
+      'REM Sat 8 -7 MSG Last Saturday',
+      'REM 1 *7 MSG Weekly from the first',
+      'REM 15 FROM 2010-03-01 UNTIL 2010-05-01 MSG Limited',
+      'REM 1 *10 FROM 2010-03-20 MSG Repeat from',
+      'REM 1 MSG Привет',
+    ]
+
+    def setUp(self):
+      self.reminders = [ShortcutReminder.fromString(string) for string in self.STRINGS]
+      self.reminders.append(ShortcutReminder.fromString('REM Fri MSG Odd', satisfy=lambda date: date.day % 2))
+
+    def __events(self, store, residual, mode):
+      from .Runner import Runner
+      runner = Runner()
+      for reminder in residual:
+        runner.add(reminder)
+      runner.addStore(store)
+      return [(date, reminder.action.message) for date, reminder in
+        runner.iterEvents(datetime.date(2010, 2, 20), datetime.date(2010, 7, 1), mode)]
+
+    def __expected(self, mode):
+      from .Runner import Runner
+      runner = Runner()
+      # the residual reminder is added before the store, so it goes first
+      for reminder in self.reminders[-1:] + self.reminders[:-1]:
+        runner.add(reminder)
+      return [(date, reminder.action.message) for date, reminder in
+        runner.iterEvents(datetime.date(2010, 2, 20), datetime.date(2010, 7, 1), mode)]
+
+    def test_fromReminders(self):
+      store, residual = ColumnarStore.fromReminders(self.reminders)
+      self.assertEqual(len(store), len(self.STRINGS))
+      self.assertEqual(residual, self.reminders[-1:])
+      self.assertEqual(store.message(len(self.STRINGS) - 1), 'Привет')
+
+    def test_events(self):
+      from .Runner import RunnerMode
+      store, residual = ColumnarStore.fromReminders(self.reminders)
+      for mode in (RunnerMode.REMIND, RunnerMode.EVENTS):
+        self.assertEqual(self.__events(store, residual, mode), self.__expected(mode))
+
+    def test_lazyEvents(self):
+      from .Runner import RunnerMode
+      store, _ = ColumnarStore.fromReminders(self.reminders)
+      # only the first events of a practically unbounded range are computed
+      events = store.iterEvents(datetime.date(2010, 2, 20), datetime.date(9999, 1, 1), RunnerMode.EVENTS)
+      D = datetime.date
+      self.assertEqual([(date, store.message(i)) for date, i in itertools.islice(events, 4)],
+        [(D(2010, 2, 22), 'Weekdays'), (D(2010, 2, 22), 'Weekly from the first'),
+         (D(2010, 2, 24), 'Weekdays'), (D(2010, 2, 28), 'Last')])
+
+    def test_saveLoad(self):
+      from .Runner import RunnerMode
+      store, residual = ColumnarStore.fromReminders(self.reminders)
+      with tempfile.TemporaryDirectory() as dirname:
+        filename = os.path.join(dirname, 'store')
+        store.save(filename)
+        loaded = ColumnarStore.load(filename)
+        self.assertEqual(self.__events(loaded, residual, RunnerMode.REMIND),
+          self.__expected(RunnerMode.REMIND))
+        self.assertRaises(TypeError, loaded.add, self.reminders[0])
+        del loaded
+
+    def test_fingerprint(self):
+      store, _ = ColumnarStore.fromReminders(self.reminders)
+      fingerprints = [store.reminder(i).fingerprint() for i in range(len(store))]
+      self.assertEqual(len(set(fingerprints)), len(store))
+      self.assertEqual(store.reminder(3).fingerprint(), fingerprints[3])
+      self.assertEqual(store.reminder(3), store.reminder(3))
+      self.assertNotEqual(store.reminder(3), store.reminder(4))
+      with tempfile.TemporaryDirectory() as dirname:
+        filename = os.path.join(dirname, 'store')
+        store.save(filename)
+        loaded = ColumnarStore.load(filename)
+        self.assertEqual([loaded.reminder(i).fingerprint() for i in range(len(loaded))],
+          fingerprints)
+        del loaded
+
+    def test_badFile(self):
+      with tempfile.TemporaryDirectory() as dirname:
+        filename = os.path.join(dirname, 'store')
+        with open(filename, 'wb') as f:
+          f.write(b'x' * 64)
+        self.assertRaises(FormatError, ColumnarStore.load, filename)
+
+
+class StoreReminder(Reminder):
+  '''Напоминалка, хранящаяся в объекте класса L{ColumnarStore}.  Объекты
+  создаются по требованию, когда напоминалка участвует в событии, поэтому
+  объекты для одной и той же строки хранилища равны.'''
+
+  __slots__ = ('store', 'index')
+
+  def __init__(self, store, index):
+    super(StoreReminder, self).__init__()
+    self.store = store
+    self.index = index
+
+  @property
+  def action(self):
+    '''Объект класса L{MessagePrinter<Action.MessagePrinter>}'''
+    return MessagePrinter(self.store.message(self.index))
+
+  def _makeCondition(self, runnerMode):
+    return self.store.condition(self.index)
+
+  def advanceWarningValue(self):
+    return self.store.adv[self.index]
+
+  def execute(self, date):
+    return self.action(date)
+
+  def fingerprint(self):
+    return self.store.fingerprint(self.index)
+
+  def __eq__(self, other):
+    if not isinstance(other, StoreReminder):
+      return NotImplemented
+    return self.store is other.store and self.index == other.index
+
+  def __hash__(self):
+    return hash((id(self.store), self.index))
+
+
+def _iterGroupEvents(cond, startDate, rows):
+  # rows are (number, last date) in increasing order of numbers, so the
+  # events come out sorted by (date, number)
+  lastDate = max(rowLastDate for _, rowLastDate in rows)
+  for date in itertools.takewhile(lambda date: date <= lastDate, cond.scan(startDate)):
+    for i, rowLastDate in rows:
+      if date <= rowLastDate:
+        yield date, i
+
+
+def _makeCondition(year, month, day, weekdayMask, flags, shift, repeat):
+  '''Построить условие по значениям столбцов (так же, как его строит парсер)'''
+  weekdays = [weekday for weekday in range(7) if weekdayMask >> weekday & 1] \
+    if weekdayMask >= 0 else None
+  nonexistingDaysHandling = flags >> _NONEXISTING_SHIFT & 3
+  if flags & _NEXT_WEEKDAY:
+    cond = NthWeekdayDateCondition(weekdays, day, year or None, month or None,
+      nonexistingDaysHandling)
+  else:
+    cond = SimpleDateCondition(year or None, month or None, day or None, weekdays,
+      nonexistingDaysHandling)
+  if shift:
+    cond = ShiftDateCondition(cond, shift)
+  if repeat:
+    cond = CombinedDateCondition(cond, RepeatDateCondition(repeat))
+  return cond
+
+def _unpackSimple(cond, row):
+  if type(cond) is NthWeekdayDateCondition:
+    row['weekdayMask'] = cond.weekdayMask
+    row['flags'] |= _NEXT_WEEKDAY
+  elif type(cond) is SimpleDateCondition:
+    row['weekdayMask'] = cond.weekdayMask if cond.weekdayMask is not None else -1
+  else:
+    return False
+  if cond.year is not None and not 0 < cond.year < 2**15 or \
+      cond.day is not None and not -2**7 <= cond.day < 2**7:
+    return False
+  row['year'] = cond.year or 0
+  row['month'] = cond.month or 0
+  row['day'] = cond.day or 0
+  row['flags'] |= cond.nonexistingDaysHandling << _NONEXISTING_SHIFT
+  return True
+
+def _unpack(reminder):
+  '''Разложить напоминалку по столбцам
+
+  @returns: список значений столбцов (без смещения и длины сообщения),
+    к которому в конце добавлена строка сообщения, или C{None}, если
+    напоминалка не подходит для хранения по столбцам
+  '''
+  if type(reminder) not in (BasicReminder, ShortcutReminder) or \
+      type(reminder.action) is not MessagePrinter or not isinstance(reminder.action.message, str):
+    return None
+  row = dict.fromkeys(_COLUMN_NAMES, 0)
+  row['adv'] = reminder.advanceWarningValue()
+  cond = reminder.cond
+
+  if type(cond) is LimitedDateCondition and cond.maxMatches is None:
+    row['fromOrdinal'] = cond.from_.toordinal() if cond.from_ is not None else 0
+    row['untilOrdinal'] = cond.until.toordinal() if cond.until is not None else 0
+    cond = cond.cond
+  if type(cond) is CombinedDateCondition and type(cond.cond2) is RepeatDateCondition:
+    row['repeat'] = cond.cond2.timedelta.days
+    cond = cond.cond
+  if type(cond) is ShiftDateCondition:
+    if cond.omit is not None:
+      return None
+    row['shift'] = cond.timedelta.days
+    cond = cond.cond
+  if not _unpackSimple(cond, row):
+    return None
+  if not all(-2**31 <= row[name] < 2**31 for name in ('shift', 'repeat', 'adv')):
+    return None
+
+  ret = [row[name] for name in _COLUMN_NAMES[:-2]]
+  ret.append(reminder.action.message)
+  return ret
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -2,15 +2,12 @@
 
 При запуске из командной строки запускает присутствующие в модуле unit-тесты.'''
 
-import bisect
-import copy
 import datetime
 import itertools
 import operator
 import unittest
 
 from .utils import FormatError
-from .utils.algorithms import sortedUnique
 from .utils.dates import UnsafeDate, NonExistingDaysHandling
 from .utils.functional import all
 from .utils import dates as dateutils
@@ -18,7 +15,13 @@ from .utils import dates as dateutils
 
 class DateCondition:
   '''Базовый класс для классов, которые могут хранить условия на дату и
-  находить даты, удовлетворяющие этим условиям.'''
+  находить даты, удовлетворяющие этим условиям.
+
+  Классы иерархии объявляют C{__slots__}, так как в долго работающем процессе
+  могут одновременно храниться сотни тысяч условий.  Наследникам, которые
+  создаются в большом количестве, тоже стоит объявлять C{__slots__}.'''
+
+  __slots__ = ('_reachabilityCache', '_compiledCache')
 
   def scan(self, startDate):
     '''Искать даты, удовлетворяющие хранимым в объекте условиям, в направлении
@@ -71,6 +74,308 @@ class DateCondition:
     '''
     return DateConditionParser().parse(string)
 
+  def reachability(self):
+    '''Получить статическую сводку о датах, которые может выдавать условие.
+    Сводка вычисляется при первом вызове методом L{_reachability} и
+    запоминается, поэтому после вызова этого метода условие не должно
+    изменяться.
+
+    @returns: объект класса L{Reachability}
+    '''
+    try:
+      return self._reachabilityCache
+    except AttributeError:
+      self._reachabilityCache = self._reachability()
+      return self._reachabilityCache
+
+  _startIndependent = False
+  '''C{True}, если набор выдаваемых методом L{scan} дат не зависит от
+  начальной даты, то есть C{scan(date)} выдаёт те же даты, что и
+  C{scan(date2)}, начиная с C{date}, для любой C{date2 <= date}.  В этом
+  случае L{histogram} считает даты для каждого периода методом L{count}.'''
+
+  def count(self, fromDate, toDate):
+    '''Подсчитать количество дат, которые выдаёт C{scan(fromDate)}, не
+    превышающих C{toDate}.
+
+    Реализация по умолчанию перебирает даты.  Наследники могут переопределить
+    метод, вычисляя количество без перебора.
+
+    @param fromDate: объект класса C{datetime.date}, задающий начальную дату
+    @param toDate: объект класса C{datetime.date}, задающий конечную дату (включительно)
+    @returns: целочисленное количество дат
+    '''
+    if fromDate > toDate:
+      return 0
+    gen = itertools.takewhile(lambda date: date <= toDate, self.scan(fromDate))
+    return sum(1 for _ in gen)
+
+  def histogram(self, fromDate, toDate, period):
+    '''Подсчитать, сколько дат из тех, что выдаёт C{scan(fromDate)}, не
+    превышая C{toDate}, приходится на каждый период.
+
+    @param fromDate: объект класса C{datetime.date}, задающий начальную дату
+    @param toDate: объект класса C{datetime.date}, задающий конечную дату (включительно)
+    @param period: элемент «перечисления» L{Period<utils.dates.Period>}
+    @returns: список кортежей (начальная дата периода, количество дат) для
+      каждого периода, пересекающегося с диапазоном, в порядке возрастания дат
+    '''
+    if self._startIndependent:
+      return [(start, self.count(first, last))
+        for start, first, last in dateutils.periods(fromDate, toDate, period)]
+    ret = [[start, 0] for start, _, _ in dateutils.periods(fromDate, toDate, period)]
+    i = 0
+    for date in itertools.takewhile(lambda date: date <= toDate, self.scan(fromDate)):
+      start = dateutils.periodStart(date, period)
+      while ret[i][0] != start:
+        i += 1
+      ret[i][1] += 1
+    return [tuple(item) for item in ret]
+
+  def mask(self, grid):
+    '''Построить маску дат, которые выдаёт C{scan(grid.fromDate)}, не
+    превышающих C{grid.toDate}.
+
+    Реализация по умолчанию перебирает даты.  Наследники могут переопределить
+    метод, вычисляя маску операциями над массивами.
+
+    @param grid: объект класса L{DateGrid<OccurrenceMatrix.DateGrid>}
+    @returns: массив numpy типа C{bool}
+    '''
+    ret = grid.zeros()
+    if grid.fromDate > grid.toDate:
+      return ret
+    for date in itertools.takewhile(lambda date: date <= grid.toDate, self.scan(grid.fromDate)):
+      if date >= grid.fromDate:
+        ret[grid.index(date)] = True
+    return ret
+
+  def _reachability(self):
+    '''Метод для переопределения в наследниках.  Вычисляет сводку для метода
+    L{reachability}.  Сводка должна описывать I{надмножество} дат, которые
+    могут выдавать методы L{scan} и L{scanBack} при любой начальной дате.
+    Реализация по умолчанию не накладывает никаких ограничений.
+
+    @returns: объект класса L{Reachability}
+    '''
+    return Reachability()
+
+  def compile(self):
+    '''Получить скомпилированную форму условия: функцию C{nxt(ordinal)},
+    которая по порядковому номеру даты (см. C{datetime.date.toordinal})
+    возвращает порядковый номер первой даты не раньше заданной, которую
+    выдаёт L{scan}, или C{None}, если таких дат нет.  Аргументом может быть
+    любое положительное целое число, в том числе превышающее номер
+    C{datetime.date.max}.
+
+    Скомпилированная форма собирается из форм вложенных условий методом
+    L{_compile} при первом вызове и запоминается.  Границы, смещения и
+    ограничения в ней сравниваются как целые числа, без цепочки генераторов и
+    объектов дат.  Скомпилировать можно только условия, для которых
+    C{scan} не зависит от начальной даты (см. L{_startIndependent}).
+
+    @returns: функция или C{None}, если условие или одно из вложенных в него
+      условий не компилируется
+    '''
+    try:
+      return self._compiledCache
+    except AttributeError:
+      self._compiledCache = self._compile()
+      return self._compiledCache
+
+  def _compile(self):
+    '''Метод для переопределения в наследниках.  Строит скомпилированную
+    форму для метода L{compile}.  Реализация по умолчанию возвращает C{None}
+    (условие не компилируется).
+
+    @returns: функция C{nxt(ordinal)} или C{None}
+    '''
+    return None
+
+
+def _never(ordinal):
+  '''Скомпилированная форма условия, не выдающего ни одной даты'''
+  return None
+
+def _iterCompiled(nxt, startDate):
+  '''Перебрать даты скомпилированной формы условия, начиная с C{startDate}
+
+  @param nxt: функция, полученная методом L{DateCondition.compile}
+  @param startDate: объект класса C{datetime.date}
+  @returns: Iterable по датам
+  '''
+  ordinal = nxt(startDate.toordinal())
+  while ordinal is not None:
+    yield datetime.date.fromordinal(ordinal)
+    ordinal = nxt(ordinal + 1)
+
+
+class Reachability:
+  '''Статическая сводка о датах, на которые может выпасть условие: возможные
+  годы, маска возможных месяцев и диапазон дат.  Используется объектом класса
+  L{Runner<Runner.Runner>}, чтобы не начинать поиск дат для напоминалок,
+  которые заведомо не могут сработать в заданном диапазоне.
+
+  @ivar years: множество (C{frozenset}) возможных лет или C{None}, если
+    ограничений на год нет
+  @ivar months: битовая маска возможных месяцев: бит 0 соответствует январю,
+    бит 11 - декабрю
+  @ivar from_: объект класса C{datetime.date}, минимальная возможная дата,
+    или C{None}
+  @ivar until: объект класса C{datetime.date}, максимальная возможная дата,
+    или C{None}
+  '''
+
+  ALL_MONTHS = 0xfff
+
+  __slots__ = ('years', 'months', 'from_', 'until')
+
+  def __init__(self, years=None, months=ALL_MONTHS, from_=None, until=None):
+    super(Reachability, self).__init__()
+    self.years = frozenset(years) if years is not None else None
+    self.months = months
+    self.from_ = from_
+    self.until = until
+
+  @staticmethod
+  def empty():
+    '''Получить сводку для условия, не выдающего ни одной даты
+
+    @returns: объект класса L{Reachability}
+    '''
+    return Reachability(months=0)
+
+  def isEmpty(self):
+    '''Проверить, что условие не может выдать ни одной даты'''
+    return self.months == 0 or self.years == frozenset() or \
+      self.from_ is not None and self.until is not None and self.from_ > self.until
+
+  def restricted(self, from_=None, until=None):
+    '''Получить сводку, дополнительно ограниченную диапазоном дат
+
+    @param from_: объект класса C{datetime.date} или C{None}
+    @param until: объект класса C{datetime.date} или C{None}
+    @returns: объект класса L{Reachability}
+    '''
+    if from_ is not None and self.from_ is not None:
+      from_ = max(from_, self.from_)
+    elif from_ is None:
+      from_ = self.from_
+    if until is not None and self.until is not None:
+      until = min(until, self.until)
+    elif until is None:
+      until = self.until
+    return Reachability(self.years, self.months, from_, until)
+
+  def shifted(self, days):
+    '''Получить сводку для дат, смещённых на заданное количество дней.  Годы и
+    месяцы при смещении не сохраняются, сохраняется только диапазон дат.
+
+    @param days: целочисленное смещение в днях
+    @returns: объект класса L{Reachability}
+    '''
+    if days == 0 or self.isEmpty():
+      return self
+    timedelta = datetime.timedelta(days=days)
+    try:
+      from_ = self.from_ + timedelta if self.from_ is not None else None
+    except OverflowError:
+      from_ = None if days < 0 else datetime.date.max
+    try:
+      until = self.until + timedelta if self.until is not None else None
+    except OverflowError:
+      until = None if days > 0 else datetime.date.min
+    return Reachability(from_=from_, until=until)
+
+  def intersects(self, fromDate, toDate):
+    '''Проверить, может ли условие выдать хотя бы одну дату из диапазона
+
+    @param fromDate: объект класса C{datetime.date}, начальная дата диапазона
+    @param toDate: объект класса C{datetime.date}, конечная дата диапазона
+      (включительно)
+    @returns: C{False}, если ни одна дата из диапазона не может удовлетворять
+      условию, иначе C{True}
+    '''
+    if self.isEmpty():
+      return False
+    if self.from_ is not None:
+      fromDate = max(fromDate, self.from_)
+    if self.until is not None:
+      toDate = min(toDate, self.until)
+    if fromDate > toDate:
+      return False
+    if self.years is None and self.months == self.ALL_MONTHS:
+      return True
+
+    years = range(fromDate.year, toDate.year + 1)
+    if self.years is not None:
+      years = sorted(year for year in self.years if year in years)
+    for year in years:
+      firstMonth = fromDate.month if year == fromDate.year else 1
+      lastMonth = toDate.month if year == toDate.year else 12
+      mask = ((1 << lastMonth) - 1) & ~((1 << (firstMonth - 1)) - 1)
+      if self.months & mask:
+        return True
+    return False
+
+
+  class Test(unittest.TestCase):
+    '''Набор unit-тестов'''
+
+    def test_fixedYear(self):
+      r = SimpleDateCondition(2009, None, 5).reachability()
+      self.assertFalse(r.intersects(datetime.date(2010, 1, 1), datetime.date(2010, 12, 31)))
+      self.assertTrue(r.intersects(datetime.date(2009, 12, 31), datetime.date(2010, 1, 1)))
+
+    def test_fixedMonth(self):
+      r = SimpleDateCondition(None, 3, None).reachability()
+      self.assertFalse(r.intersects(datetime.date(2010, 4, 1), datetime.date(2011, 2, 28)))
+      self.assertTrue(r.intersects(datetime.date(2010, 4, 1), datetime.date(2011, 3, 1)))
+
+    def test_limitedUntil(self):
+      cond = LimitedDateCondition(SimpleDateCondition(None, None, 1),
+        until=datetime.date(2010, 5, 1))
+      r = cond.reachability()
+      self.assertFalse(r.intersects(datetime.date(2010, 5, 2), datetime.date(2020, 1, 1)))
+
+    def test_shift(self):
+      cond = ShiftDateCondition(SimpleDateCondition(2010, 1, 3), -5)
+      r = cond.reachability()
+      self.assertTrue(r.intersects(datetime.date(2009, 12, 29), datetime.date(2009, 12, 29)))
+      self.assertFalse(r.intersects(datetime.date(2010, 1, 3), datetime.date(2010, 1, 3)))
+
+    def test_emptyWeekdays(self):
+      r = SimpleDateCondition(weekdays=[]).reachability()
+      self.assertFalse(r.intersects(datetime.date.min, datetime.date.max))
+
+
+_DAYS = tuple(datetime.timedelta(days=days) for days in range(8))
+_MAX_ORDINAL = datetime.date.max.toordinal()
+_WEEKDAY_TABLES = {}
+
+def _weekdayTables(weekdayMask, back):
+  '''Получить таблицы расстояний до подходящих дней недели.  Таблицы
+  вычисляются один раз для каждой маски и направления и используются всеми
+  объектами класса L{SimpleDateCondition}.
+
+  @param weekdayMask: ненулевая битовая маска дней недели
+  @param back: если C{True}, расстояния отсчитываются в направлении прошлого
+  @returns: кортеж (toMatching, toNext) кортежей из 7 целых чисел: для
+    каждого дня недели - расстояние в днях до ближайшего подходящего дня
+    недели, включая сам день (от 0 до 6), и не включая его (от 1 до 7)
+  '''
+  key = (weekdayMask, back)
+  tables = _WEEKDAY_TABLES.get(key)
+  if tables is None:
+    sign = 1 if not back else -1
+    def distance(weekday, start):
+      return next(days for days in range(start, start + 7)
+        if weekdayMask >> ((weekday + sign * days) % 7) & 1)
+    tables = _WEEKDAY_TABLES[key] = (
+      tuple(distance(weekday, 0) for weekday in range(7)),
+      tuple(distance(weekday, 1) for weekday in range(7)))
+  return tables
+
 
 class SimpleDateCondition(DateCondition):
   '''Класс, позволяющий находить даты по номеру дня в месяце, месяцу, году,
@@ -81,8 +386,15 @@ class SimpleDateCondition(DateCondition):
   Суть стратегии в том, что указание дней недели означает то и только то,
   что из дат, соответствующих другим условиям (год, месяц, день), выбираются
   даты с одним из перечисленных дней недели.
+
+  @ivar weekdayMask: битовая маска дней недели (бит 0 соответствует
+    понедельнику, бит 6 - воскресенью) или C{None}, если ограничения на день
+    недели нет
   '''
 
+  __slots__ = ('year', 'month', 'day', 'weekdayMask', 'nonexistingDaysHandling',
+    'theMatchingDay')
+
   def __init__(self, year=None, month=None, day=None, weekdays=None,
       nonexistingDaysHandling=dateutils.NonExistingDaysHandling.WRAP):
     '''Конструктор.
@@ -112,34 +424,162 @@ class SimpleDateCondition(DateCondition):
     self.year = year
     self.month = month
     self.day = day
-    self.weekdays = weekdays
-    if self.weekdays is not None:
-      self.weekdays.sort()
-      sortedUnique(self.weekdays)
+    self.weekdayMask = None
+    if weekdays is not None:
+      self.weekdayMask = 0
+      for weekday in weekdays:
+        self.weekdayMask |= 1 << weekday
     self.nonexistingDaysHandling = nonexistingDaysHandling
 
     # handle fixed date (for efficiency, see also __scan())
     self.theMatchingDay = None
     if self.day is not None and self.month is not None and self.year is not None:
       date = self.__wrapDate(dateutils.UnsafeDate(self.year, self.month, self.day))
-      if self.weekdays is None or date.weekday() in self.weekdays:
+      if date is not None and self.__matchesWeekday(date):
         self.theMatchingDay = date
 
-    # "cache" for _WeekdaysDayGeneratorHelper
-    if self.day is not None or self.weekdays is None or self.weekdays == []:
-      self.weekdays_diff = None
-    else:
-      self.weekdays_diff = []
-      for i in range(len(self.weekdays) - 1):
-        increment = self.weekdays[i + 1] - self.weekdays[i]
-        self.weekdays_diff.append(datetime.timedelta(days=increment))
-      increment = self.weekdays[0] + 7 - self.weekdays[-1]
-      self.weekdays_diff.append(datetime.timedelta(days=increment))
+  @property
+  def weekdays(self):
+    '''Отсортированный список дней недели (0 - понедельник, 6 - воскресенье)
+    или C{None}, если ограничения на день недели нет.  Строится по маске
+    L{weekdayMask} при каждом обращении.'''
+    if self.weekdayMask is None:
+      return None
+    return [weekday for weekday in range(7) if self.weekdayMask >> weekday & 1]
 
+  def __matchesWeekday(self, date):
+    return self.weekdayMask is None or self.weekdayMask >> date.weekday() & 1
 
   def __wrapDate(self, unsafeDate):
     return dateutils.wrapDate(unsafeDate, self.nonexistingDaysHandling)
 
+  _startIndependent = True
+
+  def count(self, fromDate, toDate):
+    '''Подсчитать количество подходящих дат в диапазоне без их перебора:
+    для каждого подходящего месяца в диапазоне количество вычисляется
+    арифметически.
+
+    @see: L{DateCondition.count}
+    '''
+    if fromDate > toDate or self.weekdayMask == 0:
+      return 0
+    if self.day is not None and self.month is not None and self.year is not None:
+      date = self.theMatchingDay
+      return 1 if date is not None and fromDate <= date <= toDate else 0
+    if self.day is None and self.month is None and self.year is None:
+      return dateutils.countWeekdays(fromDate, toDate, self.weekdays)
+
+    ret = 0
+    years = range(fromDate.year, toDate.year + 1)
+    if self.year is not None:
+      years = [self.year] if self.year in years else []
+    for year in years:
+      for month in range(1, 13) if self.month is None else (self.month,):
+        if (year, month) < (fromDate.year, fromDate.month) or \
+            (year, month) > (toDate.year, toDate.month):
+          continue
+        first = max(fromDate, datetime.date(year, month, 1))
+        last = min(toDate, dateutils.lastDayOfMonth(year, month))
+        if self.day is None:
+          ret += dateutils.countWeekdays(first, last, self.weekdays)
+        else:
+          day = dateutils.wrapDay(year, month, self.day, self.nonexistingDaysHandling)
+          if day is not None and first.day <= day <= last.day and \
+              self.__matchesWeekday(datetime.date(year, month, day)):
+            ret += 1
+    return ret
+
+  def mask(self, grid):
+    if self.nonexistingDaysHandling == NonExistingDaysHandling.RAISE:
+      return super(SimpleDateCondition, self).mask(grid)
+    ret = grid.ones()
+    if self.year is not None:
+      ret &= grid.years == self.year
+    if self.month is not None:
+      ret &= grid.months == self.month
+    if self.day is not None:
+      matches = grid.days == self.day
+      if self.nonexistingDaysHandling == NonExistingDaysHandling.WRAP:
+        matches |= (grid.days == grid.monthLengths) & (grid.monthLengths < self.day)
+      ret &= matches
+    if self.weekdayMask is not None:
+      ret &= grid.weekdayMask(self.weekdays)
+    return ret
+
+  def _reachability(self):
+    if self.weekdayMask == 0:
+      return Reachability.empty()
+    if self.day is not None and self.month is not None and self.year is not None:
+      date = self.theMatchingDay
+      if date is None:
+        return Reachability.empty()
+      return Reachability([date.year], 1 << (date.month - 1), date, date)
+
+    years = [self.year] if self.year is not None else None
+    months = 1 << (self.month - 1) if self.month is not None else Reachability.ALL_MONTHS
+    from_ = until = None
+    if self.year is not None:
+      from_ = datetime.date(self.year, self.month or 1, 1)
+      until = dateutils.lastDayOfMonth(self.year, self.month or 12)
+    return Reachability(years, months, from_, until)
+
+  def _compile(self):
+    if self.nonexistingDaysHandling == NonExistingDaysHandling.RAISE:
+      return None
+    if self.weekdayMask == 0:
+      return _never
+    if self.day is not None and self.month is not None and self.year is not None:
+      if self.theMatchingDay is None:
+        return _never
+      matching = self.theMatchingDay.toordinal()
+      return lambda ordinal: matching if ordinal <= matching else None
+
+    weekdayMask = self.weekdayMask
+    toMatching = _weekdayTables(weekdayMask, False)[0] if weekdayMask is not None else None
+    if self.day is None and self.month is None and self.year is None:
+      def nxt(ordinal):
+        if toMatching is not None:
+          # date.fromordinal(1) is Monday
+          ordinal += toMatching[(ordinal - 1) % 7]
+        return ordinal if ordinal <= _MAX_ORDINAL else None
+      return nxt
+
+    year, month, day = self.year, self.month, self.day
+    handling = self.nonexistingDaysHandling
+    step = 1 if month is None else 12
+    def nxt(ordinal):
+      if ordinal > _MAX_ORDINAL:
+        return None
+      date = datetime.date.fromordinal(ordinal)
+      index = _monthIndex(date.year, date.month)
+      if year is not None:
+        if date.year > year:
+          return None
+        index = max(index, _monthIndex(year, 1))
+      if month is not None:
+        index += (month - 1 - index) % 12
+      while True:
+        y, m = _monthFromIndex(index)
+        if y > datetime.MAXYEAR or year is not None and y != year:
+          return None
+        first = datetime.date(y, m, 1).toordinal()
+        if day is None:
+          candidate = max(ordinal, first)
+          if toMatching is not None:
+            candidate += toMatching[(candidate - 1) % 7]
+          if candidate < first + dateutils.monthLength(y, m):
+            return candidate
+        else:
+          d = dateutils.wrapDay(y, m, day, handling)
+          if d is not None:
+            candidate = first + d - 1
+            if candidate >= ordinal and \
+                (weekdayMask is None or weekdayMask >> ((candidate - 1) % 7) & 1):
+              return candidate
+        index += step
+    return nxt
+
   def __wrapDate_noFail(self, unsafeDate):
     return dateutils.wrapDate_noFail(unsafeDate, self.nonexistingDaysHandling)
 
@@ -178,7 +618,7 @@ class SimpleDateCondition(DateCondition):
     @returns: результат для методов L{scan} и L{scanBack} (Iterable по объектам
       класса C{datetime.date}).
     '''
-    if self.weekdays == []:
+    if self.weekdayMask == 0:
       return []
 
     # handle fixed date (for efficiency, see also __init__())
@@ -263,9 +703,14 @@ class SimpleDateCondition(DateCondition):
         if atStartDate:
           day = startDate.day
         else:
-          day = 1 if not back else dateutils.lastDayOfMonth(year, month).day
-      elif op(day, startDate.day) and atStartDate:
-        (year, month) = addMonth(year, month)
+          day = 1 if not back else dateutils.monthLength(year, month)
+      elif atStartDate:
+        matchingDay = day
+        if self.nonexistingDaysHandling == NonExistingDaysHandling.WRAP:
+          # the wrapped day may be startDate itself (e.g. the 31st in June)
+          matchingDay = min(day, dateutils.monthLength(year, month))
+        if op(matchingDay, startDate.day):
+          (year, month) = addMonth(year, month)
 
       return dateutils.UnsafeDate(year, month, day)
     except EmptyResult:
@@ -371,13 +816,15 @@ class SimpleDateCondition(DateCondition):
       возвращать C{None}.
     @see: L{__scan}
     '''
-    unsafeDate = copy.copy(unsafeDate_)
+    year, month, day = unsafeDate_
+    handling = self.nonexistingDaysHandling
     while True:
-      date = self.__wrapDate(unsafeDate)
-      if date is not None:
-        if self.weekdays is None or date.weekday() in self.weekdays:
+      wrappedDay = dateutils.wrapDay(year, month, day, handling)
+      if wrappedDay is not None:
+        date = datetime.date(year, month, wrappedDay)
+        if self.__matchesWeekday(date):
           yield date
-      (unsafeDate.year, unsafeDate.month) = (yield None); yield None
+      (year, month) = (yield None); yield None
 
 
   class _DayGeneratorHelper:
@@ -386,6 +833,8 @@ class SimpleDateCondition(DateCondition):
     дней недели, сократить перебор дат, рассматривая только те, которые
     попадают в этот список.'''
 
+    __slots__ = ('lastDate',)
+
     def __init__(self):
       super(SimpleDateCondition._DayGeneratorHelper, self).__init__()
       self.lastDate = None
@@ -395,7 +844,7 @@ class SimpleDateCondition(DateCondition):
       '''Основной способ конструирования объектов этого класса.  Создаёт
       объект конкретного дочернего класса в зависимости от того, задан ли
       список дней недели в условии.'''
-      if cond.weekdays is not None:
+      if cond.weekdayMask is not None:
         return SimpleDateCondition._WeekdaysDayGeneratorHelper(cond, back)
       else:
         return SimpleDateCondition._SimpleDayGeneratorHelper(back)
@@ -447,6 +896,8 @@ class SimpleDateCondition(DateCondition):
     @see: L{_DayGeneratorHelper}
     '''
 
+    __slots__ = ('timedelta',)
+
     def __init__(self, back):
       '''Конструктор
 
@@ -467,12 +918,15 @@ class SimpleDateCondition(DateCondition):
     в случае, когда в условии есть ограничения на день недели.
 
     Получает в конструктор объект класса L{SimpleDateCondition} и использует
-    его атрибуты L{weekdays<SimpleDateCondition.weekdays>} и
-    L{weekdays_diff<SimpleDateCondition.weekdays_diff>}.
+    его атрибут L{weekdayMask<SimpleDateCondition.weekdayMask>}.  Расстояния
+    до подходящих дней недели берутся из таблиц, общих для всех условий с
+    одинаковой маской (см. L{_weekdayTables}).
 
     @see: L{_DayGeneratorHelper}
     '''
 
+    __slots__ = ('toMatching', 'toNext', 'back')
+
     def __init__(self, cond, back):
       '''Конструктор
 
@@ -481,32 +935,17 @@ class SimpleDateCondition(DateCondition):
         иначе в направлении будущего
       '''
       super(SimpleDateCondition._WeekdaysDayGeneratorHelper, self).__init__()
-      self.cond = cond
+      # this fails when cond.weekdayMask == 0
+      # the condition is checked in __scan()
+      self.toMatching, self.toNext = _weekdayTables(cond.weekdayMask, back)
       self.back = back
-      self.weekdays_diff_index = None
 
     def _checkWeekday(self, date):
-      # this fails when self.cond.weekdays == []
-      # the condition is checked in __scan()
-      date_weekday = date.weekday()
-      if not self.back:
-        i = bisect.bisect_left(self.cond.weekdays, date_weekday)
-        increment = 7 if (i == len(self.cond.weekdays)) else 0
-        i = i % len(self.cond.weekdays)
-      else:
-        i = bisect.bisect_right(self.cond.weekdays, date_weekday)
-        increment = -7 if (i == 0) else 0
-        i = (i-1) % len(self.cond.weekdays)
-      increment += self.cond.weekdays[i] - date_weekday
-
-      self.weekdays_diff_index = i if not self.back \
-        else (i-1) % len(self.cond.weekdays)
-      return date + datetime.timedelta(days=increment)
+      timedelta = _DAYS[self.toMatching[date.weekday()]]
+      return date + timedelta if not self.back else date - timedelta
 
     def _step(self, date):
-      timedelta = self.cond.weekdays_diff[self.weekdays_diff_index]
-      self.weekdays_diff_index += 1 if not self.back else -1
-      self.weekdays_diff_index %= len(self.cond.weekdays_diff)
+      timedelta = _DAYS[self.toNext[date.weekday()]]
       return date + timedelta if not self.back else date - timedelta
 
   def __dayGenerator(self, unsafeDate, back):
@@ -748,6 +1187,34 @@ class SimpleDateCondition(DateCondition):
       dates = list(itertools.islice(cond.scanBack(self.startDate), 1))
       self.assertEqual(dates, [self.startDate])
 
+    def test_wrappedDay_back(self):
+      D = datetime.date
+      cond = SimpleDateCondition(None, None, 31)
+      self.assertEqual(list(itertools.islice(cond.scanBack(D(2009, 6, 30)), 2)),
+        [D(2009, 6, 30), D(2009, 5, 31)])
+      self.assertEqual(list(itertools.islice(cond.scanBack(D(2010, 2, 28)), 2)),
+        [D(2010, 2, 28), D(2010, 1, 31)])
+      cond = SimpleDateCondition(None, 6, 31)
+      self.assertEqual(list(itertools.islice(cond.scanBack(D(2009, 6, 30)), 2)),
+        [D(2009, 6, 30), D(2008, 6, 30)])
+      cond = SimpleDateCondition(None, None, 31,
+        nonexistingDaysHandling=dateutils.NonExistingDaysHandling.SKIP)
+      self.assertEqual(list(itertools.islice(cond.scanBack(D(2009, 6, 30)), 1)),
+        [D(2009, 5, 31)])
+      cond = ShiftDateCondition(SimpleDateCondition(None, None, 31), -1)
+      self.assertEqual(list(itertools.islice(cond.scanBack(D(2010, 9, 30)), 2)),
+        [D(2010, 9, 29), D(2010, 8, 30)])
+
+    def test_wrappedDay_backMirrorsScan(self):
+      D = datetime.date
+      fromDate, toDate = D(2009, 1, 1), D(2010, 12, 31)
+      for day in (29, 30, 31):
+        for cond in (SimpleDateCondition(None, None, day),
+            ShiftDateCondition(SimpleDateCondition(None, None, day), -1)):
+          forward = list(itertools.takewhile(lambda date: date <= toDate, cond.scan(fromDate)))
+          for date in forward:
+            self.assertEqual(next(iter(cond.scanBack(date))), date, (day, date))
+
     def test_weekdays_fixedMonth(self):
       cond = SimpleDateCondition(None, 1, None, weekdays=[3])
       dates = list(itertools.islice(cond.scan(self.startDate), 5))
@@ -768,6 +1235,40 @@ class SimpleDateCondition(DateCondition):
       dates = list(SimpleDateCondition(2010, 9, 1, weekdays=[1,3]).scan(self.startDate))
       self.assertEqual(dates, [])
 
+    # Counting
+
+    def test_count(self):
+      toDate = datetime.date(2012, 3, 1)
+      for cond in [
+        SimpleDateCondition(None, None, 31),
+        SimpleDateCondition(None, 2, 29, nonexistingDaysHandling=NonExistingDaysHandling.SKIP),
+        SimpleDateCondition(None, None, None, weekdays=[1,5]),
+        SimpleDateCondition(2011, None, 13, weekdays=[4]),
+        SimpleDateCondition(None, 1, None, weekdays=[3]),
+      ]:
+        dates = itertools.takewhile(lambda date: date <= toDate, cond.scan(self.startDate))
+        self.assertEqual(cond.count(self.startDate, toDate), len(list(dates)))
+
+    def test_compile(self):
+      for cond in [
+        SimpleDateCondition(None, None, 31),
+        SimpleDateCondition(None, 2, 29, nonexistingDaysHandling=NonExistingDaysHandling.SKIP),
+        SimpleDateCondition(None, None, None, weekdays=[1,5]),
+        SimpleDateCondition(2011, None, 13, weekdays=[4]),
+        SimpleDateCondition(None, 1, None, weekdays=[3]),
+        SimpleDateCondition(2010, 9, 23),
+      ]:
+        self.assertEqual(list(itertools.islice(_iterCompiled(cond.compile(), self.startDate), 20)),
+          list(itertools.islice(cond.scan(self.startDate), 20)))
+
+    def test_histogram(self):
+      cond = SimpleDateCondition(None, None, None, weekdays=[6])
+      self.assertEqual(cond.histogram(datetime.date(2010, 7, 16), datetime.date(2010, 9, 10), dateutils.Period.MONTH), [
+        (datetime.date(2010, 7, 1), 2),
+        (datetime.date(2010, 8, 1), 5),
+        (datetime.date(2010, 9, 1), 1),
+      ])
+
 
 class RepeatDateCondition(DateCondition):
   '''Класс, бесконечно отсчитывающий заданное количество дней (период) от
@@ -778,6 +1279,8 @@ class RepeatDateCondition(DateCondition):
   Особенно полезен при использовании внутри объекта класса
   L{CombinedDateCondition}.'''
 
+  __slots__ = ('timedelta',)
+
   def __init__(self, period):
     '''Конструктор
 
@@ -789,6 +1292,34 @@ class RepeatDateCondition(DateCondition):
     super(RepeatDateCondition, self).__init__()
     self.timedelta = datetime.timedelta(days=period)
 
+  def count(self, fromDate, toDate):
+    if fromDate > toDate:
+      return 0
+    period = self.timedelta.days
+    if period < 0:
+      return 1
+    return (toDate - fromDate).days // period + 1
+
+  def histogram(self, fromDate, toDate, period):
+    step = self.timedelta.days
+    ret = []
+    for start, first, last in dateutils.periods(fromDate, toDate, period):
+      if step < 0:
+        n = 1 if first == fromDate else 0
+      else:
+        # number of k >= 0 such that first <= fromDate + k*step <= last
+        n = (last - fromDate).days // step + (fromDate - first).days // step + 1
+      ret.append((start, n))
+    return ret
+
+  def mask(self, grid):
+    ret = grid.zeros()
+    if self.timedelta.days > 0:
+      ret[::self.timedelta.days] = True
+    elif len(ret) > 0:
+      ret[0] = True
+    return ret
+
   def scan(self, startDate):
     date = startDate
     while True:
@@ -816,52 +1347,129 @@ class RepeatDateCondition(DateCondition):
         datetime.date(2010, 8, 15),
       ])
 
+    def test_histogram(self):
+      cond = RepeatDateCondition(10)
+      self.assertEqual(cond.count(self.startDate, datetime.date(2010, 9, 30)), 8)
+      self.assertEqual(cond.histogram(self.startDate, datetime.date(2010, 9, 30), dateutils.Period.MONTH), [
+        (datetime.date(2010, 7, 1), 2),
+        (datetime.date(2010, 8, 1), 3),
+        (datetime.date(2010, 9, 1), 3),
+      ])
+
 
 class ShiftDateCondition(DateCondition):
   '''Класс-декоратор, применяющий заданное смещение к результатам, которые
-  выдаёт нижележащий объект'''
+  выдаёт нижележащий объект.  Если задан календарь пропускаемых дней,
+  смещение отсчитывается в рабочих днях этого календаря; несколько дат,
+  смещённых на один и тот же рабочий день, выдаются один раз.'''
 
-  def __init__(self, cond, shift):
+  __slots__ = ('cond', 'timedelta', 'omit')
+
+  def __init__(self, cond, shift, omit=None):
     '''Конструктор
 
     @param cond: нижележащий объект класса L{DateCondition}
     @param shift: целочисленное число,задающее смещение в днях
+    @param omit: объект класса L{OmitCalendar<OmitCalendar.OmitCalendar>} или
+      C{None}, если смещение задано в календарных днях
     '''
     super(ShiftDateCondition, self).__init__()
     self.cond = cond
     self.timedelta = datetime.timedelta(days=shift)
+    self.omit = omit
+
+  @property
+  def _startIndependent(self):
+    return self.cond._startIndependent
+
+  def count(self, fromDate, toDate):
+    if self.omit is not None or not self.cond._startIndependent or fromDate > toDate:
+      return super(ShiftDateCondition, self).count(fromDate, toDate)
+    return self.cond.count(fromDate - self.timedelta, toDate - self.timedelta)
+
+  def mask(self, grid):
+    if self.omit is not None or not self.cond._startIndependent:
+      return super(ShiftDateCondition, self).mask(grid)
+    return self.cond.mask(grid.shifted(-self.timedelta.days))
+
+  def _reachability(self):
+    r = self.cond.reachability()
+    if self.omit is None:
+      return r.shifted(self.timedelta.days)
+    if r.isEmpty():
+      return r
+    # shifting by working days is monotonic, so the bounds are shifted too
+    try:
+      from_ = self.__shift(r.from_) if r.from_ is not None else None
+    except OverflowError:
+      from_ = None if self.timedelta.days < 0 else datetime.date.max
+    try:
+      until = self.__shift(r.until) if r.until is not None else None
+    except OverflowError:
+      until = None if self.timedelta.days > 0 else datetime.date.min
+    return Reachability(from_=from_, until=until)
+
+  def _compile(self):
+    if self.omit is not None:
+      return None
+    inner = self.cond.compile()
+    if inner is None:
+      return None
+    days = self.timedelta.days
+    def nxt(ordinal):
+      ordinal = inner(max(ordinal - days, 1))
+      if ordinal is None or ordinal + days > _MAX_ORDINAL:
+        return None
+      return ordinal + days
+    return nxt
+
+  def __shift(self, date):
+    if self.omit is None:
+      return date + self.timedelta
+    return self.omit.shift(date, self.timedelta.days)
+
+  def __unique(self, gen):
+    if self.omit is None:
+      return gen
+    return (date for date, _ in itertools.groupby(gen))
 
   def scan(self, startDate):
+    return self.__unique(self.__scan(startDate))
+
+  def scanBack(self, startDate):
+    return self.__unique(self.__scanBack(startDate))
+
+  def __scan(self, startDate):
 
     if self.timedelta.days > 0:
       stack = []
       gen = self.cond.scanBack(startDate - datetime.timedelta(days=1))
       for date in itertools.takewhile(
           lambda date: date >= startDate,
-          (date + self.timedelta for date in gen)):
+          (self.__shift(date) for date in gen)):
         stack.append(date)
       while len(stack) > 0:
         yield stack.pop()
 
-    gen = (date + self.timedelta for date in self.cond.scan(startDate))
+    gen = (self.__shift(date) for date in self.cond.scan(startDate))
     if self.timedelta.days < 0:
       gen = itertools.dropwhile(lambda date: date < startDate, gen)
     for date in gen:
       yield date
 
-  def scanBack(self, startDate):
+  def __scanBack(self, startDate):
 
     if self.timedelta.days < 0:
       stack = []
       gen = self.cond.scan(startDate + datetime.timedelta(days=1))
       for date in itertools.takewhile(
           lambda date: date <= startDate,
-          (date + self.timedelta for date in gen)):
+          (self.__shift(date) for date in gen)):
         stack.append(date)
       while len(stack) > 0:
         yield stack.pop()
 
-    gen = (date + self.timedelta for date in self.cond.scanBack(startDate))
+    gen = (self.__shift(date) for date in self.cond.scanBack(startDate))
     if self.timedelta.days > 0:
       gen = itertools.dropwhile(lambda date: date > startDate, gen)
     for date in gen:
@@ -900,6 +1508,21 @@ class ShiftDateCondition(DateCondition):
       date = next(iter(cond.scanBack(self.startDate)))
       self.assertEqual(date, datetime.date(2010, 3, 2))
 
+    def test_omit(self):
+      from .OmitCalendar import OmitCalendar
+      omit = OmitCalendar(weekdays=[5, 6])
+      # the working day before the 1st and before the 2nd of May 2010 (Saturday and Sunday)
+      cond = ShiftDateCondition(SimpleDateCondition(2010, 5, None, [5, 6]), -1, omit)
+      self.assertEqual(list(itertools.islice(cond.scan(self.startDate), 3)), [
+        datetime.date(2010, 4, 30),
+        datetime.date(2010, 5, 7),
+        datetime.date(2010, 5, 14),
+      ])
+      self.assertEqual(list(itertools.islice(cond.scanBack(datetime.date(2010, 5, 13)), 2)), [
+        datetime.date(2010, 5, 7),
+        datetime.date(2010, 4, 30),
+      ])
+
     def test_wrapStartDate_back2(self):
       cond = ShiftDateCondition(SimpleDateCondition(None, None, 1), -40)
       dates = list(itertools.islice(cond.scanBack(self.startDate), 3))
@@ -914,6 +1537,8 @@ class SatisfyDateCondition(DateCondition):
   '''Класс-декоратор, возвращающий из результатов, которые выдаёт нижележащий
   объект, только даты, удовлетворяющие условию'''
 
+  __slots__ = ('cond', 'satisfy')
+
   def __init__(self, cond, satisfy):
     '''Конструктор
 
@@ -927,6 +1552,20 @@ class SatisfyDateCondition(DateCondition):
     self.cond = cond
     self.satisfy = satisfy
 
+  def mask(self, grid):
+    if self.cond is None:
+      return super(SatisfyDateCondition, self).mask(grid)
+    ret = self.cond.mask(grid)
+    for i in ret.nonzero()[0]:
+      if not self.satisfy(grid.date(i)):
+        ret[i] = False
+    return ret
+
+  def _reachability(self):
+    if self.cond is None:
+      return Reachability()
+    return self.cond.reachability()
+
   def scan(self, startDate):
     return self.__scan(startDate)
 
@@ -994,6 +1633,8 @@ class LimitedDateCondition(DateCondition):
   '''Класс-декоратор, вызывающий нижележащий объект ограниченное количество
   раз.  Ограничения задаются в L{конструкторе<LimitedDateCondition.__init__>}.'''
 
+  __slots__ = ('cond', 'from_', 'until', 'maxMatches')
+
   def __init__(self, cond, from_=None, until=None, maxMatches=None):
     '''Конструктор
 
@@ -1009,6 +1650,44 @@ class LimitedDateCondition(DateCondition):
     self.until = until
     self.maxMatches = maxMatches
 
+  @property
+  def _startIndependent(self):
+    return self.maxMatches is None and self.cond._startIndependent
+
+  def count(self, fromDate, toDate):
+    if not self._startIndependent:
+      return super(LimitedDateCondition, self).count(fromDate, toDate)
+    if self.from_ is not None:
+      fromDate = max(fromDate, self.from_)
+    if self.until is not None:
+      toDate = min(toDate, self.until)
+    if fromDate > toDate:
+      return 0
+    return self.cond.count(fromDate, toDate)
+
+  def mask(self, grid):
+    if not self._startIndependent:
+      return super(LimitedDateCondition, self).mask(grid)
+    return self.cond.mask(grid) & grid.rangeMask(self.from_, self.until)
+
+  def _reachability(self):
+    if self.maxMatches == 0:
+      return Reachability.empty()
+    return self.cond.reachability().restricted(self.from_, self.until)
+
+  def _compile(self):
+    if self.maxMatches is not None:
+      return None
+    inner = self.cond.compile()
+    if inner is None:
+      return None
+    lo = self.from_.toordinal() if self.from_ is not None else 1
+    hi = self.until.toordinal() if self.until is not None else _MAX_ORDINAL
+    def nxt(ordinal):
+      ordinal = inner(ordinal if ordinal > lo else lo)
+      return ordinal if ordinal is not None and ordinal <= hi else None
+    return nxt
+
   def scan(self, startDate):
     if self.from_ is not None:
       startDate = max(startDate, self.from_)
@@ -1033,7 +1712,13 @@ class LimitedDateCondition(DateCondition):
 class CombinedDateCondition(DateCondition):
   '''Класс-декторатор, позволяющий скомбинировать два нижележащих объекта:
   второй вызывается каждый раз, когда очередную дату возвращает первый, при
-  этом эта дата передаётся второму объекту в качестве стартовой.'''
+  этом эта дата передаётся второму объекту в качестве стартовой.
+
+  Даты, которые выдаёт второй объект, начиная с очередной даты первого,
+  берутся до следующей даты первого объекта (не включая её), так что при
+  сканировании в обоих направлениях выдаются одни и те же даты.'''
+
+  __slots__ = ('cond', 'cond2')
 
   def __init__(self, cond, cond2, scanBack=False):
     '''Конструктор
@@ -1047,6 +1732,37 @@ class CombinedDateCondition(DateCondition):
     self.cond = cond
     self.cond2 = cond2
 
+  def _reachability(self):
+    # every date comes from scanning `cond2` forward from a date of `cond`
+    r = self.cond.reachability()
+    r2 = self.cond2.reachability()
+    if r.isEmpty() or r2.isEmpty():
+      return Reachability.empty()
+    return Reachability(from_=r.from_, until=r2.until)
+
+  def _compile(self):
+    # only a single date repeated forward (REM date *N) is compiled
+    if type(self.cond2) is not RepeatDateCondition or self.cond2.timedelta.days <= 0:
+      return None
+    r = self.cond.reachability()
+    if r.isEmpty():
+      return _never
+    if r.from_ is None or r.from_ != r.until:
+      return None
+    inner = self.cond.compile()
+    if inner is None:
+      return None
+    first = inner(r.from_.toordinal())
+    if first is None:
+      return _never
+    period = self.cond2.timedelta.days
+    def nxt(ordinal):
+      if ordinal <= first:
+        return first
+      ordinal = first - (first - ordinal) // period * period
+      return ordinal if ordinal <= _MAX_ORDINAL else None
+    return nxt
+
   def scan(self, startDate):
     return self.__scan(startDate, False)
 
@@ -1055,23 +1771,22 @@ class CombinedDateCondition(DateCondition):
 
   def __scan(self, startDate, back=False):
     if back:
-      try:
-        # take ONE step back on the first DateCondition
-        date = next(iter(self.__applyCond(startDate, back)))
-      except StopIteration:
-        pass
-      else:
-        # run the second DateCondition forward and reverse the result
+      bound = startDate
+      for date in self.__applyCond(startDate, back):
+        # run the second DateCondition forward up to the bound and reverse the result
         gen = self.__applyCond2(date)
-        gen = itertools.takewhile(lambda date: date <= startDate, gen)
+        gen = itertools.takewhile(lambda date2: date2 <= bound, gen)
         # use a temporary list for reversion because using built-in
         # reversed() function on a `takewhile` object leads to an error
         dates = list(gen)
         dates.reverse()
         for date2 in dates:
           yield date2
+        try:
+          bound = date - datetime.timedelta(days=1)
+        except OverflowError:
+          return
     else:
-
       dates = iter(self.__applyCond(startDate, back))
       try:
         firstDate = next(dates)
@@ -1084,23 +1799,24 @@ class CombinedDateCondition(DateCondition):
         except StopIteration:
           pass
         else:
-
-          # here's what all checks are made for: handle one step back
+          # handle one step back: the segment started before startDate
           gen = self.__applyCond2(lastDate)
-          acceptableDate = lambda date, startDate: date >= startDate if not back \
-            else lambda date, startDate: date <= startDate
-          gen = itertools.dropwhile(lambda date: not acceptableDate(date, startDate), gen)
+          gen = itertools.dropwhile(lambda date2: date2 < startDate, gen)
           if firstDate is not None:
-            gen = itertools.takewhile(lambda date: not acceptableDate(date, firstDate), gen)
+            gen = itertools.takewhile(lambda date2: date2 < firstDate, gen)
           for date2 in gen:
             yield date2
 
       if firstDate is not None:
-        for date2 in self.__applyCond2(firstDate):
-          yield date2
-        for date in dates:
+        date = firstDate
+        for nextDate in dates:
           for date2 in self.__applyCond2(date):
+            if date2 >= nextDate:
+              break
             yield date2
+          date = nextDate
+        for date2 in self.__applyCond2(date):
+          yield date2
 
   def __applyCond(self, date, back=False):
     return self.cond.scan(date) if not back \
@@ -1136,6 +1852,65 @@ class CombinedDateCondition(DateCondition):
         datetime.date(2010, 3, 27),
       ])
 
+    def test_scanBack(self):
+      dates = CombinedDateCondition(
+        SimpleDateCondition(2010, None, 1),
+        LimitedDateCondition(maxMatches=1,
+          cond=SimpleDateCondition(weekdays=[2]))).scanBack(self.startDate)
+      self.assertEqual(list(itertools.islice(dates, 3)), [
+        datetime.date(2010, 3, 3),
+        datetime.date(2010, 2, 3),
+        datetime.date(2010, 1, 6),
+      ])
+
+    def test_scanBackRepeat(self):
+      dates = CombinedDateCondition(
+        SimpleDateCondition(2010, 3, 15),
+        RepeatDateCondition(7)).scanBack(self.startDate)
+      self.assertEqual(list(dates), [
+        datetime.date(2010, 3, 29),
+        datetime.date(2010, 3, 22),
+        datetime.date(2010, 3, 15),
+      ])
+
+    def test_resync(self):
+      # the repetition restarts at every date of the first condition
+      cond = CombinedDateCondition(SimpleDateCondition(2010, None, 1), RepeatDateCondition(10))
+      self.assertEqual(list(itertools.islice(cond.scan(datetime.date(2010, 3, 1)), 6)), [
+        datetime.date(2010, 3, 1),
+        datetime.date(2010, 3, 11),
+        datetime.date(2010, 3, 21),
+        datetime.date(2010, 3, 31),
+        datetime.date(2010, 4, 1),
+        datetime.date(2010, 4, 11),
+      ])
+
+    def test_scanBackMirrorsScan(self):
+      D = datetime.date
+      conds = [
+        (SimpleDateCondition(2010, None, 1), RepeatDateCondition(10)),
+        (SimpleDateCondition(2010, None, 8), RepeatDateCondition(8)),
+        (SimpleDateCondition(None, None, 31), RepeatDateCondition(3)),
+        (SimpleDateCondition(2010, 3, 15), RepeatDateCondition(7)),
+        (SimpleDateCondition(weekdays=[0]), RepeatDateCondition(2)),
+        (SimpleDateCondition(weekdays=[0, 3]), RepeatDateCondition(5)),
+        (SimpleDateCondition(2010, None, 1),
+          LimitedDateCondition(maxMatches=1, cond=SimpleDateCondition(weekdays=[2]))),
+        (SimpleDateCondition(None, None, 28),
+          LimitedDateCondition(maxMatches=2, cond=SimpleDateCondition(weekdays=[5, 6]))),
+        (ShiftDateCondition(SimpleDateCondition(None, 2, 29), -3), RepeatDateCondition(400)),
+      ]
+      windows = [(D(2009, 12, 20), D(2010, 2, 10)), (D(2010, 3, 1), D(2010, 3, 1)),
+        (D(2010, 3, 2), D(2010, 5, 17)), (D(2010, 12, 25), D(2011, 2, 3)),
+        (D(2008, 2, 20), D(2009, 4, 1))]
+      for cond, cond2 in conds:
+        combined = CombinedDateCondition(cond, cond2)
+        for fromDate, toDate in windows:
+          forward = list(itertools.takewhile(lambda date: date <= toDate, combined.scan(fromDate)))
+          backward = list(itertools.takewhile(lambda date: date >= fromDate, combined.scanBack(toDate)))
+          self.assertEqual(backward, forward[::-1], (cond, cond2, fromDate, toDate))
+          self.assertEqual(forward, sorted(set(forward)))
+
     def test_partiallyBackward(self):
       dates = CombinedDateCondition(
         SimpleDateCondition(2010, None, 8),
@@ -1147,6 +1922,494 @@ class CombinedDateCondition(DateCondition):
         datetime.date(2010, 4, 16),
       ])
 
+    def test_compile(self):
+      cond = LimitedDateCondition(CombinedDateCondition(
+        ShiftDateCondition(SimpleDateCondition(2010, 3, 15), -3),
+        RepeatDateCondition(8)), until=datetime.date(2010, 5, 1))
+      self.assertEqual(list(_iterCompiled(cond.compile(), self.startDate)),
+        list(cond.scan(self.startDate)))
+      # the result of scanning several dates of the first condition depends
+      # on the start date
+      cond = CombinedDateCondition(SimpleDateCondition(2010, None, 8), RepeatDateCondition(8))
+      self.assertIsNone(cond.compile())
+
+
+def _monthIndex(year, month):
+  return year * 12 + month - 1
+
+def _monthFromIndex(index):
+  year, month = divmod(index, 12)
+  return year, month + 1
+
+
+class NthWeekdayDateCondition(DateCondition):
+  '''Класс, выбирающий в каждом подходящем месяце одну дату: первую дату,
+  приходящуюся на один из заданных дней недели, не раньше заданного дня
+  месяца, а если номер дня отрицательный - последнюю такую дату не позже дня,
+  отсчитанного от конца месяца (-1 - последний день месяца).
+
+  Так, C{NthWeekdayDateCondition([4], 8)} - вторая пятница каждого месяца, а
+  C{NthWeekdayDateCondition([4], -1)} - последняя пятница.  Дата может выйти
+  за пределы месяца: C{NthWeekdayDateCondition([2], 31, 2010, 1)} - это
+  3 февраля 2010 года.  Именно так условие «дни недели и день» обрабатывает
+  Remind, поэтому такие условия строит парсер
+  L{DateConditionParser<StringParser.DateConditionParser>}.
+
+  Даты вычисляются арифметически, по одной на каждый месяц, без перебора дней.
+  '''
+
+  __slots__ = ('weekdayMask', 'day', 'year', 'month', 'nonexistingDaysHandling')
+
+  def __init__(self, weekdays, day, year=None, month=None,
+      nonexistingDaysHandling=NonExistingDaysHandling.WRAP):
+    '''Конструктор
+
+    @param weekdays: непустой список дней недели (0 - понедельник, 6 - воскресенье)
+    @param day: номер дня (1-31) или номер дня от конца месяца (от -31 до -1)
+    @param year: полный номер года или C{None}
+    @param month: номер месяца (1-12) или C{None}
+    @param nonexistingDaysHandling: элемент «перечисления»
+      L{NonExistingDaysHandling<utils.dates.NonExistingDaysHandling>}: что
+      делать, если дня в месяце нет.  C{WRAP} означает ближайший к нему день
+      месяца, C{SKIP} - пропуск месяца.
+    @raise ValueError: список дней недели пуст или номер дня вне допустимых пределов
+    '''
+    if not weekdays:
+      raise ValueError('Weekdays must not be empty')
+    if day == 0 or not -31 <= day <= 31:
+      raise ValueError('Day must be in 1..31 or in -31..-1')
+    super(NthWeekdayDateCondition, self).__init__()
+    self.weekdayMask = 0
+    for weekday in weekdays:
+      self.weekdayMask |= 1 << weekday
+    self.day = day
+    self.year = year
+    self.month = month
+    self.nonexistingDaysHandling = nonexistingDaysHandling
+
+  @staticmethod
+  def nth(weekdays, n, year=None, month=None):
+    '''Сконструировать условие «n-й день недели месяца»
+
+    @param weekdays: непустой список дней недели
+    @param n: номер (от 1 до 4) или номер от конца месяца (от -4 до -1)
+    @param year: полный номер года или C{None}
+    @param month: номер месяца (1-12) или C{None}
+    @returns: объект класса L{NthWeekdayDateCondition}
+    @raise ValueError: номер вне допустимых пределов
+    '''
+    if n == 0 or not -4 <= n <= 4:
+      raise ValueError('n must be in 1..4 or in -4..-1')
+    return NthWeekdayDateCondition(weekdays, 7 * (n - 1) + 1 if n > 0 else 7 * (n + 1) - 1,
+      year, month)
+
+  @property
+  def weekdays(self):
+    '''Отсортированный список дней недели'''
+    return [weekday for weekday in range(7) if self.weekdayMask >> weekday & 1]
+
+  _startIndependent = True
+
+  def __never(self):
+    # with SKIP, a fixed month may never have the day
+    return self.month is not None and \
+      self.nonexistingDaysHandling == NonExistingDaysHandling.SKIP and \
+      abs(self.day) > dateutils.monthLength(2000, self.month)
+
+  def _reachability(self):
+    if self.__never():
+      return Reachability.empty()
+    if self.year is None:
+      return Reachability()
+    # the date may leave the month by up to 6 days
+    try:
+      from_ = datetime.date(self.year, self.month or 1, 1) - _DAYS[6]
+    except OverflowError:
+      from_ = None
+    try:
+      until = dateutils.lastDayOfMonth(self.year, self.month or 12) + _DAYS[6]
+    except OverflowError:
+      until = None
+    return Reachability(from_=from_, until=until)
+
+  def occurrence(self, year, month):
+    '''Вычислить дату, выбранную условием в заданном месяце (ограничения на
+    год и месяц не проверяются)
+
+    @param year: полный номер года
+    @param month: номер месяца (1-12)
+    @returns: объект класса C{datetime.date} или C{None}, если в месяце
+      нет подходящей даты
+    @raise ValueError: дня в месяце нет, и задан способ обработки C{RAISE}
+    '''
+    length = dateutils.monthLength(year, month)
+    day = self.day if self.day > 0 else length + 1 + self.day
+    if not 1 <= day <= length:
+      if self.nonexistingDaysHandling == NonExistingDaysHandling.SKIP:
+        return None
+      if self.nonexistingDaysHandling == NonExistingDaysHandling.RAISE:
+        raise ValueError('day is out of range for month')
+      day = min(max(day, 1), length)
+    date = datetime.date(year, month, day)
+    back = self.day < 0
+    days = _DAYS[_weekdayTables(self.weekdayMask, back)[0][date.weekday()]]
+    try:
+      return date + days if not back else date - days
+    except OverflowError:
+      return None
+
+  def _compile(self):
+    if self.__never():
+      return _never
+    def nxt(ordinal):
+      if ordinal > _MAX_ORDINAL:
+        return None
+      date = datetime.date.fromordinal(ordinal)
+      # the date of the previous month may fall into the month of the ordinal
+      index = _monthIndex(date.year, date.month) - 1
+      step = 1
+      if self.month is not None:
+        index += (self.month - 1 - index) % 12
+        step = 12
+      while True:
+        year, month = _monthFromIndex(index)
+        if not datetime.MINYEAR <= year <= datetime.MAXYEAR:
+          return None
+        if self.year is not None and year != self.year:
+          if year > self.year:
+            return None
+          index = _monthIndex(self.year, self.month or 1)
+          continue
+        occurrence = self.occurrence(year, month)
+        if occurrence is not None and occurrence.toordinal() >= ordinal:
+          return occurrence.toordinal()
+        index += step
+    return nxt
+
+  def scan(self, startDate):
+    return self.__scan(startDate, False)
+
+  def scanBack(self, startDate):
+    return self.__scan(startDate, True)
+
+  def __scan(self, startDate, back):
+    if self.__never():
+      return
+    sign = 1 if not back else -1
+    # the date of the adjacent month may fall into the month of startDate
+    index = _monthIndex(startDate.year, startDate.month) - sign
+    step = sign
+    if self.month is not None:
+      index += ((self.month - 1 - index) % 12) * sign if not back \
+        else -((index - (self.month - 1)) % 12)
+      step = 12 * sign
+    while True:
+      year, month = _monthFromIndex(index)
+      if not datetime.MINYEAR <= year <= datetime.MAXYEAR:
+        return
+      if self.year is not None and year != self.year:
+        if (year - self.year) * sign > 0:
+          return
+        if self.month is not None:
+          month = self.month
+        else:
+          month = 1 if not back else 12
+        index = _monthIndex(self.year, month)
+        continue
+      date = self.occurrence(year, month)
+      if date is not None and (date >= startDate if not back else date <= startDate):
+        yield date
+      index += step
+
+
+  class Test(unittest.TestCase):
+    '''Набор unit-тестов'''
+
+    def setUp(self):
+      self.startDate = datetime.date(2010, 1, 10)
+
+    def test_nth(self):
+      dates = NthWeekdayDateCondition.nth([1], 2).scan(self.startDate)
+      self.assertEqual(list(itertools.islice(dates, 3)), [
+        datetime.date(2010, 1, 12),
+        datetime.date(2010, 2, 9),
+        datetime.date(2010, 3, 9),
+      ])
+
+    def test_last(self):
+      dates = NthWeekdayDateCondition.nth([4], -1).scanBack(datetime.date(2010, 4, 29))
+      self.assertEqual(list(itertools.islice(dates, 3)), [
+        datetime.date(2010, 3, 26),
+        datetime.date(2010, 2, 26),
+        datetime.date(2010, 1, 29),
+      ])
+
+    def test_spill(self):
+      cond = NthWeekdayDateCondition([2], 31, 2010)
+      self.assertEqual(list(itertools.islice(cond.scan(datetime.date(2010, 12, 30)), 3)), [
+        datetime.date(2011, 1, 5),
+      ])
+      self.assertEqual(next(iter(cond.scan(datetime.date(2010, 2, 1)))), datetime.date(2010, 2, 3))
+
+    def test_combinedEquivalence(self):
+      for weekdays, year, month, day in (([2], None, None, 1), ([0, 4], 2010, None, 31),
+          ([6], None, 2, 29), ([3], 2010, 3, 15)):
+        cond = NthWeekdayDateCondition(weekdays, day, year, month)
+        combined = CombinedDateCondition(SimpleDateCondition(year, month, day),
+          LimitedDateCondition(maxMatches=1, cond=SimpleDateCondition(weekdays=weekdays)))
+        for startDate in (datetime.date(2009, 12, 30), datetime.date(2010, 3, 1),
+            datetime.date(2010, 3, 17)):
+          self.assertEqual(list(itertools.islice(cond.scan(startDate), 15)),
+            list(itertools.islice(combined.scan(startDate), 15)))
+          self.assertEqual(list(itertools.islice(cond.scanBack(startDate), 15)),
+            list(itertools.islice(combined.scanBack(startDate), 15)))
+
+    def test_skip(self):
+      cond = NthWeekdayDateCondition([0], 31, month=4,
+        nonexistingDaysHandling=NonExistingDaysHandling.SKIP)
+      self.assertEqual(list(cond.scan(self.startDate)), [])
+      self.assertTrue(cond.reachability().isEmpty())
+
+
+class WeeklyDateCondition(DateCondition):
+  '''Класс, выбирающий заданные дни недели каждой M{N}-й недели, начиная с
+  недели, на которую приходится начальная дата (недели начинаются с
+  понедельника).  Даты раньше начальной не выбираются.
+
+  Даты вычисляются арифметически по порядковым номерам дней.'''
+
+  __slots__ = ('weekdayMask', 'interval', 'start')
+
+  def __init__(self, weekdays, interval, start):
+    '''Конструктор
+
+    @param weekdays: непустой список дней недели (0 - понедельник, 6 - воскресенье)
+    @param interval: положительный интервал в неделях
+    @param start: объект класса C{datetime.date}, начальная дата
+    @raise ValueError: список дней недели пуст или интервал не положителен
+    '''
+    if not weekdays:
+      raise ValueError('Weekdays must not be empty')
+    if interval <= 0:
+      raise ValueError('Interval must be positive')
+    super(WeeklyDateCondition, self).__init__()
+    self.weekdayMask = 0
+    for weekday in weekdays:
+      self.weekdayMask |= 1 << weekday
+    self.interval = interval
+    self.start = start
+
+  @property
+  def weekdays(self):
+    '''Отсортированный список дней недели'''
+    return [weekday for weekday in range(7) if self.weekdayMask >> weekday & 1]
+
+  _startIndependent = True
+
+  def _reachability(self):
+    return Reachability(from_=self.start)
+
+  def _compile(self):
+    base = self.start.toordinal() - self.start.weekday()
+    toMatching = _weekdayTables(self.weekdayMask, False)[0]
+    startOrdinal = self.start.toordinal()
+    interval = self.interval
+    def nxt(ordinal):
+      ordinal = max(ordinal, startOrdinal)
+      while ordinal <= _MAX_ORDINAL:
+        week, weekday = divmod(ordinal - base, 7)
+        if week % interval:
+          ordinal = base + 7 * (week + interval - week % interval)
+          continue
+        ordinal += toMatching[weekday]
+        if (ordinal - base) // 7 == week:
+          return ordinal if ordinal <= _MAX_ORDINAL else None
+      return None
+    return nxt
+
+  def scan(self, startDate):
+    # ordinal of the Monday of the first week
+    base = self.start.toordinal() - self.start.weekday()
+    toMatching = _weekdayTables(self.weekdayMask, False)[0]
+    maxOrdinal = datetime.date.max.toordinal()
+    ordinal = max(startDate, self.start).toordinal()
+    while ordinal <= maxOrdinal:
+      week, weekday = divmod(ordinal - base, 7)
+      if week % self.interval:
+        ordinal = base + 7 * (week + self.interval - week % self.interval)
+        continue
+      ordinal += toMatching[weekday]
+      if (ordinal - base) // 7 != week:
+        continue
+      if ordinal > maxOrdinal:
+        return
+      yield datetime.date.fromordinal(ordinal)
+      ordinal += 1
+
+  def scanBack(self, startDate):
+    base = self.start.toordinal() - self.start.weekday()
+    toMatching = _weekdayTables(self.weekdayMask, True)[0]
+    minOrdinal = self.start.toordinal()
+    ordinal = startDate.toordinal()
+    while ordinal >= minOrdinal:
+      week, weekday = divmod(ordinal - base, 7)
+      if week % self.interval:
+        ordinal = base + 7 * (week - week % self.interval) + 6
+        continue
+      ordinal -= toMatching[weekday]
+      if ordinal < minOrdinal:
+        return
+      if (ordinal - base) // 7 != week:
+        continue
+      yield datetime.date.fromordinal(ordinal)
+      ordinal -= 1
+
+
+  class Test(unittest.TestCase):
+    '''Набор unit-тестов'''
+
+    def setUp(self):
+      # Wednesday
+      self.cond = WeeklyDateCondition([0, 2], 2, datetime.date(2010, 3, 3))
+
+    def test_scan(self):
+      self.assertEqual(list(itertools.islice(self.cond.scan(datetime.date(2010, 3, 1)), 4)), [
+        datetime.date(2010, 3, 3),
+        datetime.date(2010, 3, 15),
+        datetime.date(2010, 3, 17),
+        datetime.date(2010, 3, 29),
+      ])
+
+    def test_scanBack(self):
+      self.assertEqual(list(self.cond.scanBack(datetime.date(2010, 3, 28))), [
+        datetime.date(2010, 3, 17),
+        datetime.date(2010, 3, 15),
+        datetime.date(2010, 3, 3),
+      ])
+
+
+class MonthlyDateCondition(DateCondition):
+  '''Класс, выбирающий заданный день каждого M{N}-го месяца, начиная с месяца,
+  на который приходится начальная дата.  Даты раньше начальной не
+  выбираются.'''
+
+  __slots__ = ('day', 'interval', 'start', 'nonexistingDaysHandling')
+
+  # with SKIP, give up after this many months in a row without the day
+  _MAX_SKIPPED = 12
+
+  def __init__(self, day, interval, start, nonexistingDaysHandling=NonExistingDaysHandling.WRAP):
+    '''Конструктор
+
+    @param day: номер дня (1-31)
+    @param interval: положительный интервал в месяцах
+    @param start: объект класса C{datetime.date}, начальная дата
+    @param nonexistingDaysHandling: элемент «перечисления»
+      L{NonExistingDaysHandling<utils.dates.NonExistingDaysHandling>}
+    @raise ValueError: номер дня вне пределов 1-31 или интервал не положителен
+    '''
+    if not 1 <= day <= 31:
+      raise ValueError('Day must be in 1..31')
+    if interval <= 0:
+      raise ValueError('Interval must be positive')
+    super(MonthlyDateCondition, self).__init__()
+    self.day = day
+    self.interval = interval
+    self.start = start
+    self.nonexistingDaysHandling = nonexistingDaysHandling
+
+  _startIndependent = True
+
+  def _reachability(self):
+    return Reachability(from_=self.start)
+
+  def _compile(self):
+    if self.nonexistingDaysHandling == NonExistingDaysHandling.RAISE:
+      return None
+    first = _monthIndex(self.start.year, self.start.month)
+    startOrdinal = self.start.toordinal()
+    interval = self.interval
+    def nxt(ordinal):
+      ordinal = max(ordinal, startOrdinal)
+      if ordinal > _MAX_ORDINAL:
+        return None
+      date = datetime.date.fromordinal(ordinal)
+      index = _monthIndex(date.year, date.month)
+      index += (interval - (index - first) % interval) % interval
+      skipped = 0
+      while skipped < self._MAX_SKIPPED:
+        year, month = _monthFromIndex(index)
+        if year > datetime.MAXYEAR:
+          return None
+        day = dateutils.wrapDay(year, month, self.day, self.nonexistingDaysHandling)
+        index += interval
+        if day is None:
+          skipped += 1
+          continue
+        skipped = 0
+        candidate = datetime.date(year, month, day).toordinal()
+        if candidate >= ordinal:
+          return candidate
+      return None
+    return nxt
+
+  def scan(self, startDate):
+    return self.__scan(startDate, False)
+
+  def scanBack(self, startDate):
+    return self.__scan(startDate, True)
+
+  def __scan(self, startDate, back):
+    first = _monthIndex(self.start.year, self.start.month)
+    if not back:
+      startDate = max(startDate, self.start)
+    index = _monthIndex(startDate.year, startDate.month)
+    offset = (index - first) % self.interval
+    if not back:
+      index += (self.interval - offset) % self.interval
+      step = self.interval
+    else:
+      index -= offset
+      step = -self.interval
+    skipped = 0
+    while first <= index and skipped < self._MAX_SKIPPED:
+      year, month = _monthFromIndex(index)
+      if year > datetime.MAXYEAR:
+        return
+      day = dateutils.wrapDay(year, month, self.day, self.nonexistingDaysHandling)
+      index += step
+      if day is None:
+        skipped += 1
+        continue
+      skipped = 0
+      date = datetime.date(year, month, day)
+      if (date >= startDate if not back else date <= startDate) and date >= self.start:
+        yield date
+
+
+  class Test(unittest.TestCase):
+    '''Набор unit-тестов'''
+
+    def test_scan(self):
+      cond = MonthlyDateCondition(31, 3, datetime.date(2010, 1, 31))
+      self.assertEqual(list(itertools.islice(cond.scan(datetime.date(2010, 2, 1)), 3)), [
+        datetime.date(2010, 4, 30),
+        datetime.date(2010, 7, 31),
+        datetime.date(2010, 10, 31),
+      ])
+
+    def test_scanBack(self):
+      cond = MonthlyDateCondition(15, 2, datetime.date(2010, 1, 20))
+      self.assertEqual(list(cond.scanBack(datetime.date(2010, 7, 14))), [
+        datetime.date(2010, 5, 15),
+        datetime.date(2010, 3, 15),
+      ])
+
+    def test_skip(self):
+      cond = MonthlyDateCondition(31, 12, datetime.date(2010, 2, 1),
+        nonexistingDaysHandling=NonExistingDaysHandling.SKIP)
+      self.assertEqual(list(cond.scan(datetime.date(2010, 1, 1))), [])
+
 
 from .StringParser import DateConditionParser
 
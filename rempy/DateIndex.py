@@ -0,0 +1,138 @@
+'''Содержит класс L{DateIndex}, позволяющий быстро выбрать напоминалки, под
+которые может подпадать заданная дата
+
+При запуске из командной строки запускает присутствующие в модуле unit-тесты.'''
+
+import datetime
+import unittest
+
+from .DateCondition import SimpleDateCondition
+
+
+# Days that exist in every month/year, so that a day number of a simple
+# condition can be used as a key without regard to non-existing days handling
+_MIN_MONTH_LENGTH = 28
+_MONTH_LENGTHS = (31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31)
+
+
+class DateIndex:
+  '''Инвертированный индекс напоминалок по датам.
+
+  Напоминалки с условиями класса
+  L{SimpleDateCondition<DateCondition.SimpleDateCondition>} раскладываются по
+  «корзинам» в соответствии с самым избирательным из заданных в условии
+  полей: по фиксированной дате, по паре (месяц, день), по дню, по месяцу или
+  по дням недели.  Все остальные напоминалки (со сложными условиями, а также с
+  ненулевым количеством дней для заблаговременного предупреждения в режиме
+  напоминания) попадают в «остаток», который просматривается при каждом
+  запросе.
+
+  Индекс выбирает I{кандидатов}: каждая напоминалка, под которую подпадает
+  дата, обязательно будет выбрана, но выбранные напоминалки нужно
+  дополнительно проверить, например, методом
+  L{Runner.iterEvents<Runner.Runner.iterEvents>}.
+
+  @ivar mode: режим запуска, для которого строится индекс (константа из
+    «перечисления» L{RunnerMode<Runner.RunnerMode>})
+  '''
+
+  def __init__(self, mode):
+    '''Конструктор
+
+    @param mode: константа из «перечисления» L{RunnerMode<Runner.RunnerMode>}
+    '''
+    super(DateIndex, self).__init__()
+    self.mode = mode
+    self.fixed = {}
+    self.monthDays = {}
+    self.days = {}
+    self.months = {}
+    self.weekdays = {}
+    self.residual = []
+
+  def add(self, ordinal, reminder):
+    '''Добавить напоминалку в индекс
+
+    @param ordinal: порядковый номер напоминалки, по которому упорядочиваются
+      кандидаты
+    @param reminder: объект класса L{Reminder<Reminder.Reminder>}
+    '''
+    from .Runner import RunnerMode
+    item = (ordinal, reminder)
+    cond = reminder.condition(self.mode)
+    if type(cond) is not SimpleDateCondition or \
+        (self.mode == RunnerMode.REMIND and reminder.advanceWarningValue() > 0):
+      self.residual.append(item)
+      return
+
+    if cond.weekdays == []:
+      return
+    if cond.year is not None and cond.month is not None and cond.day is not None:
+      if cond.theMatchingDay is not None:
+        self.fixed.setdefault(cond.theMatchingDay, []).append(item)
+    elif cond.month is not None and cond.day is not None and \
+        cond.day <= _MONTH_LENGTHS[cond.month - 1]:
+      self.monthDays.setdefault((cond.month, cond.day), []).append(item)
+    elif cond.day is not None and cond.day <= _MIN_MONTH_LENGTH:
+      self.days.setdefault(cond.day, []).append(item)
+    elif cond.month is not None:
+      self.months.setdefault(cond.month, []).append(item)
+    elif cond.weekdays is not None:
+      for weekday in cond.weekdays:
+        self.weekdays.setdefault(weekday, []).append(item)
+    else:
+      self.residual.append(item)
+
+  def candidates(self, date):
+    '''Выбрать напоминалки, под которые может подпадать дата
+
+    @param date: объект класса C{datetime.date}
+    @returns: список кортежей (порядковый номер, объект класса
+      L{Reminder<Reminder.Reminder>}), упорядоченный по порядковым номерам
+    '''
+    ret = []
+    ret.extend(self.fixed.get(date, ()))
+    ret.extend(self.monthDays.get((date.month, date.day), ()))
+    ret.extend(self.days.get(date.day, ()))
+    ret.extend(self.months.get(date.month, ()))
+    ret.extend(self.weekdays.get(date.weekday(), ()))
+    ret.extend(self.residual)
+    ret.sort(key=lambda item: item[0])
+    return ret
+
+
+  class Test(unittest.TestCase):
+    '''Набор unit-тестов'''
+
+    def setUp(self):
+      from .Reminder import ShortcutReminder
+      from .Runner import RunnerMode
+      self.index = DateIndex(RunnerMode.REMIND)
+      strings = [
+        'REM 2010-03-01 MSG Fixed',
+        'REM March 1 MSG MonthDay',
+        'REM 1 MSG Day',
+        'REM 31 MSG LastDay',
+        'REM Mon Tue MSG Weekdays',
+        'REM 1 +3 MSG Advance',
+        'REM 2010-03-02 MSG OtherDate',
+        'REM Sun MSG Sunday',
+      ]
+      for i, string in enumerate(strings):
+        self.index.add(i, ShortcutReminder.fromString(string))
+
+    def __messages(self, date):
+      return [reminder.action.message for _, reminder in self.index.candidates(date)]
+
+    def test_candidates(self):
+      self.assertEqual(self.__messages(datetime.date(2010, 3, 1)),
+        ['Fixed', 'MonthDay', 'Day', 'LastDay', 'Weekdays', 'Advance'])
+
+    def test_nonexistingDay(self):
+      # REM 31 matches the last day of shorter months
+      self.assertEqual(self.__messages(datetime.date(2010, 4, 30)),
+        ['LastDay', 'Advance'])
+
+
+if __name__ == '__main__':
+  unittest.main()
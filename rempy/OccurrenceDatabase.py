@@ -0,0 +1,280 @@
+'''Содержит классы L{OccurrenceDatabase} и L{DatabaseRunner}, позволяющие
+сохранять события в базу данных SQLite и выбирать их оттуда
+
+При запуске из командной строки запускает присутствующие в модуле unit-тесты.'''
+
+import datetime
+import itertools
+import sqlite3
+import unittest
+
+from .Action import captureOutput
+from .Checkpoint import Checkpoint, reminderDigest
+from .Runner import Runner, RunnerMode
+
+
+class OccurrenceDatabase:
+  '''База данных SQLite с таблицей событий C{occurrences} (дата, хэш
+  «отпечатка» напоминалки, сообщение, признак заблаговременного
+  предупреждения) и индексом по дате, так что события любого диапазона дат
+  выбираются по индексу.
+
+  Кроме событий, в базе хранится, для какого набора напоминалок (см.
+  L{Checkpoint.fingerprint<Checkpoint.Checkpoint.fingerprint>}) и для какого
+  диапазона дат в режиме L{EVENTS<Runner.RunnerMode.EVENTS>} таблица
+  заполнена полностью.  Метод L{fill} дозаполняет таблицу до заданного
+  диапазона, не вычисляя заново уже заполненные даты, а метод L{query}
+  после этого отвечает на запрос из таблицы.  Заблаговременные
+  предупреждения в таблице не хранятся: они зависят от даты запроса.
+  '''
+
+  def __init__(self, filename):
+    '''Конструктор
+
+    @param filename: имя файла базы данных (создаётся, если его нет) или
+      C{':memory:'}
+    '''
+    super(OccurrenceDatabase, self).__init__()
+    self.connection = sqlite3.connect(filename)
+    with self.connection:
+      self.connection.execute('CREATE TABLE IF NOT EXISTS occurrences ('
+        'date TEXT NOT NULL, reminder_id TEXT, message TEXT, is_warning INTEGER NOT NULL)')
+      self.connection.execute('CREATE INDEX IF NOT EXISTS occurrences_date ON occurrences (date)')
+      self.connection.execute('CREATE TABLE IF NOT EXISTS coverage ('
+        'fingerprint TEXT NOT NULL, from_date TEXT NOT NULL, to_date TEXT NOT NULL)')
+
+  def close(self):
+    '''Закрыть базу данных'''
+    self.connection.close()
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *exc):
+    self.close()
+
+  def insert(self, rows):
+    '''Добавить события одной транзакцией
+
+    @param rows: список кортежей (объект класса C{datetime.date}, хэш
+      «отпечатка» напоминалки или C{None}, сообщение, признак
+      заблаговременного предупреждения)
+    '''
+    with self.connection:
+      self.connection.executemany('INSERT INTO occurrences VALUES (?, ?, ?, ?)',
+        ((date.isoformat(), reminderId, message, int(isWarning))
+          for date, reminderId, message, isWarning in rows))
+
+  def clear(self):
+    '''Удалить все события и сведения о заполненном диапазоне'''
+    with self.connection:
+      self.connection.execute('DELETE FROM occurrences')
+      self.connection.execute('DELETE FROM coverage')
+
+  def select(self, fromDate, toDate):
+    '''Выбрать события из таблицы
+
+    @param fromDate: начальная дата
+    @param toDate: конечная дата
+    @returns: список кортежей (объект класса C{datetime.date}, хэш
+      «отпечатка» напоминалки, сообщение, признак заблаговременного
+      предупреждения) в порядке дат и, для одной даты, в порядке добавления
+    '''
+    cursor = self.connection.execute('SELECT date, reminder_id, message, is_warning '
+      'FROM occurrences WHERE date BETWEEN ? AND ? ORDER BY date, rowid',
+      (fromDate.isoformat(), toDate.isoformat()))
+    return [(datetime.date.fromisoformat(date), reminderId, message, bool(isWarning))
+      for date, reminderId, message, isWarning in cursor]
+
+  def coverage(self):
+    '''Получить сведения о заполненном диапазоне
+
+    @returns: кортеж («отпечаток» набора напоминалок, начальная дата,
+      конечная дата) или C{None}
+    '''
+    row = self.connection.execute('SELECT fingerprint, from_date, to_date FROM coverage').fetchone()
+    if row is None:
+      return None
+    return (row[0], datetime.date.fromisoformat(row[1]), datetime.date.fromisoformat(row[2]))
+
+  def __setCoverage(self, fingerprint, fromDate, toDate):
+    with self.connection:
+      self.connection.execute('DELETE FROM coverage')
+      self.connection.execute('INSERT INTO coverage VALUES (?, ?, ?)',
+        (fingerprint, fromDate.isoformat(), toDate.isoformat()))
+
+  def fill(self, runner, fromDate, toDate):
+    '''Заполнить таблицу событиями напоминалок C{runner} в режиме
+    L{EVENTS<Runner.RunnerMode.EVENTS>} на заданный диапазон дат.  Если набор
+    напоминалок тот же, что при заполнении таблицы, вычисляются и
+    добавляются только недостающие даты на краях заполненного диапазона.
+    Если набор изменился, его «отпечаток» неизвестен или запрошенный
+    диапазон не примыкает к заполненному, таблица заполняется заново.
+
+    @param runner: объект класса L{Runner<Runner.Runner>} с напоминалками
+    @param fromDate: начальная дата
+    @param toDate: конечная дата
+    '''
+    reminders = itertools.chain(runner.reminders, runner._storeReminders())
+    fingerprint = Checkpoint.fromReminders(reminders, fromDate, toDate, RunnerMode.EVENTS).fingerprint()
+    coverage = self.coverage()
+    if fingerprint is not None and coverage is not None and coverage[0] == fingerprint \
+        and fromDate <= coverage[2] + datetime.timedelta(days=1) \
+        and toDate >= coverage[1] - datetime.timedelta(days=1):
+      _, coveredFrom, coveredTo = coverage
+      missing = []
+      if fromDate < coveredFrom:
+        missing.append((fromDate, coveredFrom - datetime.timedelta(days=1)))
+      if toDate > coveredTo:
+        missing.append((coveredTo + datetime.timedelta(days=1), toDate))
+      coveredFrom, coveredTo = min(fromDate, coveredFrom), max(toDate, coveredTo)
+    else:
+      self.clear()
+      missing = [(fromDate, toDate)]
+      coveredFrom, coveredTo = fromDate, toDate
+    for start, end in missing:
+      DatabaseRunner(self, runner).run(start, end, RunnerMode.EVENTS)
+    if fingerprint is not None and missing:
+      self.__setCoverage(fingerprint, coveredFrom, coveredTo)
+
+  def query(self, runner, fromDate, toDate):
+    '''Получить события напоминалок C{runner} в режиме
+    L{EVENTS<Runner.RunnerMode.EVENTS>}, дозаполнив таблицу методом L{fill}
+
+    @param runner: объект класса L{Runner<Runner.Runner>} с напоминалками
+    @param fromDate: начальная дата
+    @param toDate: конечная дата
+    @returns: см. L{select}
+    '''
+    self.fill(runner, fromDate, toDate)
+    return self.select(fromDate, toDate)
+
+
+class DatabaseRunner(Runner):
+  '''Наследник класса L{Runner}, который вместо выполнения действий
+  записывает события в базу данных L{OccurrenceDatabase}.  Сообщением события
+  считается то, что действие напоминалки выводит (см.
+  L{outputStream<Action.outputStream>}).  События
+  только добавляются, а сведения о заполненном диапазоне не изменяются,
+  поэтому заполнять базу следует методом
+  L{OccurrenceDatabase.fill}, который использует этот класс.
+
+  События накапливаются и записываются пакетами по L{batchSize} строк, каждый
+  пакет - одной транзакцией.
+  '''
+
+  batchSize = 10000
+  '''Количество событий, записываемых одной транзакцией'''
+
+  def __init__(self, database, runner=None):
+    '''Конструктор
+
+    @param database: объект класса L{OccurrenceDatabase}
+    @param runner: если не C{None}, объект класса L{Runner}, напоминалки и
+      хранилища которого добавляются в создаваемый объект
+    '''
+    super(DatabaseRunner, self).__init__()
+    self.database = database
+    self.rows = []
+    self.digests = {}
+    if runner is not None:
+      self.reminders = list(runner.reminders)
+      self.stores = list(runner.stores)
+
+  def run(self, fromDate, toDate, mode):
+    super(DatabaseRunner, self).run(fromDate, toDate, mode)
+    self.__flush()
+
+  def _executeDay(self, date, events):
+    for reminder, isWarning in events:
+      output = captureOutput(reminder.execute, date)
+      # reminders of a store are created per event, but compare equal for
+      # the same row, so there is one entry per reminder
+      digest = self.digests.get(reminder)
+      if digest is None:
+        digest = self.digests[reminder] = reminderDigest(reminder)
+      self.rows.append((date, digest, output.rstrip('\n'), isWarning))
+    if len(self.rows) >= self.batchSize:
+      self.__flush()
+
+  def __flush(self):
+    if self.rows:
+      self.database.insert(self.rows)
+      self.rows = []
+
+
+  class Test(unittest.TestCase):
+    '''Набор unit-тестов'''
+
+    def setUp(self):
+      from .Reminder import ShortcutReminder
+      self.database = OccurrenceDatabase(':memory:')
+      self.runner = Runner()
+      self.runner.add(ShortcutReminder('15', 'a'))
+      self.runner.add(ShortcutReminder('Mon', 'b', 2))
+
+    def tearDown(self):
+      self.database.close()
+
+    def test_run(self):
+      D = datetime.date
+      runner = DatabaseRunner(self.database, self.runner)
+      runner.batchSize = 2
+      runner.run(D(2010, 5, 10), D(2010, 5, 15), RunnerMode.REMIND)
+      rows = self.database.select(D(2010, 1, 1), D(2010, 12, 31))
+      self.assertEqual([(date.day, message, isWarning) for date, _, message, isWarning in rows],
+        [(10, 'b', False), (15, 'a', False), (17, 'b', True)])
+      self.assertEqual(rows[0][1], reminderDigest(self.runner.reminders[1]))
+
+    def test_query(self):
+      D = datetime.date
+      def messages(rows):
+        return [(date.day, message) for date, _, message, _ in rows]
+      self.assertEqual(messages(self.database.query(self.runner, D(2010, 5, 14), D(2010, 5, 17))),
+        [(15, 'a'), (17, 'b')])
+      # widen the window: only the missing edges are computed
+      self.database.insert([(D(2010, 5, 16), None, 'marker', False)])
+      self.assertEqual(messages(self.database.query(self.runner, D(2010, 5, 10), D(2010, 5, 24))),
+        [(10, 'b'), (15, 'a'), (16, 'marker'), (17, 'b'), (24, 'b')])
+      self.assertEqual(self.database.coverage()[1:], (D(2010, 5, 10), D(2010, 5, 24)))
+      self.assertEqual(messages(self.database.query(self.runner, D(2010, 5, 16), D(2010, 5, 17))),
+        [(16, 'marker'), (17, 'b')])
+      # a changed reminder set refills the table
+      from .Reminder import ShortcutReminder
+      self.runner.add(ShortcutReminder('16', 'c'))
+      self.assertEqual(messages(self.database.query(self.runner, D(2010, 5, 16), D(2010, 5, 16))),
+        [(16, 'c')])
+
+    def test_store(self):
+      from .ColumnarStore import ColumnarStore
+      D = datetime.date
+      store, _ = ColumnarStore.fromReminders(self.runner.reminders)
+      runner = Runner()
+      runner.addStore(store)
+      self.database.query(runner, D(2010, 5, 1), D(2010, 5, 31))
+      # reminders of the store have fingerprints, so the coverage is known
+      self.assertEqual(self.database.coverage()[1:], (D(2010, 5, 1), D(2010, 5, 31)))
+      rows = self.database.select(D(2010, 5, 1), D(2010, 5, 31))
+      self.assertEqual(len(rows), 6)
+      self.assertEqual(len({reminderId for _, reminderId, _, _ in rows}), 2)
+      # the digests are computed once per store row, not per event
+      databaseRunner = DatabaseRunner(self.database, runner)
+      databaseRunner.run(D(2010, 5, 1), D(2010, 5, 31), RunnerMode.EVENTS)
+      self.assertEqual(len(databaseRunner.digests), 2)
+
+    def test_fill(self):
+      D = datetime.date
+      def messages(rows):
+        return [(date.day, message) for date, _, message, _ in rows]
+      expected = [(3, 'b'), (10, 'b'), (15, 'a'), (17, 'b'), (24, 'b'), (31, 'b')]
+      self.assertEqual(messages(self.database.query(self.runner, D(2010, 5, 1), D(2010, 5, 31))),
+        expected)
+      # like the remind command: covered days aren't added again, and
+      # advance warnings aren't stored
+      self.database.fill(self.runner, D(2010, 5, 10), D(2010, 5, 20))
+      self.assertEqual(messages(self.database.query(self.runner, D(2010, 5, 1), D(2010, 5, 31))),
+        expected)
+      self.database.fill(self.runner, D(2010, 5, 20), D(2010, 6, 7))
+      self.assertEqual(messages(self.database.select(D(2010, 5, 1), D(2010, 6, 30))),
+        expected + [(7, 'b')])
+      self.assertEqual(self.database.coverage()[1:], (D(2010, 5, 1), D(2010, 6, 7)))
@@ -0,0 +1,217 @@
+'''Содержит функции для построения матрицы событий «напоминалка × день»
+
+Для работы модуля необходим пакет numpy.  Матрицы строятся по строкам:
+строка для каждой напоминалки вычисляется методом
+L{DateCondition.mask<DateCondition.DateCondition.mask>}, который для простых
+условий вычисляется над массивами без перебора дат.
+
+При запуске из командной строки запускает присутствующие в модуле unit-тесты.'''
+
+import datetime
+import unittest
+
+try:
+  import numpy
+except ImportError:
+  numpy = None
+
+
+class DateGrid:
+  '''Диапазон дат, представленный массивами numpy, над которыми вычисляются
+  маски условий.  Все массивы имеют длину, равную количеству дней в
+  диапазоне; элемент с индексом M{i} соответствует дате M{fromDate + i}.
+
+  @ivar fromDate: начальная дата диапазона
+  @ivar toDate: конечная дата диапазона (включительно)
+  @ivar ordinals: порядковые номера дат (C{datetime.date.toordinal})
+  @ivar years: номера годов
+  @ivar months: номера месяцев (1-12)
+  @ivar days: номера дней в месяце
+  @ivar monthLengths: количества дней в месяцах, которым принадлежат даты
+  @ivar weekdays: дни недели (0 - понедельник, 6 - воскресенье)
+  '''
+
+  def __init__(self, fromDate, toDate):
+    '''Конструктор
+
+    @param fromDate: объект класса C{datetime.date}, начальная дата диапазона
+    @param toDate: объект класса C{datetime.date}, конечная дата диапазона (включительно)
+    @raise ImportError: пакет numpy не установлен
+    '''
+    if numpy is None:
+      raise ImportError('numpy is required to build occurrence matrices')
+    super(DateGrid, self).__init__()
+    self.fromDate = fromDate
+    self.toDate = toDate
+    n = max((toDate - fromDate).days + 1, 0)
+    dates = numpy.datetime64(fromDate, 'D') + numpy.arange(n)
+    monthStarts = dates.astype('datetime64[M]')
+    self.ordinals = numpy.arange(fromDate.toordinal(), fromDate.toordinal() + n)
+    self.years = dates.astype('datetime64[Y]').astype(int) + 1970
+    self.months = monthStarts.astype(int) % 12 + 1
+    self.days = (dates - monthStarts.astype('datetime64[D]')).astype(int) + 1
+    self.monthLengths = ((monthStarts + 1).astype('datetime64[D]') -
+      monthStarts.astype('datetime64[D]')).astype(int)
+    # datetime.date(1, 1, 1) is Monday
+    self.weekdays = (self.ordinals - 1) % 7
+
+  def __len__(self):
+    return len(self.ordinals)
+
+  def zeros(self):
+    '''Получить маску, в которой не выбрана ни одна дата
+
+    @returns: массив numpy типа C{bool}
+    '''
+    return numpy.zeros(len(self), dtype=bool)
+
+  def ones(self):
+    '''Получить маску, в которой выбраны все даты
+
+    @returns: массив numpy типа C{bool}
+    '''
+    return numpy.ones(len(self), dtype=bool)
+
+  def index(self, date):
+    '''Получить индекс даты в массивах
+
+    @param date: объект класса C{datetime.date}
+    @returns: целочисленный индекс
+    '''
+    return (date - self.fromDate).days
+
+  def date(self, index):
+    '''Получить дату по индексу в массивах
+
+    @param index: целочисленный индекс
+    @returns: объект класса C{datetime.date}
+    '''
+    return self.fromDate + datetime.timedelta(days=int(index))
+
+  def shifted(self, days):
+    '''Получить диапазон, сдвинутый на заданное количество дней
+
+    @param days: целочисленное смещение
+    @returns: объект класса L{DateGrid}
+    '''
+    timedelta = datetime.timedelta(days=days)
+    return DateGrid(self.fromDate + timedelta, self.toDate + timedelta)
+
+  def weekdayMask(self, weekdays):
+    '''Получить маску дат, приходящихся на заданные дни недели
+
+    @param weekdays: коллекция дней недели
+    @returns: массив numpy типа C{bool}
+    '''
+    return numpy.isin(self.weekdays, list(weekdays))
+
+  def rangeMask(self, from_=None, until=None):
+    '''Получить маску дат в заданных пределах
+
+    @param from_: объект класса C{datetime.date} или C{None}, если
+      ограничения снизу нет
+    @param until: объект класса C{datetime.date} или C{None}, если
+      ограничения сверху нет
+    @returns: массив numpy типа C{bool}
+    '''
+    ret = self.ones()
+    if from_ is not None:
+      ret &= self.ordinals >= from_.toordinal()
+    if until is not None:
+      ret &= self.ordinals <= until.toordinal()
+    return ret
+
+
+def _rows(reminders, grid, mode):
+  for reminder in reminders:
+    cond = reminder.condition(mode)
+    if not cond.reachability().intersects(grid.fromDate, grid.toDate):
+      yield grid.zeros()
+    else:
+      yield cond.mask(grid)
+
+def occurrenceMatrix(reminders, fromDate, toDate, mode):
+  '''Построить плотную матрицу событий
+
+  @param reminders: список объектов класса L{Reminder<Reminder.Reminder>}
+  @param fromDate: объект класса C{datetime.date}, задающий начальную дату
+  @param toDate: объект класса C{datetime.date}, задающий конечную дату (включительно)
+  @param mode: константа из «перечисления» L{RunnerMode<Runner.RunnerMode>}
+  @returns: двумерный массив numpy типа C{bool}, строки которого
+    соответствуют напоминалкам, а столбцы - датам диапазона
+  @raise ImportError: пакет numpy не установлен
+  '''
+  grid = DateGrid(fromDate, toDate)
+  ret = numpy.zeros((len(reminders), len(grid)), dtype=bool)
+  for i, row in enumerate(_rows(reminders, grid, mode)):
+    ret[i] = row
+  return ret
+
+def occurrenceIndices(reminders, fromDate, toDate, mode):
+  '''Построить разреженную матрицу событий в формате CSR (в виде, который
+  принимает, например, C{scipy.sparse.csr_matrix((data, indices, indptr))}).
+  Все ненулевые элементы матрицы равны C{True}, поэтому массив значений не
+  возвращается.
+
+  @param reminders: список объектов класса L{Reminder<Reminder.Reminder>}
+  @param fromDate: объект класса C{datetime.date}, задающий начальную дату
+  @param toDate: объект класса C{datetime.date}, задающий конечную дату (включительно)
+  @param mode: константа из «перечисления» L{RunnerMode<Runner.RunnerMode>}
+  @returns: кортеж массивов numpy (indptr, indices): столбцы событий
+    напоминалки с индексом M{i} - C{indices[indptr[i]:indptr[i+1]]}
+  @raise ImportError: пакет numpy не установлен
+  '''
+  grid = DateGrid(fromDate, toDate)
+  chunks = []
+  indptr = [0]
+  for row in _rows(reminders, grid, mode):
+    columns = numpy.flatnonzero(row)
+    chunks.append(columns)
+    indptr.append(indptr[-1] + len(columns))
+  indices = numpy.concatenate(chunks) if chunks else numpy.zeros(0, dtype=int)
+  return numpy.array(indptr), indices
+
+
+@unittest.skipIf(numpy is None, 'numpy is not installed')
+class _Test_occurrenceMatrix(unittest.TestCase):
+  '''Набор unit-тестов для функций L{occurrenceMatrix} и L{occurrenceIndices}'''
+
+  def setUp(self):
+    from .Reminder import ShortcutReminder
+    self.reminders = [ShortcutReminder.fromString(string) for string in (
+      'REM 31 MSG Last',
+      'REM Mon 1 MSG First Monday',
+      'REM Feb 1 *7 MSG Weekly in February',
+      'REM 2010-03-01 MSG Once',
+    )]
+    self.fromDate = datetime.date(2010, 2, 1)
+    self.toDate = datetime.date(2010, 3, 10)
+
+  def __expected(self, mode):
+    grid = DateGrid(self.fromDate, self.toDate)
+    ret = numpy.zeros((len(self.reminders), len(grid)), dtype=bool)
+    for i, reminder in enumerate(self.reminders):
+      for date in reminder.condition(mode).scan(self.fromDate):
+        if date > self.toDate:
+          break
+        ret[i, grid.index(date)] = True
+    return ret
+
+  def test_matrix(self):
+    from .Runner import RunnerMode
+    matrix = occurrenceMatrix(self.reminders, self.fromDate, self.toDate, RunnerMode.EVENTS)
+    self.assertTrue((matrix == self.__expected(RunnerMode.EVENTS)).all())
+    self.assertEqual(matrix[0].nonzero()[0].tolist(), [27])
+
+  def test_indices(self):
+    from .Runner import RunnerMode
+    indptr, indices = occurrenceIndices(self.reminders, self.fromDate, self.toDate,
+      RunnerMode.EVENTS)
+    expected = self.__expected(RunnerMode.EVENTS)
+    for i in range(len(self.reminders)):
+      self.assertEqual(indices[indptr[i]:indptr[i+1]].tolist(),
+        expected[i].nonzero()[0].tolist())
+
+
+if __name__ == '__main__':
+  unittest.main()
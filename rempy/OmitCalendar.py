@@ -0,0 +1,280 @@
+'''Содержит класс L{OmitCalendar}, описывающий пропускаемые (нерабочие) дни
+
+При запуске из командной строки запускает присутствующие в модуле unit-тесты.'''
+
+from array import array
+import datetime
+import itertools
+import unittest
+
+from .utils import FormatError
+from .utils import dates as dateutils
+
+
+_ALL_WEEKDAYS = 0x7f
+_MIN_ORDINAL = datetime.date.min.toordinal()
+_MAX_ORDINAL = datetime.date.max.toordinal()
+# 0 -> working day, 1 -> omitted day
+_WORKING_FLAGS = bytes([1, 0]) + bytes(254)
+
+
+class OmitCalendar:
+  '''Календарь пропускаемых дней, аналог инструкций C{OMIT} в Remind.
+  Пропускаемыми могут быть дни недели (например, выходные), ежегодные
+  праздники (месяц и день) и отдельные даты.
+
+  Объекты не изменяются после создания: методы L{withOmits} и L{withStrings}
+  возвращают новый календарь.  Поэтому условие, построенное с календарём,
+  учитывает только дни, пропускаемые на момент его построения, а объекты
+  можно разделять между условиями.
+
+  Для быстрых запросов календарь по требованию строит для диапазона целых лет
+  битовую карту дней (по байту на день) и массив префиксных сумм количества
+  рабочих дней; карта строится для всего диапазона сразу, а при выходе за его
+  пределы строится заново для расширенного диапазона.  После этого проверка
+  даты (L{isOmitted}), подсчёт рабочих дней (L{countWorkingDays}) и сдвиг на
+  заданное количество рабочих дней (L{shift}) выполняются за постоянное время.
+
+  @ivar dates: множество (C{frozenset}) пропускаемых дат
+  @ivar yearly: множество (C{frozenset}) кортежей (месяц, день) ежегодно
+    пропускаемых дней
+  @ivar weekdayMask: битовая маска пропускаемых дней недели (бит 0 -
+    понедельник, бит 6 - воскресенье)
+  '''
+
+  # number of years added on each side when the map is (re)built
+  _MARGIN_YEARS = 1
+
+  def __init__(self, dates=(), yearly=(), weekdays=()):
+    '''Конструктор
+
+    @param dates: коллекция пропускаемых дат (объектов класса C{datetime.date})
+    @param yearly: коллекция кортежей (месяц, день) ежегодно пропускаемых дней
+    @param weekdays: коллекция пропускаемых дней недели (0 - понедельник,
+      6 - воскресенье)
+    @raise ValueError: пропускаются все дни недели
+    '''
+    super(OmitCalendar, self).__init__()
+    self.dates = frozenset(dates)
+    self.yearly = frozenset(yearly)
+    self.weekdayMask = 0
+    for weekday in weekdays:
+      self.weekdayMask |= 1 << weekday
+    if self.weekdayMask == _ALL_WEEKDAYS:
+      raise ValueError('All weekdays are omitted')
+    self._first = self._end = 0
+    self._ranks = None
+    self._working = None
+
+  def withOmits(self, dates=(), yearly=(), weekdays=()):
+    '''Получить календарь, в котором дополнительно пропускаются заданные дни
+
+    @param dates: см. L{__init__}
+    @param yearly: см. L{__init__}
+    @param weekdays: см. L{__init__}
+    @returns: объект класса L{OmitCalendar}
+    @raise L{FormatError<utils.FormatError>}: пропускаются все дни недели
+    '''
+    weekdays = itertools.chain(self.weekdays, weekdays)
+    try:
+      return OmitCalendar(self.dates.union(dates), self.yearly.union(yearly), weekdays)
+    except ValueError as e:
+      # the omitted days usually come from user input
+      raise FormatError(str(e))
+
+  def withStrings(self, strings):
+    '''Получить календарь, в котором дополнительно пропускаются дни, заданные
+    строками в формате условий L{DateConditionParser<StringParser.DateConditionParser>}:
+    дата (C{2010-05-03}), месяц и день (C{May 9}) или дни недели (C{Sat Sun})
+
+    @param strings: Iterable по строкам
+    @returns: объект класса L{OmitCalendar}
+    @raise L{FormatError<utils.FormatError>}: строка имеет неправильный
+      формат или задаёт условие другого вида, или пропускаются все дни
+      недели
+    '''
+    from .DateCondition import DateCondition, SimpleDateCondition
+    dates, yearly, weekdays = [], [], []
+    for string in strings:
+      cond = DateCondition.fromString(string)
+      if type(cond) is not SimpleDateCondition:
+        raise FormatError('Can\'t omit "%s"' % string)
+      fields = (cond.year is not None, cond.month is not None, cond.day is not None,
+        cond.weekdayMask is not None)
+      if fields == (True, True, True, False):
+        dates.append(datetime.date(cond.year, cond.month, cond.day))
+      elif fields == (False, True, True, False):
+        yearly.append((cond.month, cond.day))
+      elif fields == (False, False, False, True):
+        weekdays.extend(cond.weekdays)
+      else:
+        raise FormatError('Can\'t omit "%s"' % string)
+    return self.withOmits(dates, yearly, weekdays)
+
+  @property
+  def weekdays(self):
+    '''Отсортированный список пропускаемых дней недели'''
+    return [weekday for weekday in range(7) if self.weekdayMask >> weekday & 1]
+
+  def isEmpty(self):
+    '''Проверить, что календарь не пропускает ни одного дня'''
+    return not self.dates and not self.yearly and self.weekdayMask == 0
+
+  def fingerprint(self):
+    '''Получить строку, однозначно описывающую пропускаемые дни
+
+    @returns: строка
+    '''
+    return repr((sorted(self.dates), sorted(self.yearly), self.weekdayMask))
+
+  def __eq__(self, other):
+    '''Календари равны, если они пропускают одни и те же дни'''
+    if not isinstance(other, OmitCalendar):
+      return NotImplemented
+    return (self.dates, self.yearly, self.weekdayMask) == \
+      (other.dates, other.yearly, other.weekdayMask)
+
+  def __hash__(self):
+    return hash((self.dates, self.yearly, self.weekdayMask))
+
+  def isOmitted(self, date):
+    '''Проверить, пропускается ли дата
+
+    @param date: объект класса C{datetime.date}
+    @returns: C{True}, если дата пропускается
+    '''
+    ordinal = date.toordinal()
+    self.__cover(ordinal, ordinal)
+    i = ordinal - self._first
+    return self._ranks[i + 1] == self._ranks[i]
+
+  def countWorkingDays(self, fromDate, toDate):
+    '''Подсчитать количество рабочих (не пропускаемых) дней в диапазоне
+
+    @param fromDate: объект класса C{datetime.date}, начальная дата
+    @param toDate: объект класса C{datetime.date}, конечная дата (включительно)
+    @returns: целочисленное количество дней
+    '''
+    if fromDate > toDate:
+      return 0
+    self.__cover(fromDate.toordinal(), toDate.toordinal())
+    return self._ranks[toDate.toordinal() - self._first + 1] - \
+      self._ranks[fromDate.toordinal() - self._first]
+
+  def shift(self, date, days):
+    '''Сдвинуть дату на заданное количество рабочих дней.  Если дата сама
+    пропускается, первым рабочим днём в направлении сдвига считается
+    ближайший к ней рабочий день.
+
+    @param date: объект класса C{datetime.date}
+    @param days: целочисленное смещение в рабочих днях
+    @returns: объект класса C{datetime.date}
+    @raise OverflowError: результат выходит за пределы допустимых дат
+    '''
+    if days == 0:
+      return date
+    ordinal = date.toordinal()
+    # at least one day of every week is a working day
+    reach = abs(days) * 7 + 7
+    while True:
+      if days > 0:
+        self.__cover(ordinal, min(ordinal + reach, _MAX_ORDINAL))
+      else:
+        self.__cover(max(ordinal - reach, _MIN_ORDINAL), ordinal)
+      i = ordinal - self._first
+      # number of working days before the date
+      rank = self._ranks[i]
+      if days > 0:
+        rank += days - 1 if self._ranks[i + 1] == rank else days
+      else:
+        rank += days
+      if 0 <= rank < len(self._working):
+        return datetime.date.fromordinal(self._working[rank])
+      if days > 0 and self._end > _MAX_ORDINAL or days < 0 and self._first <= _MIN_ORDINAL:
+        raise OverflowError('date value out of range')
+      reach *= 2
+
+  def __cover(self, fromOrdinal, toOrdinal):
+    '''Построить карту дней, если она не покрывает заданный диапазон'''
+    if self._ranks is not None and self._first <= fromOrdinal and toOrdinal < self._end:
+      return
+    if self._ranks is not None:
+      fromOrdinal = min(fromOrdinal, self._first)
+      toOrdinal = max(toOrdinal, self._end - 1)
+    firstYear = max(datetime.date.fromordinal(fromOrdinal).year - self._MARGIN_YEARS,
+      datetime.MINYEAR)
+    lastYear = min(datetime.date.fromordinal(toOrdinal).year + self._MARGIN_YEARS,
+      datetime.MAXYEAR)
+    first = datetime.date(firstYear, 1, 1).toordinal()
+    end = datetime.date(lastYear, 12, 31).toordinal() + 1
+
+    # weekdays: repeat the pattern of a week starting with the first day
+    weekday = (first - 1) % 7
+    week = bytes(self.weekdayMask >> ((weekday + i) % 7) & 1 for i in range(7))
+    count = end - first
+    bitmap = bytearray(week * (count // 7 + 1))
+    del bitmap[count:]
+    for year in range(firstYear, lastYear + 1):
+      for month, day in self.yearly:
+        if day <= dateutils.monthLength(year, month):
+          bitmap[datetime.date(year, month, day).toordinal() - first] = 1
+    for date in self.dates:
+      if first <= date.toordinal() < end:
+        bitmap[date.toordinal() - first] = 1
+
+    working = bitmap.translate(_WORKING_FLAGS)
+    self._ranks = array('i', itertools.accumulate(working, initial=0))
+    self._working = array('i', itertools.compress(range(first, end), working))
+    self._first, self._end = first, end
+
+
+  class Test(unittest.TestCase):
+    '''Набор unit-тестов'''
+
+    def setUp(self):
+      self.calendar = OmitCalendar(
+        dates=[datetime.date(2010, 5, 3)],
+        yearly=[(5, 1), (5, 9)],
+        weekdays=[5, 6])
+
+    def test_isOmitted(self):
+      self.assertTrue(self.calendar.isOmitted(datetime.date(2010, 5, 1)))
+      self.assertTrue(self.calendar.isOmitted(datetime.date(2010, 5, 3)))
+      self.assertFalse(self.calendar.isOmitted(datetime.date(2010, 5, 4)))
+      self.assertTrue(self.calendar.isOmitted(datetime.date(2031, 5, 9)))
+
+    def test_countWorkingDays(self):
+      self.assertEqual(self.calendar.countWorkingDays(
+        datetime.date(2010, 4, 26), datetime.date(2010, 5, 9)), 9)
+
+    def test_shift(self):
+      shift = self.calendar.shift
+      self.assertEqual(shift(datetime.date(2010, 5, 4), -1), datetime.date(2010, 4, 30))
+      self.assertEqual(shift(datetime.date(2010, 5, 1), -1), datetime.date(2010, 4, 30))
+      self.assertEqual(shift(datetime.date(2010, 5, 1), 1), datetime.date(2010, 5, 4))
+      self.assertEqual(shift(datetime.date(2010, 5, 4), 5), datetime.date(2010, 5, 11))
+      weekends = OmitCalendar(weekdays=[5, 6])
+      self.assertEqual(weekends.shift(datetime.date(2010, 5, 3), 600),
+        datetime.date(2010, 5, 3) + datetime.timedelta(days=840))
+
+    def test_withStrings(self):
+      calendar = OmitCalendar().withStrings(['Sat Sun', 'May 1', 'May 9', '2010-05-03'])
+      self.assertEqual(calendar.fingerprint(), self.calendar.fingerprint())
+      self.assertRaises(FormatError, calendar.withStrings, ['Mon 1'])
+
+    def test_allWeekdays(self):
+      self.assertRaises(ValueError, OmitCalendar, weekdays=range(7))
+      weekdays = OmitCalendar().withStrings(['Mon Tue Wed'])
+      self.assertRaises(FormatError, weekdays.withStrings, ['Thu Fri Sat Sun'])
+      self.assertRaises(FormatError, weekdays.withOmits, weekdays=range(3, 7))
+
+    def test_equality(self):
+      calendar = OmitCalendar().withStrings(['May 9', 'Sat Sun', 'May 1', '2010-05-03'])
+      self.assertEqual(calendar, self.calendar)
+      self.assertEqual(hash(calendar), hash(self.calendar))
+      self.assertNotEqual(calendar, calendar.withStrings(['May 2']))
+      self.assertNotEqual(calendar, None)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,359 @@
+'''Содержит класс L{RemFileLoader}
+
+При запуске из командной строки запускает присутствующие в модуле unit-тесты.'''
+
+from concurrent.futures import ProcessPoolExecutor
+import os
+import sys
+import unittest
+
+from .OmitCalendar import OmitCalendar
+from .Reminder import ShortcutReminder
+from .StringParser import ReminderParser
+from .utils import FormatError
+
+
+class Statement:
+  '''Логическая строка файла Remind (после склейки строк, заканчивающихся
+  обратной косой чертой)
+
+  @ivar filename: имя файла
+  @ivar lineno: номер первой физической строки
+  @ivar text: текст строки
+  @ivar omits: кортеж строк, задающих пропускаемые дни, действующие на момент
+    появления строки в файле (см. L{OmitCalendar.withStrings<OmitCalendar.OmitCalendar.withStrings>})
+  '''
+
+  __slots__ = ('filename', 'lineno', 'text', 'omits')
+
+  def __init__(self, filename, lineno, text, omits=()):
+    super(Statement, self).__init__()
+    self.filename = filename
+    self.lineno = lineno
+    self.text = text
+    self.omits = omits
+
+
+def parseStatements(statements, parseCache=None):
+  '''Создать напоминалки по строкам C{REM}.  Строки с опцией C{AT}
+  превращаются в объекты класса
+  L{TimedReminder<contrib.timed.Reminder.TimedReminder>}, остальные - в
+  объекты класса L{ShortcutReminder<Reminder.ShortcutReminder>}.
+
+  @param statements: Iterable по объектам класса L{Statement}
+  @param parseCache: если не C{None}, объект класса
+    L{ParseCache<StringParser.ParseCache>}
+  @returns: список напоминалок в порядке строк
+  @raise FormatError: строка имеет неправильный формат; в сообщении указаны
+    имя файла и номер строки
+  '''
+  from .contrib.timed.Reminder import TimedReminder
+  from .contrib.timed.StringParser import TimedParser
+  # calendars compare by value, so equal OMIT contexts share parse cache
+  # entries across files and loads
+  calendars = {(): None}
+  reminders = []
+  for statement in statements:
+    try:
+      if statement.omits not in calendars:
+        calendars[statement.omits] = OmitCalendar().withStrings(statement.omits)
+      omitCalendar = calendars[statement.omits]
+      factoryArgs = (ReminderParser, None, omitCalendar)
+      if parseCache is not None:
+        parser, cond = parseCache.parse(statement.text, TimedParser, *factoryArgs)
+      else:
+        parser = TimedParser(*factoryArgs)
+        cond = parser.parse(statement.text)
+      reminder = ShortcutReminder.fromParser(parser, cond)
+      reminder.source = repr((statement.text, None, None))
+      if omitCalendar is not None:
+        reminder.source = repr((reminder.source, omitCalendar.fingerprint()))
+      if parser.time() is not None:
+        reminder = TimedReminder(reminder, parser.time(), parser.timeDelta(), parser.timeRepeat())
+    except FormatError as e:
+      raise FormatError('%s:%d: %s' % (statement.filename, statement.lineno, e))
+    reminders.append(reminder)
+  return reminders
+
+
+class _OmitContext:
+  # the OMIT strings in effect and the stack of PUSH-OMIT-CONTEXT
+
+  __slots__ = ('omits', 'stack')
+
+  def __init__(self):
+    super(_OmitContext, self).__init__()
+    self.omits = ()
+    self.stack = []
+
+
+class RemFileLoader:
+  '''Класс, читающий напоминалки из файлов в формате Remind.
+
+  Поддерживаются:
+
+    - строки C{REM} (в формате L{ReminderParser<StringParser.ReminderParser>},
+      с опцией C{AT} из L{TimedParser<contrib.timed.StringParser.TimedParser>});
+    - строки, заканчивающиеся обратной косой чертой, которые продолжаются
+      на следующей строке;
+    - комментарии (строки, начинающиеся с C{#} или C{;}) и пустые строки;
+    - C{INCLUDE <файл>} (относительный путь отсчитывается от каталога
+      включающего файла);
+    - C{OMIT <дата>}, C{PUSH-OMIT-CONTEXT}, C{POP-OMIT-CONTEXT} и
+      C{CLEAR-OMIT-CONTEXT}; пропускаемые дни задаются строками
+      в формате L{OmitCalendar.withStrings<OmitCalendar.OmitCalendar.withStrings>}
+      и действуют на последующие строки C{REM}.
+
+  Остальные команды пропускаются, о чём сообщается методом
+  L{_handleUnsupported}.
+
+  Файл читается последовательно.  Строки C{REM} по умолчанию разбираются в
+  текущем процессе; если задано несколько процессов и строк не меньше
+  L{parallelThreshold}, разбор выполняется частями по L{chunkSize} строк в
+  пуле процессов.  Результаты частей собираются в порядке следования строк в
+  файле.  Пул окупается только на многопроцессорной машине и больших файлах
+  (см. C{benchmarks/remfile_parsing.py}): напоминалки передаются обратно
+  через pickle.
+  '''
+
+  parallelThreshold = 5000
+  '''Минимальное количество строк C{REM}, при котором разбор выполняется в
+  пуле процессов'''
+
+  chunkSize = 1000
+  '''Количество строк C{REM}, передаваемых в процесс за один раз'''
+
+  def __init__(self, maxWorkers=1, parseCache=None):
+    '''Конструктор
+
+    @param maxWorkers: количество процессов для разбора (C{None} - по
+      количеству процессоров, 1 - разбирать в текущем процессе)
+    @param parseCache: если не C{None}, объект класса
+      L{ParseCache<StringParser.ParseCache>}, через который разбираются строки
+      при разборе в текущем процессе
+    '''
+    super(RemFileLoader, self).__init__()
+    self.maxWorkers = maxWorkers
+    self.parseCache = parseCache
+
+  def load(self, filename):
+    '''Прочитать напоминалки из файла
+
+    @param filename: имя файла
+    @returns: список напоминалок в порядке следования в файле (с учётом C{INCLUDE})
+    @raise FormatError: файл имеет неправильный формат
+    @raise OSError: файл не удаётся прочитать
+    '''
+    statements = list(self.iterStatements(filename))
+    workers = self.maxWorkers if self.maxWorkers is not None else os.cpu_count() or 1
+    if len(statements) < self.parallelThreshold or workers == 1:
+      return parseStatements(statements, self.parseCache)
+    chunks = [statements[i:i + self.chunkSize]
+      for i in range(0, len(statements), self.chunkSize)]
+    reminders = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+      for chunk in executor.map(parseStatements, chunks):
+        reminders.extend(chunk)
+    return reminders
+
+  def iterStatements(self, filename):
+    '''Перебрать строки C{REM} файла, выполняя остальные поддерживаемые команды
+
+    @param filename: имя файла
+    @returns: Iterable по объектам класса L{Statement}
+    @raise FormatError: файл имеет неправильный формат
+    '''
+    # the OMIT context belongs to the traversal, so that the generators
+    # of one loader don't interfere
+    yield from self.__iterFile(filename, (), _OmitContext())
+
+  def __iterFile(self, filename, including, context):
+    if os.path.abspath(filename) in including:
+      raise FormatError('%s: recursive INCLUDE' % filename)
+    including = including + (os.path.abspath(filename),)
+    with open(filename, encoding='utf-8') as f:
+      for lineno, text in self.__logicalLines(f):
+        command, *rest = text.split(None, 1)
+        command = command.upper()
+        rest = rest[0] if rest else ''
+        if command == 'REM':
+          yield Statement(filename, lineno, text, context.omits)
+        elif command == 'INCLUDE':
+          if not rest:
+            raise FormatError('%s:%d: file name expected' % (filename, lineno))
+          path = os.path.join(os.path.dirname(filename), rest)
+          yield from self.__iterFile(path, including, context)
+        elif command == 'OMIT':
+          context.omits += (self.__omitString(filename, lineno, rest, context.omits),)
+        elif command == 'PUSH-OMIT-CONTEXT':
+          context.stack.append(context.omits)
+        elif command == 'POP-OMIT-CONTEXT':
+          if not context.stack:
+            raise FormatError('%s:%d: POP-OMIT-CONTEXT without PUSH-OMIT-CONTEXT' % (filename, lineno))
+          context.omits = context.stack.pop()
+        elif command == 'CLEAR-OMIT-CONTEXT':
+          context.omits = ()
+        else:
+          self._handleUnsupported(filename, lineno, text)
+
+  @staticmethod
+  def __omitString(filename, lineno, rest, omits):
+    # like in remind, OMIT may be followed by a message, which we ignore
+    words = rest.split()
+    upper = [word.upper() for word in words]
+    if 'MSG' in upper:
+      words = words[:upper.index('MSG')]
+    string = ' '.join(words)
+    # the OMITs in effect are checked together: they may add up to all
+    # weekdays
+    try:
+      OmitCalendar().withStrings(omits + (string,))
+    except FormatError as e:
+      raise FormatError('%s:%d: %s' % (filename, lineno, e))
+    return string
+
+  @staticmethod
+  def __logicalLines(f):
+    text = None
+    for lineno, line in enumerate(f, 1):
+      line = line.rstrip('\r\n')
+      if text is None:
+        if line.lstrip()[:1] in ('#', ';'):
+          continue
+        start = lineno
+        text = ''
+      if line.endswith('\\'):
+        text += line[:-1]
+        continue
+      text = (text + line).strip()
+      if text:
+        yield start, text
+      text = None
+    if text:
+      yield start, text.strip()
+
+  def _handleUnsupported(self, filename, lineno, text):
+    '''Метод для переопределения в наследнике.  Вызывается для строк с
+    командами, которые не поддерживаются.  Реализация по умолчанию печатает
+    сообщение в C{sys.stderr}.
+
+    @param filename: имя файла
+    @param lineno: номер строки
+    @param text: текст строки
+    '''
+    print('%s:%d: unsupported command skipped: %s' % (filename, lineno, text.split()[0]),
+      file=sys.stderr)
+
+
+  class Test(unittest.TestCase):
+    '''Набор unit-тестов'''
+
+    def setUp(self):
+      import tempfile
+      self.dir = tempfile.TemporaryDirectory()
+      self.log = []
+      log = self.log
+
+      class Loader(RemFileLoader):
+        def _handleUnsupported(self, filename, lineno, text):
+          log.append((os.path.basename(filename), lineno))
+      self.loader = Loader(maxWorkers=1)
+
+    def tearDown(self):
+      self.dir.cleanup()
+
+    def __write(self, name, content):
+      path = os.path.join(self.dir.name, name)
+      with open(path, 'w', encoding='utf-8') as f:
+        f.write(content)
+      return path
+
+    def __messages(self, reminders):
+      return [getattr(reminder, 'reminder', reminder).action.message for reminder in reminders]
+
+    def test_load(self):
+      import datetime
+      self.__write('holidays.rem', 'OMIT May 9\nREM May 9 MSG Victory day\n')
+      path = self.__write('main.rem', '\n'.join([
+        '# comment',
+        '; another comment',
+        'SET x 1',
+        'REM 2010-05-03 MSG First \\',
+        'line',
+        'INCLUDE holidays.rem',
+        'rem 10 -1 MSG Report',
+        'REM 5 AT 10:00 +30 *10 MSG Standup',
+      ]))
+      reminders = self.loader.load(path)
+      self.assertEqual(self.__messages(reminders),
+        ['First line', 'Victory day', 'Report', 'Standup'])
+      self.assertEqual(self.log, [('main.rem', 3)])
+      # the OMIT from the included file affects the reminders after it
+      date = next(iter(reminders[2].condition(None).scan(datetime.date(2010, 5, 1))))
+      self.assertEqual(date, datetime.date(2010, 5, 8))
+      self.assertEqual(reminders[3].time, datetime.time(10, 0))
+
+    def test_omitContext(self):
+      path = self.__write('main.rem', '\n'.join([
+        'PUSH-OMIT-CONTEXT',
+        'OMIT Sat Sun MSG Weekend',
+        'REM 1 MSG a',
+        'POP-OMIT-CONTEXT',
+        'REM 1 MSG b',
+      ]))
+      statements = list(self.loader.iterStatements(path))
+      self.assertEqual([s.omits for s in statements], [('Sat Sun',), ()])
+
+    def test_interleaved(self):
+      first = self.__write('first.rem', 'OMIT Sat\nREM 1 MSG a\nREM 2 MSG b\n')
+      second = self.__write('second.rem', 'REM 3 MSG c\nPUSH-OMIT-CONTEXT\nREM 4 MSG d\n')
+      a = self.loader.iterStatements(first)
+      b = self.loader.iterStatements(second)
+      self.assertEqual(next(a).omits, ('Sat',))
+      self.assertEqual(next(b).omits, ())
+      self.assertEqual(next(a).omits, ('Sat',))
+      self.assertEqual(next(b).omits, ())
+
+    def test_errors(self):
+      path = self.__write('main.rem', 'REM 2010-05-03 MSG ok\nREM 2010-13-40 MSG bad\n')
+      with self.assertRaises(FormatError) as cm:
+        self.loader.load(path)
+      self.assertTrue(':2:' in str(cm.exception))
+      path = self.__write('loop.rem', 'INCLUDE loop.rem\n')
+      self.assertRaises(FormatError, self.loader.load, path)
+      path = self.__write('omit.rem', 'OMIT Mon Tue Wed\nOMIT Thu Fri Sat Sun\nREM 1 MSG a\n')
+      with self.assertRaises(FormatError) as cm:
+        self.loader.load(path)
+      self.assertTrue(':2:' in str(cm.exception))
+      path = self.__write('rem.rem', 'REM 1 OMIT Mon Tue Wed Thu Fri Sat Sun MSG a\n')
+      with self.assertRaises(FormatError) as cm:
+        self.loader.load(path)
+      self.assertTrue(':1:' in str(cm.exception))
+
+    def test_parseCache(self):
+      from .StringParser import ParseCache
+      path = self.__write('main.rem', 'REM 1 MSG a\nOMIT Sat Sun\nREM 1 -1 MSG b\n')
+      cache = ParseCache()
+      loader = RemFileLoader(parseCache=cache)
+      first = loader.load(path)
+      self.assertEqual(len(cache.entries), 2)
+      # a second load, with calendars built anew, reuses the parsed lines
+      second = loader.load(path)
+      self.assertEqual(len(cache.entries), 2)
+      self.assertEqual([r.condition(None) for r in first], [r.condition(None) for r in second])
+      self.assertEqual([r.fingerprint() for r in first], [r.fingerprint() for r in second])
+
+    def test_parallel(self):
+      lines = ['REM %d MSG m%d' % (i % 28 + 1, i) for i in range(50)]
+      path = self.__write('main.rem', 'OMIT Sun\n' + '\n'.join(lines))
+      loader = RemFileLoader(maxWorkers=2)
+      loader.parallelThreshold = 10
+      loader.chunkSize = 7
+      reminders = loader.load(path)
+      self.assertEqual(self.__messages(reminders), ['m%d' % i for i in range(50)])
+      self.assertEqual([r.fingerprint() for r in reminders],
+        [r.fingerprint() for r in RemFileLoader(maxWorkers=1).load(path)])
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -20,16 +20,49 @@ class Reminder:
       определённую напоминалку::
 
       event = (date, reminder) | date `matches` reminder
+
+  Классы иерархии объявляют C{__slots__}, так как в долго работающем процессе
+  могут одновременно храниться сотни тысяч напоминалок.
   '''
 
+  __slots__ = ('_conditions',)
+
   def condition(self, runnerMode):
-    '''Получить условие, согласно которому выбираются даты
+    '''Получить условие, согласно которому выбираются даты.
+
+    Условие строится методом L{_makeCondition} при первом обращении и
+    запоминается для каждого режима запуска, поэтому при повторных запусках
+    используется один и тот же объект условия вместе со всеми вычисленными в
+    нём данными (например, L{DateCondition.reachability<DateCondition.DateCondition.reachability>}).
+    Возвращённый объект нельзя изменять.  Если изменяются данные, от которых
+    зависит условие, наследник должен вызвать L{_invalidateConditions}.
+
+    @param runnerMode: константа из «перечисления» L{RunnerMode<Runner.RunnerMode>}
+    @returns: объект класса L{DateCondition<DateCondition.DateCondition>}
+    '''
+    try:
+      conditions = self._conditions
+    except AttributeError:
+      conditions = self._conditions = {}
+    cond = conditions.get(runnerMode)
+    if cond is None:
+      cond = conditions[runnerMode] = self._makeCondition(runnerMode)
+    return cond
+
+  def _makeCondition(self, runnerMode):
+    '''Метод для определения в наследниках.  Построить условие для метода
+    L{condition}.
 
     @param runnerMode: константа из «перечисления» L{RunnerMode<Runner.RunnerMode>}
     @returns: объект класса L{DateCondition<DateCondition.DateCondition>}
     '''
     raise NotImplementedError()
 
+  def _invalidateConditions(self):
+    '''Забыть условия, запомненные методом L{condition}.  Должен вызываться
+    наследниками при изменении данных, от которых зависит условие.'''
+    self._conditions = {}
+
   def advanceWarningValue(self):
     '''Очередной getter.
 
@@ -42,13 +75,31 @@ class Reminder:
     '''Вызвать связанное с напоминалкой действие для данной даты
 
     @param date: объект класса C{datetime.date}
+    @returns: результат действия (для L{AsyncAction<Action.AsyncAction>} -
+      awaitable, который нужно дождаться)
     '''
     raise NotImplementedError()
 
+  def fingerprint(self):
+    '''Получить строку, однозначно описывающую содержимое напоминалки.  Две
+    напоминалки с одинаковыми «отпечатками» должны выбирать одни и те же даты
+    и выполнять одни и те же действия.  Используется, чтобы определить, какие
+    напоминалки изменились с момента предыдущего запуска, см.
+    L{Checkpoint<Checkpoint.Checkpoint>}.
+
+    Реализация по умолчанию возвращает C{None}.
+
+    @returns: строка или C{None}, если «отпечаток» построить невозможно
+      (например, если в напоминалке используется произвольная функция)
+    '''
+    return None
+
 
 class BasicReminder(Reminder):
   '''Простейшая реализация класса L{Reminder}'''
 
+  __slots__ = ('cond', 'action', 'adv')
+
   def __init__(self, dateCondition, action, advanceWarningValue=0):
     '''Конструктор
 
@@ -65,13 +116,18 @@ class BasicReminder(Reminder):
     self.adv = advanceWarningValue
 
   def condition(self, runnerMode):
+    # the condition doesn't depend on the mode, so don't spend a dictionary
+    # per reminder to memoize it
+    return self.cond
+
+  def _makeCondition(self, runnerMode):
     return self.cond
 
   def advanceWarningValue(self):
     return self.adv
 
   def execute(self, date):
-    self.action(date)
+    return self.action(date)
 
 
 class ShortcutReminder(BasicReminder):
@@ -81,6 +137,8 @@ class ShortcutReminder(BasicReminder):
   удобнее, чем вручную конструировать нижележащие классы.
   '''
 
+  __slots__ = ('source',)
+
   def __init__(self, dateCondition, action, advanceWarningValue=0, satisfy=None):
     '''Конструктор
 
@@ -98,6 +156,9 @@ class ShortcutReminder(BasicReminder):
       C{True} или C{False} в зависимости от того, нужно ли считать дату
       подпадающей под напоминатель.
     '''
+    self.source = None
+    if isinstance(dateCondition, str) and isinstance(action, str) and satisfy is None:
+      self.source = repr((dateCondition, action, advanceWarningValue))
     if isinstance(dateCondition, str):
       dateCondition = DateConditionParser().parse(dateCondition)
     if satisfy is not None:
@@ -106,8 +167,18 @@ class ShortcutReminder(BasicReminder):
       action = MessagePrinter(action)
     super(ShortcutReminder, self).__init__(dateCondition, action, advanceWarningValue)
 
+  def fingerprint(self):
+    '''Получить «отпечаток» напоминалки.  «Отпечаток» строится по строкам, из
+    которых напоминалка была создана, поэтому известен, только если условие
+    и действие были заданы строками, а функция C{satisfy} не задавалась.
+
+    @see: L{Reminder.fingerprint}
+    '''
+    return self.source
+
   @staticmethod
-  def fromString(dateCondition, action=None, advanceWarningValue=None, satisfy=None):
+  def fromString(dateCondition, action=None, advanceWarningValue=None, satisfy=None,
+      parseCache=None, omitCalendar=None):
     '''Альтернативный метод конструирования объекта класса L{ShortcutReminder}.
     Позволяет задать условие, сообщение для вывода и количество дней для
     заблаговременного предупреждения о событии одной строкой.  Формат строки
@@ -126,13 +197,28 @@ class ShortcutReminder(BasicReminder):
     @param satisfy: если не C{None}, задаёт функцию для дополнительного отсева дат.
       См. комментарии к соответствующему параметру
       L{конструктора<ShortcutReminder.__init__>}.
+    @param parseCache: если не C{None}, объект класса
+      L{ParseCache<StringParser.ParseCache>}, через который выполняется разбор
+      строки C{dateCondition}
+    @param omitCalendar: если не C{None}, объект класса
+      L{OmitCalendar<OmitCalendar.OmitCalendar>}, задающий пропускаемые дни
+      (см. L{ChainData.omitCalendar<StringParser.ChainData.omitCalendar>})
     @returns: объект класса L{ShortcutReminder}
 
     @see: L{ReminderParser<StringParser.ReminderParser>}
     '''
-    parser = ReminderParser()
-    cond = parser.parse(dateCondition)
-    return ShortcutReminder.fromParser(parser, cond, action, advanceWarningValue, satisfy)
+    factoryArgs = (DateConditionParser, None, omitCalendar) if omitCalendar is not None else ()
+    if parseCache is not None:
+      parser, cond = parseCache.parse(dateCondition, ReminderParser, *factoryArgs)
+    else:
+      parser = ReminderParser(*factoryArgs)
+      cond = parser.parse(dateCondition)
+    reminder = ShortcutReminder.fromParser(parser, cond, action, advanceWarningValue, satisfy)
+    if satisfy is None and (action is None or isinstance(action, str)):
+      reminder.source = repr((dateCondition, action, advanceWarningValue))
+      if omitCalendar is not None and not omitCalendar.isEmpty():
+        reminder.source = repr((reminder.source, omitCalendar.fingerprint()))
+    return reminder
 
   @staticmethod
   def fromParser(parser, dateCondition, action=None, advanceWarningValue=None, satisfy=None):
@@ -2,11 +2,21 @@
 
 При запуске из командной строки запускает функцию L{main}.'''
 
+import asyncio
+import collections
+from concurrent.futures import ThreadPoolExecutor
+import contextlib
 import datetime
+import functools
 import getopt
 from heapq import heappop, heappush
+import inspect
+import io
+import itertools
 import locale
+import os
 import sys
+import unittest
 
 try:
   from parsedatetime import parsedatetime
@@ -16,17 +26,23 @@ try:
 except ImportError:
   pdt = None
 
+from .Action import captureOutput, outputStream, outputTo
 from .utils import dates as dateutils
 
 
 def _parseDate(string):
+  # natural-language dates are relative to today, so today is a part of the key
+  return _parseDateCached(string, datetime.date.today())
+
+@functools.lru_cache(maxsize=256)
+def _parseDateCached(string, today):
   if pdt is None:
     return dateutils.parseIsoDate(string)
   else:
     try:
       values, flag = pdt.parse(string)
       if flag != 1:
-        raise ValueError('Incorrect date string: %s' + string)
+        raise ValueError('Incorrect date string: %s' % string)
       return datetime.date(*values[:3])
     except ValueError as e:
       try:
@@ -47,6 +63,18 @@ class RunnerMode:
   предупреждает о событиях предварительно'''
 
 
+# Heap ordinals: reminder i added by Runner.add comes after every row of the
+# stores added before it, rows of a store keep their order
+_STORE_ROW_BITS = 32
+_STORE_ROW_MASK = (1 << _STORE_ROW_BITS) - 1
+
+def _reminderOrdinal(i):
+  return (2 * i + 1) << _STORE_ROW_BITS
+
+def _storeOrdinal(position):
+  return (2 * position) << _STORE_ROW_BITS
+
+
 class Runner:
   '''Класс, собирающий список напоминалок и затем выполняющий связанные с ними
   действия в порядке возрастания дат соответствующих событий.  При этом
@@ -56,12 +84,44 @@ class Runner:
 
     - сконструировать
     - добавить напоминалки с использованием метода L{add}
-    - вызвать метод L{run}
+    - вызвать метод L{run} (или L{runBack})
+
+  Если действия выполнять не нужно, события можно перебрать методами
+  L{iterEvents} и L{iterEventsBack}, подсчитать методом L{histogram} или
+  выгрузить в виде матрицы методами L{occurrenceMatrix} и L{occurrenceIndices}.
+
+  Для запусков на одну дату используется индекс
+  L{DateIndex<DateIndex.DateIndex>}, который строится при первом таком запуске
+  и затем обновляется методом L{add}, так что просматриваются только
+  напоминалки, под которые эта дата может подпадать.
+
+  Большие наборы простых напоминалок можно добавить в виде хранилища
+  L{ColumnarStore<ColumnarStore.ColumnarStore>} методом L{addStore}; события
+  напоминалок хранилища перебираются в том же порядке, как если бы они были
+  добавлены методом L{add} по одной.
+
+  Даты напоминалок, условия которых компилируются (см.
+  L{DateCondition.compile<DateCondition.DateCondition.compile>}), метод
+  L{iterEvents} находит через скомпилированную форму, остальные - через
+  метод C{scan}.
+
+  Если в конструкторе задано количество потоков, действия выполняются в пуле
+  потоков, так что блокирующий ввод-вывод в разных действиях может
+  перекрываться (см. L{_dispatch}).
   '''
 
-  def __init__(self):
+  def __init__(self, maxWorkers=None):
+    '''Конструктор
+
+    @param maxWorkers: количество потоков для выполнения действий или
+      C{None}, если действия нужно выполнять последовательно
+    '''
     super(Runner, self).__init__()
+    self.maxWorkers = maxWorkers
     self.reminders = []
+    self.indices = {}
+    self.stores = []
+    self.__dispatcher = None
 
   def add(self, reminder):
     '''Добавить напоминалку
@@ -69,6 +129,41 @@ class Runner:
     @param reminder: объект класса L{Reminder<Reminder.Reminder>}
     '''
     self.reminders.append(reminder)
+    for index in self.indices.values():
+      index.add(len(self.reminders) - 1, reminder)
+
+  def addStore(self, store):
+    '''Добавить хранилище напоминалок.  Напоминалки хранилища считаются
+    добавленными после всех ранее добавленных напоминалок.  Они не попадают в
+    список C{reminders} и не учитываются методами L{occurrenceMatrix} и
+    L{occurrenceIndices}.
+
+    @param store: объект класса L{ColumnarStore<ColumnarStore.ColumnarStore>}
+    '''
+    self.stores.append((len(self.reminders), store))
+
+  def _storeReminders(self):
+    '''Перебрать напоминалки всех добавленных хранилищ
+
+    @returns: Iterable по объектам класса L{Reminder<Reminder.Reminder>}
+    '''
+    for _, store in self.stores:
+      for i in range(len(store)):
+        yield store.reminder(i)
+
+  def index(self, mode):
+    '''Получить индекс добавленных напоминалок по датам
+
+    @param mode: константа из «перечисления» L{RunnerMode}, задающая режим запуска
+    @returns: объект класса L{DateIndex<DateIndex.DateIndex>}
+    '''
+    index = self.indices.get(mode)
+    if index is None:
+      from .DateIndex import DateIndex
+      index = self.indices[mode] = DateIndex(mode)
+      for i, reminder in enumerate(self.reminders):
+        index.add(i, reminder)
+    return index
 
   def run(self, fromDate, toDate, mode):
     '''Запустить связанные с добавленными напоминалками действия для событий
@@ -78,48 +173,374 @@ class Runner:
     @param toDate: объект класса C{datetime.date}, задающий конечную дату (включительно)
     @param mode: константа из «перечисления» L{RunnerMode}, задающая режим запуска
     '''
+    events = self.iterEvents(fromDate, toDate, mode)
+    with self.__dispatching():
+      for date, group in itertools.groupby(events, lambda event: event[0]):
+        # events after toDate are only reported because of advance warnings
+        isWarning = mode == RunnerMode.REMIND and date > toDate
+        self._executeDay(date, [(reminder, isWarning) for _, reminder in group])
+
+  def runBack(self, startDate, maxEvents, mode):
+    '''Запустить связанные с добавленными напоминалками действия для последних
+    событий, приходящихся не позже заданной даты, в порядке убывания дат.
+    Метод L{_executeDay} в этом случае вызывается для дат в порядке убывания.
+
+    @param startDate: объект класса C{datetime.date}, задающий дату, не позже
+      которой должны приходиться события
+    @param maxEvents: максимальное количество событий
+    @param mode: константа из «перечисления» L{RunnerMode}, задающая режим запуска
+    '''
+    events = itertools.islice(self.iterEventsBack(startDate, mode), maxEvents)
+    with self.__dispatching():
+      for date, group in itertools.groupby(events, lambda event: event[0]):
+        self._executeDay(date, [(reminder, False) for _, reminder in group])
+
+  def runDay(self, date, mode):
+    '''Запустить связанные с добавленными напоминалками действия для событий,
+    приходящихся на заданную дату.  Эквивалентно C{run(date, date, mode)}.
+
+    @param date: объект класса C{datetime.date}
+    @param mode: константа из «перечисления» L{RunnerMode}, задающая режим запуска
+    '''
+    self.run(date, date, mode)
+
+  def iterEvents(self, fromDate, toDate, mode):
+    '''Перебрать события в пределах заданного диапазона дат в порядке
+    возрастания дат.  События, приходящиеся на одну дату, перебираются в
+    порядке добавления напоминалок.  Если диапазон состоит из одной даты,
+    напоминалки выбираются с помощью индекса (см. L{index}).
+
+    @param fromDate: объект класса C{datetime.date}, задающий начальную дату
+    @param toDate: объект класса C{datetime.date}, задающий конечную дату (включительно)
+    @param mode: константа из «перечисления» L{RunnerMode}, задающая режим запуска
+    @returns: Iterable по кортежам (объект класса C{datetime.date}, объект
+      класса L{Reminder<Reminder.Reminder>})
+    '''
     heap = []
 
-    def __pushNextEvent(ordinal, reminder, gen):
-      to = toDate + datetime.timedelta(days=reminder.advanceWarningValue()) \
+    def __lastDate(reminder):
+      return toDate + datetime.timedelta(days=reminder.advanceWarningValue()) \
         if mode == RunnerMode.REMIND else toDate
+
+    def __pushNextEvent(ordinal, reminder, gen):
+      try:
+        date = next(gen)
+      except StopIteration:
+        return
+      if date <= __lastDate(reminder):
+        heappush(heap, (date, ordinal, reminder, gen, __pushNextEvent))
+
+    def __pushNextCompiled(ordinal, reminder, nxt, fromOrdinal):
+      # compiled conditions (see DateCondition.compile) are driven without
+      # generators
+      dateOrdinal = nxt(fromOrdinal)
+      if dateOrdinal is not None and dateOrdinal <= lastOrdinals[reminder]:
+        heappush(heap, (datetime.date.fromordinal(dateOrdinal), ordinal, reminder, nxt,
+          __pushNextCompiled))
+
+    def __pushNextStoreEvent(base, store, gen):
+      # events of a store are already filtered and sorted, so the whole
+      # store takes a single slot in the heap
+      try:
+        date, i = next(gen)
+      except StopIteration:
+        return
+      heappush(heap, (date, base + i, store, gen, __pushNextStoreEvent))
+
+    if fromDate == toDate:
+      reminders = self.index(mode).candidates(fromDate)
+    else:
+      reminders = enumerate(self.reminders)
+    lastOrdinals = {}
+    for i, reminder in reminders:
+      cond = reminder.condition(mode)
+      # skip reminders that can't fire in the range without starting a scan
+      lastDate = __lastDate(reminder)
+      if not cond.reachability().intersects(fromDate, lastDate):
+        continue
+      nxt = cond.compile()
+      if nxt is not None:
+        lastOrdinals[reminder] = lastDate.toordinal()
+        __pushNextCompiled(_reminderOrdinal(i), reminder, nxt, fromDate.toordinal())
+      else:
+        gen = iter(cond.scan(fromDate))
+        __pushNextEvent(_reminderOrdinal(i), reminder, gen)
+    for position, store in self.stores:
+      __pushNextStoreEvent(_storeOrdinal(position), store,
+        iter(store.iterEvents(fromDate, toDate, mode)))
+    while len(heap) > 0:
+      date, ordinal, reminder, gen, push = heappop(heap)
+      if push is __pushNextCompiled:
+        yield (date, reminder)
+        push(ordinal, reminder, gen, date.toordinal() + 1)
+      elif push is __pushNextEvent:
+        yield (date, reminder)
+        push(ordinal, reminder, gen)
+      else:
+        base = ordinal & ~_STORE_ROW_MASK
+        yield (date, reminder.reminder(ordinal - base))
+        push(base, reminder, gen)
+
+  def iterEventsBack(self, startDate, mode):
+    '''Перебрать события, приходящиеся не позже заданной даты, в порядке
+    убывания дат.  Потоки дат всех напоминалок, полученные методом
+    L{scanBack<DateCondition.DateCondition.scanBack>}, объединяются с помощью
+    кучи с максимумом на вершине, так что перебор начинается сразу с последних
+    событий.  События, приходящиеся на одну дату, перебираются в порядке
+    добавления напоминалок.  Количество дней для заблаговременного
+    предупреждения о событии не учитывается.
+
+    @param startDate: объект класса C{datetime.date}, задающий дату, не позже
+      которой должны приходиться события
+    @param mode: константа из «перечисления» L{RunnerMode}, задающая режим запуска
+    @returns: Iterable по кортежам (объект класса C{datetime.date}, объект
+      класса L{Reminder<Reminder.Reminder>})
+    '''
+    heap = []
+
+    def __pushNextEvent(ordinal, reminder, gen):
       try:
         date = next(gen)
       except StopIteration:
         return
-      if date <= to:
-        heappush(heap, (date, ordinal, reminder, gen))
+      # heapq implements a min-heap, so negate the date to get a max-heap
+      heappush(heap, (-date.toordinal(), ordinal, date, reminder, gen))
 
-    for i, reminder in enumerate(self.reminders):
-      gen = iter(reminder.condition(mode).scan(fromDate))
+    reminders = [(_reminderOrdinal(i), reminder) for i, reminder in enumerate(self.reminders)]
+    for position, store in self.stores:
+      base = _storeOrdinal(position)
+      reminders.extend((base + i, store.reminder(i)) for i in range(len(store)))
+    for i, reminder in reminders:
+      cond = reminder.condition(mode)
+      if not cond.reachability().intersects(datetime.date.min, startDate):
+        continue
+      gen = iter(cond.scanBack(startDate))
       __pushNextEvent(i, reminder, gen)
-    currentDate = None
     while len(heap) > 0:
-      date, ordinal, reminder, gen = heappop(heap)
-      if date != currentDate:
-        currentDate = date
-        self._handleNextDate(date)
-      self._executeReminder(reminder, date)
+      _, ordinal, date, reminder, gen = heappop(heap)
+      yield (date, reminder)
       __pushNextEvent(ordinal, reminder, gen)
 
+  def histogram(self, fromDate, toDate, period):
+    '''Подсчитать количество событий в каждом периоде заданного диапазона дат.
+    События не перебираются: количество для каждой напоминалки вычисляется
+    методом L{DateCondition.histogram<DateCondition.DateCondition.histogram>}.
+    Количество дней для заблаговременного предупреждения о событии не
+    учитывается.
+
+    @param fromDate: объект класса C{datetime.date}, задающий начальную дату
+    @param toDate: объект класса C{datetime.date}, задающий конечную дату (включительно)
+    @param period: элемент «перечисления» L{Period<utils.dates.Period>}
+    @returns: список кортежей (начальная дата периода, количество событий) для
+      каждого периода, пересекающегося с диапазоном, в порядке возрастания дат
+    '''
+    ret = [[start, 0] for start, _, _ in dateutils.periods(fromDate, toDate, period)]
+    for reminder in itertools.chain(self.reminders, self._storeReminders()):
+      cond = reminder.condition(RunnerMode.EVENTS)
+      if not cond.reachability().intersects(fromDate, toDate):
+        continue
+      for item, (_, count) in zip(ret, cond.histogram(fromDate, toDate, period)):
+        item[1] += count
+    return [tuple(item) for item in ret]
+
+  def occurrenceMatrix(self, fromDate, toDate, mode):
+    '''Построить матрицу событий «напоминалка × день» в виде массива numpy.
+
+    @see: L{OccurrenceMatrix.occurrenceMatrix}
+    '''
+    from .OccurrenceMatrix import occurrenceMatrix
+    return occurrenceMatrix(self.reminders, fromDate, toDate, mode)
+
+  def occurrenceIndices(self, fromDate, toDate, mode):
+    '''Построить матрицу событий «напоминалка × день» в формате CSR.
+
+    @see: L{OccurrenceMatrix.occurrenceIndices}
+    '''
+    from .OccurrenceMatrix import occurrenceIndices
+    return occurrenceIndices(self.reminders, fromDate, toDate, mode)
+
+  def _executeDay(self, date, events):
+    '''Метод для переопределения в наследнике.  Вызывается один раз для
+    каждой даты, на которую приходятся события, со всеми этими событиями, что
+    позволяет наследникам обрабатывать события пакетами (например, записывать
+    их в базу данных одним запросом).  Реализация по умолчанию вызывает метод
+    L{_handleNextDate}, а затем L{_executeReminder} для каждого события,
+    передавая эти вызовы методу L{_dispatch}.
+
+    @param date: объект класса C{datetime.date}, дата событий
+    @param events: список кортежей (объект класса
+      L{Reminder<Reminder.Reminder>}, признак заблаговременного предупреждения)
+      в порядке добавления напоминалок.  Признак равен C{True}, если событие
+      приходится на дату после конечной даты запуска и выводится только
+      благодаря количеству дней для заблаговременного предупреждения.
+    '''
+    self._dispatch(self._handleNextDate, date)
+    for reminder, _ in events:
+      self._dispatch(self._executeReminder, reminder, date)
+
+  def _dispatch(self, func, *args):
+    '''Вызвать C{func(*args)}.  Если количество потоков не задано, функция
+    вызывается сразу.  Иначе она выполняется в пуле потоков, а текст, который
+    она выводит через L{outputStream<Action.outputStream>}, накапливается и
+    записывается в порядке вызовов этого метода, так что вывод совпадает с
+    выводом при последовательном выполнении.  Вывод действий, печатающих
+    прямо в C{sys.stdout} или C{sys.stderr}, не упорядочивается.
+
+    Если функция завершается исключением, как и при последовательном
+    выполнении, записывается вывод всех предыдущих вызовов, ещё не начатые
+    вызовы отменяются, и исключение выбрасывается из метода L{run} (или
+    L{runBack}).  Вывод последующих вызовов, которые уже успели выполниться
+    параллельно, отбрасывается.
+
+    @param func: callable, например L{_executeReminder}
+    @param args: аргументы для C{func}
+    '''
+    if self.__dispatcher is None:
+      func(*args)
+      return
+    executor, pending, _ = self.__dispatcher
+    pending.append(executor.submit(captureOutput, func, *args))
+    # reorder buffer: commit finished calls in order, and don't let the
+    # buffer grow beyond a few calls per worker
+    while len(pending) > 0 and (pending[0].done() or len(pending) > 2 * self.maxWorkers):
+      self.__commit()
+
+  @contextlib.contextmanager
+  def __dispatching(self):
+    if self.maxWorkers is None:
+      yield
+      return
+    pending = collections.deque()
+    with ThreadPoolExecutor(max_workers=self.maxWorkers) as executor:
+      self.__dispatcher = (executor, pending, outputStream())
+      try:
+        yield
+        while len(pending) > 0:
+          self.__commit()
+      except BaseException:
+        for future in pending:
+          future.cancel()
+        raise
+      finally:
+        self.__dispatcher = None
+
+  def __commit(self):
+    _, pending, output = self.__dispatcher
+    output.write(pending.popleft().result())
+
   def _handleNextDate(self, date):
-    '''Метод для определения в наследнике.  Вызывается, когда очередное событие
-    попадает на дату, которая превышает дату предыдущего события.  Реализация
-    по умолчанию ничего не делает.
+    '''Метод для определения в наследнике.  Вызывается реализацией
+    L{_executeDay} по умолчанию перед обработкой событий очередной даты.
+    Реализация по умолчанию ничего не делает.
 
     @param date: объект класса C{datetime.date}, дата события
     '''
     pass
 
   def _executeReminder(self, reminder, date):
-    '''Метод для определения в наследнике.  Вызывается, когда требуется выполнить
-    действие, связанное с напоминалкой. Реализация по умолчанию ничего не делает.
+    '''Метод для определения в наследнике.  Вызывается реализацией
+    L{_executeDay} по умолчанию, когда требуется выполнить действие, связанное
+    с напоминалкой. Реализация по умолчанию ничего не делает.
 
     @param reminder: объект класса L{Reminder<Reminder.Reminder>}
     @param date: объект класса C{datetime.date}, дата события
     '''
     pass
 
+  class Test(unittest.TestCase):
+    '''Набор unit-тестов'''
+
+    def setUp(self):
+      from .Reminder import ShortcutReminder
+      self.runner = Runner()
+      for s in ('REM 1 MSG First', 'REM Mon MSG Monday', 'REM 2010-01-01 MSG Once'):
+        self.runner.add(ShortcutReminder.fromString(s))
+      self.startDate = datetime.date(2010, 2, 1)
+
+    def __messages(self, events):
+      return [(date, reminder.action.message) for date, reminder in events]
+
+    def test_iterEvents(self):
+      events = self.runner.iterEvents(self.startDate,
+        datetime.date(2010, 2, 8), RunnerMode.EVENTS)
+      self.assertEqual(self.__messages(events), [
+        (datetime.date(2010, 2, 1), 'First'),
+        (datetime.date(2010, 2, 1), 'Monday'),
+        (datetime.date(2010, 2, 8), 'Monday'),
+      ])
+
+    def test_iterEventsBack(self):
+      events = self.runner.iterEventsBack(self.startDate, RunnerMode.EVENTS)
+      self.assertEqual(self.__messages(itertools.islice(events, 5)), [
+        (datetime.date(2010, 2, 1), 'First'),
+        (datetime.date(2010, 2, 1), 'Monday'),
+        (datetime.date(2010, 1, 25), 'Monday'),
+        (datetime.date(2010, 1, 18), 'Monday'),
+        (datetime.date(2010, 1, 11), 'Monday'),
+      ])
+
+    def test_iterEventsBackFinite(self):
+      from .Reminder import ShortcutReminder
+      runner = Runner()
+      runner.add(ShortcutReminder.fromString('REM 2010-01-01 MSG Once'))
+      runner.add(ShortcutReminder.fromString('REM 2011-01-01 MSG Future'))
+      events = list(runner.iterEventsBack(self.startDate, RunnerMode.EVENTS))
+      self.assertEqual(self.__messages(events), [
+        (datetime.date(2010, 1, 1), 'Once'),
+      ])
+
+    def test_iterEventsBackWrappedDay(self):
+      from .Reminder import ShortcutReminder
+      D = datetime.date
+      for string, startDate in (('REM 31 MSG Last', D(2009, 6, 30)),
+          ('REM 31 --1 MSG Before last', D(2010, 9, 30))):
+        runner = Runner()
+        runner.add(ShortcutReminder.fromString(string))
+        forward = list(runner.iterEvents(startDate - datetime.timedelta(days=90),
+          startDate, RunnerMode.EVENTS))
+        backward = runner.iterEventsBack(startDate, RunnerMode.EVENTS)
+        self.assertEqual(self.__messages(itertools.islice(backward, 3)),
+          self.__messages(forward[::-1][:3]), string)
+
+    def test_executeDay(self):
+      from .Reminder import ShortcutReminder
+      class DayRunner(Runner):
+        def _executeDay(self, date, events):
+          days.append((date, [(reminder.action.message, isWarning) for reminder, isWarning in events]))
+      # the hook is called the same way with a thread pool
+      for maxWorkers in (None, 2):
+        days = []
+        runner = DayRunner(maxWorkers)
+        runner.add(ShortcutReminder.fromString('REM Mon MSG Monday'))
+        runner.add(ShortcutReminder.fromString('REM 9 +2 MSG Ninth'))
+        runner.add(ShortcutReminder.fromString('REM 8 MSG Eighth'))
+        runner.run(datetime.date(2010, 2, 7), datetime.date(2010, 2, 8), RunnerMode.REMIND)
+        self.assertEqual(days, [
+          (datetime.date(2010, 2, 8), [('Monday', False), ('Eighth', False)]),
+          (datetime.date(2010, 2, 9), [('Ninth', True)]),
+        ])
+
+    def test_singleDay(self):
+      from .Reminder import ShortcutReminder
+      # build the index, then check that it is updated incrementally
+      list(self.runner.iterEvents(self.startDate, self.startDate, RunnerMode.EVENTS))
+      self.runner.add(ShortcutReminder.fromString('REM Feb 1 MSG Added'))
+      self.runner.add(ShortcutReminder.fromString('REM Feb 2 MSG Other'))
+      events = self.runner.iterEvents(self.startDate, self.startDate, RunnerMode.EVENTS)
+      self.assertEqual(self.__messages(events), [
+        (datetime.date(2010, 2, 1), 'First'),
+        (datetime.date(2010, 2, 1), 'Monday'),
+        (datetime.date(2010, 2, 1), 'Added'),
+      ])
+
+    def test_histogram(self):
+      self.assertEqual(self.runner.histogram(datetime.date(2009, 12, 20),
+          datetime.date(2010, 2, 10), dateutils.Period.MONTH), [
+        (datetime.date(2009, 12, 1), 2),
+        (datetime.date(2010, 1, 1), 6),
+        (datetime.date(2010, 2, 1), 3),
+      ])
+
 
 class PrintRunner(Runner):
   '''Наследник класса L{Runner}, подходящий для обработки текстовых
@@ -127,15 +548,477 @@ class PrintRunner(Runner):
   сообщения в поток вывода).'''
 
   def _handleNextDate(self, date):
-    print('Reminders for %s' % date.isoformat())
+    print('Reminders for %s' % date.isoformat(), file=outputStream())
 
   def _executeReminder(self, reminder, date):
     reminder.execute(date)
 
 
+  class Test(unittest.TestCase):
+    '''Набор unit-тестов'''
+
+    def setUp(self):
+      import threading
+      from .Action import Action
+      test = self
+      self.finished = []
+      lock = threading.Lock()
+
+      class _Printer(Action):
+        def __init__(self, message, waitFor=None, fail=False):
+          self.message = message
+          self.waitFor = waitFor
+          self.fail = fail
+          self.done = threading.Event()
+        def __call__(self, date):
+          test.stdout.append(sys.stdout)
+          # the timeout only guards against a deadlock in a broken runner
+          if self.waitFor is not None and not self.waitFor.done.wait(10):
+            raise RuntimeError('%s: not run concurrently' % self.message)
+          if self.fail:
+            raise RuntimeError(self.message)
+          print(self.message, file=outputStream())
+          with lock:
+            test.finished.append(self.message)
+          self.done.set()
+      self.Printer = _Printer
+      self.stdout = []
+
+    def __run(self, runner, actions, output=None):
+      from .Action import outputTo
+      from .DateCondition import SimpleDateCondition
+      from .Reminder import BasicReminder
+      for i, action in enumerate(actions):
+        runner.add(BasicReminder(SimpleDateCondition(2010, 1, i // 3 + 1), action))
+      with outputTo(output if output is not None else io.StringIO()) as output:
+        runner.run(datetime.date(2010, 1, 1), datetime.date(2010, 1, 31), RunnerMode.EVENTS)
+      return output.getvalue()
+
+    def __expected(self, count):
+      return ''.join(('Reminders for 2010-01-%02d\n' % (i // 3 + 1) if i % 3 == 0 else '')
+        + 'Event %d\n' % i for i in range(count))
+
+    def test_order(self):
+      # in every group of four events an event waits for the next one, so
+      # they finish in reverse order
+      actions = [self.Printer('Event 11')]
+      for i in reversed(range(11)):
+        actions.insert(0, self.Printer('Event %d' % i, actions[0] if i % 4 != 3 else None))
+      self.assertEqual(self.__run(PrintRunner(maxWorkers=4), actions), self.__expected(12))
+      self.assertEqual(self.finished[:4], ['Event 3', 'Event 2', 'Event 1', 'Event 0'])
+      # actions write to their own stream, sys.stdout is not replaced
+      self.assertEqual(set(self.stdout), {sys.stdout})
+
+    def test_sequential(self):
+      actions = [self.Printer('Event %d' % i) for i in range(5)]
+      self.assertEqual(self.__run(PrintRunner(), actions), self.__expected(5))
+
+    def test_error(self):
+      actions = [self.Printer('Event 0'), self.Printer('Event 1'), self.Printer('Event 2', fail=True)]
+      actions += [self.Printer('Event %d' % i) for i in range(3, 12)]
+      output = io.StringIO()
+      with self.assertRaises(RuntimeError):
+        self.__run(PrintRunner(maxWorkers=2), actions, output)
+      # the output of the events before the failed one is written, and the
+      # events that weren't started are cancelled: with two workers at most
+      # four calls are queued after the failed one
+      self.assertEqual(output.getvalue(), self.__expected(2))
+      self.assertLessEqual(len(self.stdout), 3 + 4)
+
+
+class AsyncRunner(Runner):
+  '''Наследник класса L{Runner}, выполняющий действия напоминалок в цикле
+  событий asyncio.  Даты по-прежнему обрабатываются в порядке возрастания, но
+  действия всех событий, приходящихся на одну дату, запускаются одновременно
+  (с ограничением на количество одновременно выполняемых действий), и к
+  следующей дате объект переходит только после завершения всех действий
+  текущей.  Действия, возвращающие awaitable (см.
+  L{AsyncAction<Action.AsyncAction>}), дожидаются с ограничением по времени.
+  Ошибки и превышения времени передаются в метод L{_handleError} и не
+  прерывают запуск.'''
+
+  def __init__(self, maxConcurrency=None, timeout=None):
+    '''Конструктор
+
+    @param maxConcurrency: максимальное количество одновременно выполняемых
+      действий или C{None}, если количество не ограничено
+    @param timeout: ограничение времени выполнения одного действия в секундах
+      или C{None}, если время не ограничено
+    '''
+    super(AsyncRunner, self).__init__()
+    self.maxConcurrency = maxConcurrency
+    self.timeout = timeout
+
+  def run(self, fromDate, toDate, mode):
+    asyncio.run(self.runAsync(fromDate, toDate, mode))
+
+  async def runAsync(self, fromDate, toDate, mode):
+    '''Аналог метода L{run} для вызова из работающего цикла событий asyncio
+
+    @param fromDate: объект класса C{datetime.date}, задающий начальную дату
+    @param toDate: объект класса C{datetime.date}, задающий конечную дату (включительно)
+    @param mode: константа из «перечисления» L{RunnerMode}, задающая режим запуска
+    '''
+    semaphore = asyncio.Semaphore(self.maxConcurrency) \
+      if self.maxConcurrency is not None else None
+
+    async def __execute(reminder, date):
+      try:
+        if semaphore is None:
+          await self.__executeWithTimeout(reminder, date)
+        else:
+          async with semaphore:
+            await self.__executeWithTimeout(reminder, date)
+      except Exception as e:
+        self._handleError(reminder, date, e)
+
+    events = self.iterEvents(fromDate, toDate, mode)
+    for date, group in itertools.groupby(events, lambda event: event[0]):
+      self._handleNextDate(date)
+      await asyncio.gather(*[__execute(reminder, date) for _, reminder in group])
+
+  async def __executeWithTimeout(self, reminder, date):
+    if self.timeout is None:
+      await self._executeReminder(reminder, date)
+    else:
+      await asyncio.wait_for(self._executeReminder(reminder, date), self.timeout)
+
+  async def _executeReminder(self, reminder, date):
+    '''Выполнить действие, связанное с напоминалкой.  В отличие от
+    L{Runner._executeReminder}, является сопрограммой.  Реализация по
+    умолчанию вызывает метод L{Reminder.execute<Reminder.Reminder.execute>} и
+    дожидается результата, если он является awaitable.
+
+    @param reminder: объект класса L{Reminder<Reminder.Reminder>}
+    @param date: объект класса C{datetime.date}, дата события
+    '''
+    result = reminder.execute(date)
+    if inspect.isawaitable(result):
+      await result
+
+  def _handleError(self, reminder, date, error):
+    '''Метод для переопределения в наследнике.  Вызывается, если действие
+    напоминалки завершилось исключением или не уложилось в отведённое время
+    (в этом случае передаётся исключение C{asyncio.TimeoutError}).  Реализация
+    по умолчанию печатает сообщение об ошибке в C{sys.stderr}.
+
+    @param reminder: объект класса L{Reminder<Reminder.Reminder>}
+    @param date: объект класса C{datetime.date}, дата события
+    @param error: объект исключения
+    '''
+    print('%s: %s: %s' % (date.isoformat(), type(error).__name__, error), file=sys.stderr)
+
+
+  class Test(unittest.TestCase):
+    '''Набор unit-тестов'''
+
+    def setUp(self):
+      self.log = []
+      self.errors = []
+      self.active = 0
+      self.maxActive = 0
+
+      test = self
+      class _Action:
+        def __init__(self, name, delay=0.01, fail=False):
+          self.name = name
+          self.delay = delay
+          self.fail = fail
+        async def __call__(self, date):
+          test.active += 1
+          test.maxActive = max(test.maxActive, test.active)
+          try:
+            await asyncio.sleep(self.delay)
+            if self.fail:
+              raise RuntimeError(self.name)
+            test.log.append((date.day, self.name))
+          finally:
+            test.active -= 1
+      self.Action = _Action
+
+      class _Runner(AsyncRunner):
+        def _handleError(self, reminder, date, error):
+          test.errors.append((date.day, type(error)))
+      self.Runner = _Runner
+
+    class _VirtualClock:
+      '''Часы цикла событий, которые не идут сами по себе: когда циклу нечего
+      делать до ближайшего таймера, селектор не ждёт, а переводит часы на
+      это время.  Поэтому C{asyncio.sleep} и ограничения по времени
+      срабатывают мгновенно и в предсказуемом порядке.'''
+
+      def __init__(self):
+        import selectors
+        clock = self
+        self.now = 0.0
+
+        class _Selector(selectors.SelectSelector):
+          def select(self, timeout=None):
+            events = super(_Selector, self).select(0)
+            if not events and timeout is not None and timeout > 0:
+              clock.now += timeout
+            return events
+        self.loop = asyncio.SelectorEventLoop(_Selector())
+        self.loop.time = lambda: self.now
+
+    def __runner(self, actions, **kwargs):
+      from .DateCondition import SimpleDateCondition
+      from .Reminder import BasicReminder
+      runner = self.Runner(**kwargs)
+      for day, action in actions:
+        runner.add(BasicReminder(SimpleDateCondition(2010, 1, day), action))
+      clock = self._VirtualClock()
+      try:
+        clock.loop.run_until_complete(runner.runAsync(datetime.date(2010, 1, 1),
+          datetime.date(2010, 1, 31), RunnerMode.EVENTS))
+      finally:
+        clock.loop.close()
+      self.elapsed = clock.now
+      return runner
+
+    def test_dateOrder(self):
+      self.__runner([
+        (2, self.Action('late')),
+        (1, self.Action('slow', delay=0.05)),
+        (1, self.Action('fast')),
+      ])
+      self.assertEqual(self.log, [(1, 'fast'), (1, 'slow'), (2, 'late')])
+
+    def test_maxConcurrency(self):
+      self.__runner([(1, self.Action(str(i))) for i in range(6)], maxConcurrency=2)
+      self.assertEqual(self.maxActive, 2)
+      self.assertEqual(len(self.log), 6)
+      self.assertAlmostEqual(self.elapsed, 3 * 0.01)
+
+    def test_errors(self):
+      self.__runner([
+        (1, self.Action('hang', delay=10)),
+        (1, self.Action('fail', fail=True)),
+        (2, self.Action('ok')),
+      ], timeout=0.05)
+      self.assertEqual(sorted(self.errors, key=lambda error: error[1].__name__),
+        [(1, RuntimeError), (1, asyncio.TimeoutError)])
+      self.assertEqual(self.log, [(2, 'ok')])
+      # the hanging action was abandoned after the timeout
+      self.assertAlmostEqual(self.elapsed, 0.05 + 0.01)
+
+
+def _loadFiles(runner, filenames, parseCache=None, codeCache=None):
+  '''Выполнить пользовательские файлы напоминалок, добавив описанные в них
+  напоминалки в C{runner}.  Какие объекты передаются в файлы, описано в
+  документации функции L{main}.  Файлы с расширением C{.rem} читаются
+  объектом класса L{RemFileLoader<RemFile.RemFileLoader>}.
+
+  @param runner: объект класса L{Runner}
+  @param filenames: список имён файлов
+  @param parseCache: если не C{None}, объект класса
+    L{ParseCache<StringParser.ParseCache>}, через который разбираются строки
+    напоминалок
+  @param codeCache: если не C{None}, словарь, в котором по имени файла
+    кэшируется его скомпилированное содержимое
+  '''
+  from .OmitCalendar import OmitCalendar
+  from .Reminder import ShortcutReminder
+  from .contrib.deferrable.Reminder import DeferrableReminder
+  from .contrib.timed.Reminder import TimedReminder
+  from .contrib.ical.Importer import IcalImporter
+  from .RemFile import RemFileLoader
+  # like OMIT in remind, omit() affects the reminders that follow it
+  omitCalendar = None
+  def omit(*strings):
+    nonlocal omitCalendar
+    omitCalendar = (omitCalendar or OmitCalendar()).withStrings(strings)
+  def rem(*args, **kwargs):
+    return runner.add(ShortcutReminder.fromString(*args, parseCache=parseCache,
+      omitCalendar=omitCalendar, **kwargs))
+  def deferrable(*args, **kwargs):
+    return runner.add(DeferrableReminder.fromString(*args, parseCache=parseCache,
+      omitCalendar=omitCalendar, **kwargs))
+  def timed(*args, **kwargs):
+    return runner.add(TimedReminder.fromString(*args, parseCache=parseCache,
+      omitCalendar=omitCalendar, **kwargs))
+  # relative .ics paths are resolved against the file being executed
+  baseDir = None
+  def ical(path):
+    count = 0
+    for reminder in IcalImporter().importFile(os.path.join(baseDir, path)):
+      runner.add(reminder)
+      count += 1
+    return count
+  for filename in filenames:
+    if filename.endswith('.rem'):
+      for reminder in RemFileLoader(parseCache=parseCache).load(filename):
+        runner.add(reminder)
+      continue
+    baseDir = os.path.dirname(filename)
+    code = codeCache.get(filename) if codeCache is not None else None
+    if code is None:
+      with open(filename, encoding='utf-8') as f:
+        content = f.read()
+      code = compile(content, filename, 'exec')
+      if codeCache is not None:
+        codeCache[filename] = code
+    exec(code, {
+      'runner': runner,
+      'rem': rem,
+      'deferrable': deferrable,
+      'timed': timed,
+      'ical': ical,
+      'omit': omit,
+    })
+
+
+def _readManifest(filename):
+  '''Прочитать файл со списком пользователей для пакетного режима.
+
+  Каждая непустая строка файла, не начинающаяся с C{#}, описывает одного
+  пользователя и состоит из разделённых пробельными символами полей::
+
+    USER OUTPUT FILENAME...
+
+  Здесь C{OUTPUT} - файл, в который выводятся напоминалки пользователя
+  (C{-} означает стандартный вывод), C{FILENAME...} - файлы напоминалок
+  пользователя.  Относительные пути отсчитываются от каталога, в котором лежит
+  файл со списком.
+
+  @param filename: имя файла со списком пользователей
+  @returns: список кортежей (имя пользователя, имя файла для вывода, список
+    имён файлов напоминалок)
+  @raise FormatError: файл имеет неправильный формат
+  '''
+  from .utils import FormatError
+  base = os.path.dirname(filename)
+  users = []
+  with open(filename, encoding='utf-8') as f:
+    for lineno, line in enumerate(f, 1):
+      fields = line.split()
+      if len(fields) == 0 or fields[0].startswith('#'):
+        continue
+      if len(fields) < 3:
+        raise FormatError('%s:%d: USER OUTPUT FILENAME... expected' % (filename, lineno))
+      user, output, filenames = fields[0], fields[1], fields[2:]
+      if output != '-':
+        output = os.path.join(base, output)
+      users.append((user, output, [os.path.join(base, f) for f in filenames]))
+  return users
+
+
+def _runBatch(manifest, fromDate, toDate, mode, runnerFactory, parseCache=None):
+  '''Обработать в одном процессе напоминалки всех пользователей, перечисленных
+  в файле C{manifest}.  Скомпилированные файлы и результаты разбора строк
+  напоминалок разделяются между пользователями; вывод каждого пользователя
+  пишется в его собственный файл по мере выполнения.
+
+  @param manifest: имя файла со списком пользователей, см. L{_readManifest}
+  @param parseCache: объект класса L{ParseCache<StringParser.ParseCache>} или
+    C{None} (создать новый)
+  @returns: код возврата: 0, если напоминалки всех пользователей обработаны
+    успешно, иначе 1
+  '''
+  from .StringParser import ParseCache
+  from .utils import FormatError
+  try:
+    users = _readManifest(manifest)
+  except (OSError, FormatError) as e:
+    print('Can\'t read manifest: %s' % e, file=sys.stderr)
+    return 1
+
+  if parseCache is None:
+    parseCache = ParseCache()
+  codeCache = {}
+  ret = 0
+  for user, output, filenames in users:
+    try:
+      runner = runnerFactory()
+      _loadFiles(runner, filenames, parseCache, codeCache)
+      if output == '-':
+        runner.run(fromDate, toDate, mode)
+      else:
+        with open(output, 'w', encoding='utf-8') as f, outputTo(f):
+          runner.run(fromDate, toDate, mode)
+    except Exception as e:
+      print('%s: %s: %s' % (user, type(e).__name__, e), file=sys.stderr)
+      ret = 1
+  return ret
+
+
+class _Test_runBatch(unittest.TestCase):
+  '''Набор unit-тестов для функции L{_runBatch}'''
+
+  def setUp(self):
+    import tempfile
+    self.dir = tempfile.TemporaryDirectory()
+
+  def tearDown(self):
+    self.dir.cleanup()
+
+  def __write(self, name, content):
+    path = os.path.join(self.dir.name, name)
+    with open(path, 'w', encoding='utf-8') as f:
+      f.write(content)
+    return path
+
+  def __read(self, name):
+    with open(os.path.join(self.dir.name, name), encoding='utf-8') as f:
+      return f.read()
+
+  def test_sharedFiles(self):
+    from .StringParser import ParseCache
+    self.__write('holidays.rem', 'REM Jan 1 MSG New year\nREM Jan 7 MSG Christmas\n')
+    self.__write('work.py', 'omit("Sat Sun")\nrem("1 -1 MSG Report")\n')
+    self.__write('bob.py', 'rem("Mon MSG Standup")\n')
+    manifest = self.__write('manifest', 'alice alice.out holidays.rem work.py\n'
+      'bob bob.out holidays.rem work.py bob.py\n')
+    parseCache = ParseCache()
+    stdout = io.StringIO()
+    with contextlib.redirect_stdout(stdout):
+      ret = _runBatch(manifest, datetime.date(2010, 1, 1), datetime.date(2010, 1, 4),
+        RunnerMode.EVENTS, PrintRunner, parseCache)
+    self.assertEqual(ret, 0)
+    self.assertEqual(stdout.getvalue(), '')
+    self.assertTrue('New year' in self.__read('alice.out'))
+    self.assertFalse('Standup' in self.__read('alice.out'))
+    self.assertTrue('Standup' in self.__read('bob.out'))
+    # bob reuses the lines parsed for alice, OMIT included: only his own
+    # line is added
+    self.assertEqual(len(parseCache.entries), 4)
+
+
+def _markDone(doneStore, date, keys, usage):
+  '''Записать дату выполнения для напоминалок с заданными ключами (команда
+  C{done} функции L{main})
+
+  @param doneStore: имя файла хранилища
+    L{DoneDateStore<contrib.deferrable.DoneStore.DoneDateStore>} или C{None}
+  @param date: объект класса C{datetime.date} или C{None} (сегодня)
+  @param keys: список ключей напоминалок
+  @param usage: строка с описанием использования программы
+  @returns: код возврата
+  '''
+  if doneStore is None:
+    print('done command requires --done-store', file=sys.stderr)
+    print(usage, file=sys.stderr)
+    return 1
+  if len(keys) == 0:
+    print('Reminder key is required', file=sys.stderr)
+    print(usage, file=sys.stderr)
+    return 1
+  from .contrib.deferrable.DoneStore import DoneDateStore
+  if date is None:
+    date = datetime.date.today()
+  with DoneDateStore(doneStore) as store:
+    for key in keys:
+      store.markDone(key, date)
+  return 0
+
+
 def main(args=sys.argv, runnerFactory=PrintRunner):
   '''Функция main()
 
+  Файлы с расширением C{.rem} читаются как файлы Remind (см.
+  L{RemFileLoader<RemFile.RemFileLoader>}), остальные выполняются как
+  файлы на Python.
+
   При выполнении пользовательского файла в него передаются следующие объекты:
 
     - C{runner} - Объект класса L{Runner}.
@@ -150,6 +1033,61 @@ def main(args=sys.argv, runnerFactory=PrintRunner):
       Аргументы функции передаются в статический метод
       L{DeferrableReminder.fromString<contrib.deferrable.Reminder.DeferrableReminder.fromString>}.
 
+    - C{timed} - Функция, добавляющая в C{runner} объект класса
+      L{TimedReminder<contrib.timed.Reminder.TimedReminder>}.
+      Аргументы функции передаются в статический метод
+      L{TimedReminder.fromString<contrib.timed.Reminder.TimedReminder.fromString>}.
+      Такие напоминалки выводятся как обычные, а в заданное время их
+      выполняет команда C{rempy-timed}, см. L{main<contrib.timed.Scheduler.main>}.
+
+    - C{ical} - Функция, добавляющая в C{runner} напоминалки по событиям
+      из файла iCalendar, см.
+      L{IcalImporter<contrib.ical.Importer.IcalImporter>}.  Аргумент функции -
+      имя файла (относительный путь отсчитывается от каталога выполняемого
+      файла), возвращаемое значение - количество добавленных напоминалок.
+
+    - C{omit} - Функция, добавляющая пропускаемые дни в календарь
+      L{OmitCalendar<OmitCalendar.OmitCalendar>}, который учитывается при
+      разборе последующих напоминалок в функциях C{rem}, C{deferrable} и C{timed}.
+      Аргументы функции - строки, передаваемые в
+      L{OmitCalendar.withStrings<OmitCalendar.OmitCalendar.withStrings>}.
+
+  С опцией C{--batch} вместо списка файлов задаётся файл со списком
+  пользователей (его формат описан в L{_readManifest}), и напоминалки всех
+  пользователей обрабатываются в одном процессе.
+
+  Команда C{stats} вместо вывода событий печатает количество событий в
+  каждом периоде (по умолчанию в каждом месяце, длина периода задаётся опцией
+  C{--period}), см. L{Runner.histogram}.
+
+  С опцией C{--done-store} даты последнего выполнения напоминалок
+  L{DeferrableReminder<contrib.deferrable.Reminder.DeferrableReminder>}
+  берутся из хранилища L{DoneDateStore<contrib.deferrable.DoneStore.DoneDateStore>}.
+  Команда C{done} записывает в это хранилище дату выполнения (по умолчанию
+  сегодняшнюю, другая задаётся опцией C{--date}) для напоминалок с
+  заданными ключами; файлы напоминалок ей не нужны.  Ключ задаётся
+  параметром C{key} функции C{deferrable} и должен быть уникальным;
+  напоминалки без ключа в хранилище не ищутся.
+
+  С опцией C{--occurrence-db} команды C{remind} и C{events} вместо вывода
+  событий дозаполняют ими базу данных SQLite (см.
+  L{OccurrenceDatabase.fill<OccurrenceDatabase.OccurrenceDatabase.fill>});
+  в базе хранятся только события в режиме C{events}, без заблаговременных
+  предупреждений.  Команда C{query} выводит события из этой базы, если набор
+  напоминалок не изменился, и вычисляет и дописывает в базу только
+  недостающие даты (см.
+  L{OccurrenceDatabase.query<OccurrenceDatabase.OccurrenceDatabase.query>}).
+
+  С опцией C{--snapshot} команды C{remind} и C{events} вместо вывода
+  событий записывают их в двоичный файл-снимок (см.
+  L{SnapshotRunner<Snapshot.SnapshotRunner>}), который другие программы
+  читают модулем L{SnapshotReader}, не запуская напоминалки.
+
+  С опцией C{--checkpoint} после запуска в заданный файл записывается объект
+  класса L{Checkpoint<Checkpoint.Checkpoint>}.  Если при этом задана опция
+  C{--since-last-run}, выводятся только события, появившиеся с момента
+  предыдущего запуска.
+
   @param args: Аргументы командной строки
   @param runnerFactory: callable, при вызове без параметров возвращающий объект
     класса L{Runner}, который будет использоваться для запуска напоминалок
@@ -159,39 +1097,53 @@ def main(args=sys.argv, runnerFactory=PrintRunner):
 
   locale.setlocale(locale.LC_ALL, '')
 
-  USAGE = '''Usage: %s COMMAND OPTIONS FILENAMES\n
-COMMAND = { remind | events }
-OPTIONS = [ --from=DATE ] [ --to=DATE | --future=N_DAYS ]''' % args[0]
+  USAGE = '''Usage: %s COMMAND OPTIONS FILENAMES
+       %s COMMAND OPTIONS --batch=MANIFEST
+       %s done --done-store=FILE [ --date=DATE ] KEYS\n
+COMMAND = { remind | events | stats | query }
+OPTIONS = [ --from=DATE ] [ --to=DATE | --future=N_DAYS ]
+          [ --checkpoint=FILE [ --since-last-run ] ]
+          [ --period={ day | week | month | year } ]
+          [ --done-store=FILE ] [ --occurrence-db=FILE | --snapshot=FILE ]''' % (args[0], args[0], args[0])
 
   if len(args) < 2:
     print('A command is required', file=sys.stderr)
     print(USAGE, file=sys.stderr)
     return 1
 
+  stats = done = query = False
   if args[1] == 'remind':
     mode = RunnerMode.REMIND
   elif args[1] == 'events':
     mode = RunnerMode.EVENTS
+  elif args[1] == 'stats':
+    mode = RunnerMode.EVENTS
+    stats = True
+  elif args[1] == 'query':
+    mode = RunnerMode.EVENTS
+    query = True
+  elif args[1] == 'done':
+    mode = None
+    done = True
   else:
     print('Unknown command: "%s"' % args[1], file=sys.stderr)
     print(USAGE, file=sys.stderr)
     return 1
 
   try:
-    longopts = ['help', 'usage', 'from=', 'to=', 'future=']
+    longopts = ['help', 'usage', 'from=', 'to=', 'future=', 'batch=',
+      'checkpoint=', 'since-last-run', 'period=', 'done-store=', 'date=',
+      'occurrence-db=', 'snapshot=']
     options, args = getopt.gnu_getopt(args[2:], 'h', longopts)
   except getopt.GetoptError as err:
     print(repr(err), file=sys.stderr)
     print(USAGE, file=sys.stderr)
     return 1
 
-  if len(args) == 0:
-    print('Filename is required', file=sys.stderr)
-    print(USAGE, file=sys.stderr)
-    return 1
-
   from_ = datetime.date.today()
-  to = future = None
+  to = future = batch = checkpointFile = doneStore = doneDate = occurrenceDb = snapshot = None
+  sinceLastRun = False
+  period = dateutils.Period.MONTH
   for option, value in options:
     if option in ('-h', '--help', '--usage'):
       print(USAGE)
@@ -208,9 +1160,79 @@ OPTIONS = [ --from=DATE ] [ --to=DATE | --future=N_DAYS ]''' % args[0]
     elif option == '--future':
       future = value
       to = None
+    elif option == '--batch':
+      batch = value
+    elif option == '--checkpoint':
+      checkpointFile = value
+    elif option == '--since-last-run':
+      sinceLastRun = True
+    elif option == '--done-store':
+      doneStore = value
+    elif option == '--occurrence-db':
+      occurrenceDb = value
+    elif option == '--snapshot':
+      snapshot = value
+    elif option == '--date':
+      try:
+        doneDate = _parseDate(value)
+      except ValueError:
+        print('Can\'t parse date %s' % value, file=sys.stderr)
+        return 1
+    elif option == '--period':
+      try:
+        period = getattr(dateutils.Period, value.upper())
+      except AttributeError:
+        print('Unknown period: %s' % value, file=sys.stderr)
+        return 1
     else:
       assert False, 'unhandled command-line option'
 
+  if done:
+    return _markDone(doneStore, doneDate, args, USAGE)
+  if doneDate is not None:
+    print('--date can be used only with done command', file=sys.stderr)
+    print(USAGE, file=sys.stderr)
+    return 1
+  if batch is not None and doneStore is not None:
+    print('--done-store can\'t be used together with --batch', file=sys.stderr)
+    print(USAGE, file=sys.stderr)
+    return 1
+
+  if batch is None and len(args) == 0:
+    print('Filename is required', file=sys.stderr)
+    print(USAGE, file=sys.stderr)
+    return 1
+  if batch is not None and len(args) > 0:
+    print('Filenames can\'t be used together with --batch', file=sys.stderr)
+    print(USAGE, file=sys.stderr)
+    return 1
+  if batch is not None and checkpointFile is not None:
+    print('--checkpoint can\'t be used together with --batch', file=sys.stderr)
+    print(USAGE, file=sys.stderr)
+    return 1
+  if stats and (batch is not None or checkpointFile is not None):
+    print('stats command can\'t be used together with --batch or --checkpoint', file=sys.stderr)
+    print(USAGE, file=sys.stderr)
+    return 1
+  if sinceLastRun and checkpointFile is None:
+    print('--since-last-run requires --checkpoint', file=sys.stderr)
+    print(USAGE, file=sys.stderr)
+    return 1
+  if query and occurrenceDb is None:
+    print('query command requires --occurrence-db', file=sys.stderr)
+    print(USAGE, file=sys.stderr)
+    return 1
+  if occurrenceDb is not None and (stats or batch is not None or checkpointFile is not None):
+    print('--occurrence-db can\'t be used together with stats command, --batch or --checkpoint', file=sys.stderr)
+    print(USAGE, file=sys.stderr)
+    return 1
+  if snapshot is not None and (stats or query or occurrenceDb is not None
+      or batch is not None or checkpointFile is not None):
+    print('--snapshot can\'t be used together with stats or query commands, '
+      '--occurrence-db, --batch or --checkpoint', file=sys.stderr)
+    print(USAGE, file=sys.stderr)
+    return 1
+
   if to is not None:
     try:
       to = _parseDate(to)
@@ -229,22 +1251,58 @@ OPTIONS = [ --from=DATE ] [ --to=DATE | --future=N_DAYS ]''' % args[0]
   else:
     to = from_
 
+  if batch is not None:
+    return _runBatch(batch, from_, to, mode, runnerFactory)
+
   runner = runnerFactory()
-  from .Reminder import ShortcutReminder
-  from .contrib.deferrable.Reminder import DeferrableReminder
-  def rem(*args, **kwargs):
-    return runner.add(ShortcutReminder.fromString(*args, **kwargs))
-  def deferrable(*args, **kwargs):
-    return runner.add(DeferrableReminder.fromString(*args, **kwargs))
-  for filename in args:
-    with open(filename, encoding='utf-8') as f:
-      content = f.read()
-    exec(compile(content, filename, 'exec'), {
-      'runner': runner,
-      'rem': rem,
-      'deferrable': deferrable,
-    })
+  _loadFiles(runner, args)
+  if doneStore is not None:
+    from .contrib.deferrable.DoneStore import DoneDateStore
+    with DoneDateStore(doneStore) as store:
+      store.apply(runner.reminders)
+  if snapshot is not None:
+    from .Snapshot import SnapshotRunner
+    snapshotRunner = SnapshotRunner(runner)
+    snapshotRunner.run(from_, to, mode)
+    snapshotRunner.save(snapshot)
+    return 0
+  if occurrenceDb is not None:
+    from .OccurrenceDatabase import OccurrenceDatabase
+    with OccurrenceDatabase(occurrenceDb) as database:
+      if not query:
+        database.fill(runner, from_, to)
+        return 0
+      currentDate = None
+      for date, _, message, _ in database.query(runner, from_, to):
+        if date != currentDate:
+          print('Reminders for %s' % date.isoformat())
+          currentDate = date
+        print(message)
+    return 0
+  if stats:
+    for start, count in runner.histogram(from_, to, period):
+      print('%s %d' % (start.isoformat(), count))
+    return 0
+  if checkpointFile is None:
+    runner.run(from_, to, mode)
+    return 0
+
+  from .Checkpoint import Checkpoint
+  reminders = runner.reminders
+  checkpoint = Checkpoint.load(checkpointFile)
+  if sinceLastRun:
+    delta = checkpoint.deltaReminders(reminders, from_, to, mode) \
+      if checkpoint is not None else None
+    if delta is not None:
+      runner = runnerFactory()
+      for reminder in delta:
+        runner.add(reminder)
   runner.run(from_, to, mode)
+  if checkpoint is None:
+    checkpoint = Checkpoint.fromReminders(reminders, from_, to, mode)
+  else:
+    checkpoint = checkpoint.following(reminders, from_, to, mode)
+  checkpoint.save(checkpointFile)
   return 0
 
 
@@ -0,0 +1,135 @@
+'''Содержит класс L{SnapshotRunner}, записывающий события в снимок, который
+читается классом L{Snapshot<SnapshotReader.Snapshot>}
+
+При запуске из командной строки запускает присутствующие в модуле unit-тесты.'''
+
+import datetime
+import os
+import tempfile
+import unittest
+
+from .Action import captureOutput
+from .Runner import Runner, RunnerMode
+from .utils.files import atomicWrite
+from .SnapshotReader import EVENT, HEADER, MAGIC, UINT, WARNING
+
+
+class SnapshotRunner(Runner):
+  '''Наследник класса L{Runner}, который вместо выполнения действий
+  запоминает события, чтобы затем записать их методом L{save} в компактный
+  двоичный файл (формат описан в модуле L{SnapshotReader}).  В режиме
+  L{REMIND<Runner.RunnerMode.REMIND>} снимок охватывает и даты после конечной,
+  на которые приходятся заблаговременные предупреждения.  Сообщением
+  события считается то, что действие напоминалки выводит (см.
+  L{outputStream<Action.outputStream>});
+  одинаковые сообщения хранятся в таблице строк один раз.
+
+  Использование:
+
+    - сконструировать
+    - вызвать метод L{run}
+    - вызвать метод L{save}
+  '''
+
+  def __init__(self, runner=None):
+    '''Конструктор
+
+    @param runner: если не C{None}, объект класса L{Runner}, напоминалки и
+      хранилища которого добавляются в создаваемый объект
+    '''
+    super(SnapshotRunner, self).__init__()
+    self.fromDate = self.toDate = None
+    self.days = {}
+    if runner is not None:
+      self.reminders = list(runner.reminders)
+      self.stores = list(runner.stores)
+
+  def run(self, fromDate, toDate, mode):
+    self.fromDate, self.toDate = fromDate, toDate
+    self.days = {}
+    super(SnapshotRunner, self).run(fromDate, toDate, mode)
+
+  def _executeDay(self, date, events):
+    day = self.days.setdefault(date, [])
+    for reminder, isWarning in events:
+      output = captureOutput(reminder.execute, date)
+      day.append((output.rstrip('\n'), isWarning))
+
+  def save(self, filename):
+    '''Атомарно записать снимок событий, полученных при последнем вызове
+    L{run}, в файл
+
+    @param filename: имя файла
+    '''
+    assert self.fromDate is not None, 'run() must be called before save()'
+    dayCount = (max([self.toDate] + list(self.days)) - self.fromDate).days + 1
+    strings = {}
+    index = []
+    events = []
+    for i in range(dayCount):
+      index.append(len(events))
+      for message, isWarning in self.days.get(self.fromDate + datetime.timedelta(days=i), ()):
+        string = strings.setdefault(message, len(strings))
+        events.append((string, WARNING if isWarning else 0))
+    index.append(len(events))
+    data = [message.encode('utf-8') for message in strings]
+    offsets = [0]
+    for encoded in data:
+      offsets.append(offsets[-1] + len(encoded))
+
+    with atomicWrite(filename) as f:
+      f.write(HEADER.pack(MAGIC, self.fromDate.toordinal(), dayCount, len(events), len(strings)))
+      f.write(b''.join(UINT.pack(i) for i in index))
+      f.write(b''.join(EVENT.pack(*event) for event in events))
+      f.write(b''.join(UINT.pack(offset) for offset in offsets))
+      f.write(b''.join(data))
+
+
+  class Test(unittest.TestCase):
+    '''Набор unit-тестов'''
+
+    def setUp(self):
+      from .Reminder import ShortcutReminder
+      self.dir = tempfile.TemporaryDirectory()
+      self.filename = os.path.join(self.dir.name, 'snapshot')
+      self.runner = Runner()
+      self.runner.add(ShortcutReminder('15', 'Платёж'))
+      self.runner.add(ShortcutReminder('Mon', 'b', 2))
+
+    def tearDown(self):
+      self.dir.cleanup()
+
+    def test_save(self):
+      from .SnapshotReader import Snapshot
+      D = datetime.date
+      runner = SnapshotRunner(self.runner)
+      runner.run(D(2010, 5, 1), D(2010, 5, 15), RunnerMode.REMIND)
+      runner.save(self.filename)
+      with Snapshot(self.filename) as snapshot:
+        # the advance warning for May 17 extends the snapshot
+        self.assertEqual((snapshot.fromDate, snapshot.toDate), (D(2010, 5, 1), D(2010, 5, 17)))
+        self.assertEqual(snapshot.events(D(2010, 5, 3)), [('b', False)])
+        self.assertEqual(snapshot.events(D(2010, 5, 15)), [('Платёж', False)])
+        self.assertEqual(snapshot.events(D(2010, 5, 17)), [('b', True)])
+        self.assertEqual(snapshot.events(D(2010, 5, 16)), [])
+        self.assertEqual(snapshot.events(D(2010, 4, 30)), [])
+        self.assertEqual(snapshot.events(D(2010, 5, 18)), [])
+      # messages are stored once: 2 strings, 'Платёж' is 12 bytes in UTF-8
+      self.assertEqual(os.path.getsize(self.filename),
+        HEADER.size + UINT.size * 18 + EVENT.size * 4 + UINT.size * 3 + 13)
+
+    def test_errors(self):
+      from .SnapshotReader import Snapshot
+      with open(self.filename, 'wb') as f:
+        f.write(b'not a snapshot at all')
+      self.assertRaises(ValueError, Snapshot, self.filename)
+      runner = SnapshotRunner(self.runner)
+      runner.run(datetime.date(2010, 5, 1), datetime.date(2010, 5, 1), RunnerMode.EVENTS)
+      runner.save(self.filename)
+      with Snapshot(self.filename) as snapshot:
+        self.assertEqual(snapshot.events(datetime.date(2010, 5, 1)), [])
+      self.assertEqual(os.listdir(self.dir.name), ['snapshot'])
+
+
+if __name__ == '__main__':
+  unittest.main()
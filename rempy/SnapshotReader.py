@@ -0,0 +1,164 @@
+'''Содержит класс L{Snapshot} для чтения снимков событий, записанных классом
+L{SnapshotRunner<Snapshot.SnapshotRunner>}, и функцию L{main}
+
+Модуль использует только стандартную библиотеку и не импортирует rempy, так
+что его можно скопировать в другую программу (строку состояния, рассылку
+и т.п.) и читать снимок без запуска напоминалок.
+
+Формат файла (все числа - 32-битные беззнаковые, little-endian):
+
+  - заголовок: 8 байт L{MAGIC}, порядковый номер (см.
+    C{datetime.date.toordinal}) первой даты, количество дат, количество
+    событий, количество строк;
+  - индекс дат: для каждой даты и ещё одно число в конце - номер первого
+    события этой даты, так что события даты M{i} - это события с номерами
+    от M{index[i]} до M{index[i + 1]};
+  - события: для каждого события номер строки сообщения и флаги (бит 0 -
+    признак заблаговременного предупреждения);
+  - таблица строк: для каждой строки и ещё одно число в конце - смещение
+    начала строки в области данных строк;
+  - область данных строк: строки в кодировке UTF-8 подряд.
+
+При запуске из командной строки запускает функцию L{main}.'''
+
+import datetime
+import mmap
+import struct
+import sys
+
+
+MAGIC = b'RempySn1'
+'''Сигнатура в начале файла снимка'''
+
+HEADER = struct.Struct('<8sIIII')
+'''Формат заголовка'''
+
+UINT = struct.Struct('<I')
+'''Формат элемента индекса дат и таблицы строк'''
+
+EVENT = struct.Struct('<II')
+'''Формат события'''
+
+WARNING = 1
+'''Флаг заблаговременного предупреждения'''
+
+
+class Snapshot:
+  '''Снимок событий, отображённый в память.  Файл не разбирается целиком:
+  для ответа на запрос о дате читаются только два элемента индекса, события
+  этой даты и их строки.
+
+  Использование:
+
+    - сконструировать
+    - вызывать метод L{events}
+    - вызвать L{close} (или использовать объект как контекстный менеджер)
+  '''
+
+  def __init__(self, filename):
+    '''Конструктор
+
+    @param filename: имя файла снимка
+    @raise ValueError: файл не является снимком
+    @raise OSError: файл не удаётся прочитать
+    '''
+    super(Snapshot, self).__init__()
+    with open(filename, 'rb') as f:
+      self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+      if len(self.data) < HEADER.size:
+        raise ValueError('%s: not a rempy snapshot' % filename)
+      magic, self.firstOrdinal, self.dayCount, eventCount, stringCount = \
+        HEADER.unpack_from(self.data, 0)
+      if magic != MAGIC:
+        raise ValueError('%s: not a rempy snapshot' % filename)
+      self.__events = HEADER.size + UINT.size * (self.dayCount + 1)
+      self.__strings = self.__events + EVENT.size * eventCount
+      self.__stringData = self.__strings + UINT.size * (stringCount + 1)
+      if len(self.data) < self.__stringData:
+        raise ValueError('%s: truncated rempy snapshot' % filename)
+    except BaseException:
+      self.data.close()
+      raise
+
+  def close(self):
+    '''Закрыть файл'''
+    self.data.close()
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *exc):
+    self.close()
+
+  @property
+  def fromDate(self):
+    '''Первая дата снимка'''
+    return datetime.date.fromordinal(self.firstOrdinal)
+
+  @property
+  def toDate(self):
+    '''Последняя дата снимка'''
+    return datetime.date.fromordinal(self.firstOrdinal + self.dayCount - 1)
+
+  def events(self, date):
+    '''Получить события на дату
+
+    @param date: объект класса C{datetime.date}
+    @returns: список кортежей (сообщение, признак заблаговременного
+      предупреждения) в порядке выполнения; пустой список, если дата не
+      попадает в снимок
+    '''
+    day = date.toordinal() - self.firstOrdinal
+    if day < 0 or day >= self.dayCount:
+      return []
+    indexOffset = HEADER.size + UINT.size * day
+    first, = UINT.unpack_from(self.data, indexOffset)
+    last, = UINT.unpack_from(self.data, indexOffset + UINT.size)
+    result = []
+    for i in range(first, last):
+      string, flags = EVENT.unpack_from(self.data, self.__events + EVENT.size * i)
+      result.append((self.__string(string), bool(flags & WARNING)))
+    return result
+
+  def __string(self, i):
+    offset = self.__strings + UINT.size * i
+    start, = UINT.unpack_from(self.data, offset)
+    end, = UINT.unpack_from(self.data, offset + UINT.size)
+    return self.data[self.__stringData + start:self.__stringData + end].decode('utf-8')
+
+
+def main(args=sys.argv):
+  '''Функция main()
+
+  Печатает события из снимка на сегодняшнюю или заданную (в формате
+  C{YYYY-MM-DD}) дату.
+
+  @param args: Аргументы командной строки
+  @returns: код возврата: 0 при успешном выполнении, 1 в случае ошибки
+  '''
+  assert len(args) > 0
+  if len(args) not in (2, 3):
+    print('Usage: %s SNAPSHOT [DATE]' % args[0], file=sys.stderr)
+    return 1
+  try:
+    date = datetime.date.fromisoformat(args[2]) if len(args) == 3 else datetime.date.today()
+  except ValueError:
+    print('Can\'t parse date %s' % args[2], file=sys.stderr)
+    return 1
+  try:
+    with Snapshot(args[1]) as snapshot:
+      for message, _ in snapshot.events(date):
+        print(message)
+  except (OSError, ValueError) as e:
+    print(e, file=sys.stderr)
+    return 1
+  return 0
+
+
+def _cli():
+  sys.exit(main())
+
+
+if __name__ == '__main__':
+  _cli()
@@ -24,7 +24,7 @@ def parseDate(token):
   try:
     return dateutils.parseIsoDate(token.string())
   except ValueError as e:
-    raise FormatError('at "%s": Can\'t parse date: %s' % (token, e.message))
+    raise FormatError('at "%s": Can\'t parse date: %s' % (token, e))
 
 
 class DateNamedOptionParser:
@@ -100,10 +100,15 @@ class ChainData:
 
     Пример обработчика: L{DateNamedOptionParser}.
 
+  @ivar omitCalendar: Объект класса L{OmitCalendar<OmitCalendar.OmitCalendar>}
+    или C{None}.  Календарь пропускаемых дней, которые учитываются при
+    смещении C{-<Delta>}.
+
   @see: L{DateConditionParser}
   '''
 
-  def __init__(self, optionHandlers=[], namedOptionHandlers={}, unparsedRemainderHandler=None):
+  def __init__(self, optionHandlers=[], namedOptionHandlers={}, unparsedRemainderHandler=None,
+      omitCalendar=None):
     '''Конструктор.  Выполняет defensive copying переданных коллекций.
 
     @param optionHandlers: значение для записи в атрибут
@@ -112,16 +117,19 @@ class ChainData:
       L{namedOptionHandlers<ChainData.namedOptionHandlers>}
     @param unparsedRemainderHandler: значение для записи в атрибут
       L{unparsedRemainderHandler<ChainData.unparsedRemainderHandler>}
+    @param omitCalendar: значение для записи в атрибут
+      L{omitCalendar<ChainData.omitCalendar>}
     @see: L{DateConditionParser}
     '''
     object.__init__(self)
     self.optionHandlers = copy.copy(optionHandlers)
     self.namedOptionHandlers = copy.copy(namedOptionHandlers)
     self.unparsedRemainderHandler = unparsedRemainderHandler
+    self.omitCalendar = omitCalendar
 
   def __copy__(self):
     return ChainData(self.optionHandlers, self.namedOptionHandlers,
-      self.unparsedRemainderHandler)
+      self.unparsedRemainderHandler, self.omitCalendar)
 
 
 class StringParser:
@@ -145,16 +153,25 @@ class DateConditionParser(StringParser):
 
     [REM] <DateSpec> <ShortOpts> <LongOpts>
     <DateSpec> :: { <ISO Date> | [ <Weekday> ... ] [ <Year> ] [ <Month> ] [ <Day> ] }
-    <ShortOpts> :: { { [ {-|--}<Delta> ] | [ *<Repeat> ] } ... }
-    <LongOpts> :: { { [ {FROM|SCANFROM} <ISO Date> ] | [ UNTIL <ISO Date> ] } ... }
+    <ShortOpts> :: { { [ {-|--}<Delta> ] | [ *<Repeat>[w|m] ] } ... }
+    <LongOpts> :: { { [ {FROM|SCANFROM} <ISO Date> ] | [ UNTIL <ISO Date> ] |
+                      [ OMIT <Weekday> ... ] } ... }
 
   Weekday: название дня недели, полное (Wednesday) или краткое (Wed)
   Year: полный номер года
   Month: номер месяца (1-12)
   Day: номер дня (1-31)
 
-  Delta: смещение назад на заданное количество дней, может быть только положительным
-  Repeat: повтор с интервалом, равным заданному количеству дней
+  Delta: смещение назад на заданное количество дней, может быть только
+    положительным.  С одним минусом дни отсчитываются по календарю
+    пропускаемых дней (L{ChainData.omitCalendar} и дни недели из опции OMIT),
+    то есть пропускаемые дни не считаются; с двумя минусами - все дни подряд
+  Repeat: повтор с интервалом, равным заданному количеству дней, а с
+    суффиксом w или m - недель или месяцев.  Повтор в неделях и месяцах
+    отсчитывается от фиксированной даты (должны быть заданы год, месяц и
+    день); в неделях повторяются заданные дни недели (по умолчанию - день
+    недели этой даты), в месяцах - день этой даты, при этом дни недели задавать
+    нельзя
 
   Ключевые слова не чувствительны к регистру
 
@@ -162,8 +179,10 @@ class DateConditionParser(StringParser):
 
     - Дни недели указываются в начале строки и не могут перемешиваться с
       годом, месяцем и днём
-    - Так как не поддерживаются инструкции OMIT, инструкции -<Delta> и --<Delta>
-      абсолютно эквивалентны
+    - Пропускаемые дни задаются не отдельными инструкциями OMIT, а
+      календарём (L{ChainData.omitCalendar}); в самой напоминалке опция OMIT
+      может добавить к нему только дни недели.  Пропускаемые дни влияют
+      только на <Delta>
     - Можно использовать <Repeat> и в случае, когда дата не фиксирована (то есть
       отсутствует хотя бы один из параметров <Year>, <Month>, <Date>), хотя
       в этом мало смысла
@@ -196,33 +215,37 @@ class DateConditionParser(StringParser):
     except StopIteration:
       return SimpleDateCondition()
 
-    token, cond = self._parseDateSpec(token, tokens)
+    token, spec = self._parseDateSpec(token, tokens)
     if token is None:
-      return cond
+      return spec.createCondition()
 
     deltaParser = self._DeltaParser()
     repeatParser = self._RepeatParser()
-    optionHandlers = self.chainData.optionHandlers
-    optionHandlers += [
+    # the chain data is not modified, so that the parser can be reused
+    optionHandlers = self.chainData.optionHandlers + [
       ('-', deltaParser),
       ('*', repeatParser),
     ]
     token = self._parseOptions(token, tokens, optionHandlers)
-    cond = deltaParser.apply(cond)
-    cond = repeatParser.apply(cond)
-    if token is None:
-      return cond
 
+    # named options are parsed before the condition is built, because OMIT
+    # affects <Delta>
     fromParser = DateNamedOptionParser()
     untilParser = DateNamedOptionParser()
-    namedOptionHandlers = self.chainData.namedOptionHandlers
-    namedOptionHandlers.update({
-      'from': fromParser,
-      'startfrom': fromParser,
-      'until': untilParser,
-    })
-    token = self._parseNamedOptions(token, tokens, namedOptionHandlers)
-
+    omitParser = self._OmitParser(self)
+    if token is not None:
+      namedOptionHandlers = dict(self.chainData.namedOptionHandlers)
+      namedOptionHandlers.update({
+        'from': fromParser,
+        'startfrom': fromParser,
+        'until': untilParser,
+        'omit': omitParser,
+      })
+      token = self._parseNamedOptions(token, tokens, namedOptionHandlers)
+
+    cond = repeatParser.createCondition(spec)
+    cond = deltaParser.apply(cond, omitParser.calendar(self.chainData.omitCalendar))
+    cond = repeatParser.apply(cond)
     if fromParser.value() is not None or untilParser.value() is not None:
       cond = LimitedDateCondition(cond,
         from_=fromParser.value(), until=untilParser.value())
@@ -259,20 +282,27 @@ class DateConditionParser(StringParser):
       '''Создать исходя из значений атрибутов объект класса
       L{DateCondition<DateCondition.DateCondition>}'''
       if self.day is not None and self.weekdays is not None:
-        # handle this case like remind
-        return CombinedDateCondition(
-          SimpleDateCondition(self.year, self.month, self.day),
-          LimitedDateCondition(maxMatches=1, \
-            cond=SimpleDateCondition(weekdays=self.weekdays)))
+        # handle this case like remind: the first of the weekdays on or after the day
+        return NthWeekdayDateCondition(self.weekdays, self.day, self.year, self.month)
       else:
         return SimpleDateCondition(self.year, self.month, self.day, self.weekdays)
 
+    def fixedDate(self):
+      '''Получить фиксированную дату
+
+      @returns: объект класса C{datetime.date} или C{None}, если не задан
+        хотя бы один из атрибутов C{year}, C{month}, C{day}
+      '''
+      if self.year is None or self.month is None or self.day is None:
+        return None
+      return dateutils.wrapDate(dateutils.UnsafeDate(self.year, self.month, self.day))
+
   def _parseDateSpec(self, token, tokens):
     ret = self._SimpleDate()
     token, ret.weekdays = self._parseWeekdays(token, tokens)
     if token is not None:
       token, ret.year, ret.month, ret.day = self._parseDate(token, tokens)
-    return (token, ret.createCondition())
+    return (token, ret)
 
   def _parseWeekdays(self, token, tokens):
     weekday_names = (
@@ -383,11 +413,13 @@ class DateConditionParser(StringParser):
     def __init__(self):
       object.__init__(self)
       self.delta = 0
+      self.respectOmits = True
 
     def __call__(self, token):
       error = False
       try:
         start = 2 if token[1] == '-' else 1
+        self.respectOmits = start == 1
         delta = int(token[start:].string())
         if delta < 0:
           raise ValueError()
@@ -400,16 +432,59 @@ class DateConditionParser(StringParser):
       else:
         self.delta = delta
 
-    def apply(self, cond):
+    def apply(self, cond, omitCalendar=None):
       '''Применить параметр <Delta> к объекту класса
       L{DateCondition<DateCondition.DateCondition>}
 
       @param cond: объект класса L{DateCondition<DateCondition.DateCondition>}
+      @param omitCalendar: объект класса L{OmitCalendar<OmitCalendar.OmitCalendar>}
+        или C{None}.  Учитывается, если смещение задано с одним минусом.
       @returns: новый объект класса L{DateCondition<DateCondition.DateCondition>}
         или C{cond}, если парсер не вызывался (в строке не был указан параметр <Delta>).
       '''
-      return cond if self.delta == 0 else \
-        ShiftDateCondition(cond, -self.delta)
+      if self.delta == 0:
+        return cond
+      if not self.respectOmits or omitCalendar is None or omitCalendar.isEmpty():
+        omitCalendar = None
+      return ShiftDateCondition(cond, -self.delta, omitCalendar)
+
+  class _OmitParser:
+    '''Парсер длинной опции C{OMIT <Weekday> ...}
+
+    Использование:
+
+      - добавить в словарь L{namedOptionHandlers<ChainData.namedOptionHandlers>}
+        объекта класса L{ChainData}
+      - выполнить разбор строки
+      - вызвать метод L{calendar} для получения календаря пропускаемых дней
+    '''
+
+    def __init__(self, parser):
+      object.__init__(self)
+      self.parser = parser
+      self.weekdays = None
+
+    def __call__(self, token, tokens):
+      next_token, weekdays = self.parser._parseWeekdays(token, tokens)
+      if weekdays is None:
+        raise FormatError('at "%s": Weekday expected' % token)
+      self.weekdays = (self.weekdays or []) + weekdays
+      return next_token
+
+    def calendar(self, omitCalendar):
+      '''Получить календарь пропускаемых дней с учётом опции
+
+      @param omitCalendar: объект класса L{OmitCalendar<OmitCalendar.OmitCalendar>}
+        или C{None}
+      @returns: объект класса L{OmitCalendar<OmitCalendar.OmitCalendar>} или
+        C{None}, если пропускаемые дни не заданы
+      '''
+      if self.weekdays is None:
+        return omitCalendar
+      from .OmitCalendar import OmitCalendar
+      if omitCalendar is None:
+        omitCalendar = OmitCalendar()
+      return omitCalendar.withOmits(weekdays=self.weekdays)
 
   class _RepeatParser:
     '''Парсер короткой опции <Repeat>
@@ -426,17 +501,45 @@ class DateConditionParser(StringParser):
     def __init__(self):
       object.__init__(self)
       self.repeat = None
+      self.unit = None
+      self.token = None
 
     def __call__(self, token):
       error = False
+      string = token[1:].string()
+      unit = string[-1:] if string[-1:] in ('w', 'm') else None
       try:
-        repeat = int(token[1:].string())
+        repeat = int(string[:-1] if unit is not None else string)
         if repeat <= 0:
           raise ValueError()
       except ValueError:
         raise FormatError('at "%s": Can\'t parse repeat' % token)
       else:
         self.repeat = repeat
+        self.unit = unit
+        self.token = token
+
+    def createCondition(self, spec):
+      '''Создать объект класса L{DateCondition<DateCondition.DateCondition>}
+      по разобранной спецификации даты.  Повтор в неделях и месяцах
+      встраивается в само условие, повтор в днях применяется методом L{apply}.
+
+      @param spec: объект класса L{_SimpleDate<DateConditionParser._SimpleDate>}
+      @returns: объект класса L{DateCondition<DateCondition.DateCondition>}
+      @raise L{FormatError}: повтор в неделях или месяцах задан для
+        нефиксированной даты или повтор в месяцах задан вместе с днями недели
+      '''
+      if self.unit is None:
+        return spec.createCondition()
+      start = spec.fixedDate()
+      if start is None:
+        raise FormatError('at "%s": Repeat in weeks or months needs a fixed date' % self.token)
+      if self.unit == 'w':
+        weekdays = spec.weekdays if spec.weekdays is not None else [start.weekday()]
+        return WeeklyDateCondition(weekdays, self.repeat, start)
+      if spec.weekdays is not None:
+        raise FormatError('at "%s": Repeat in months can\'t be used with weekdays' % self.token)
+      return MonthlyDateCondition(spec.day, self.repeat, start)
 
     def apply(self, cond):
       '''Применить параметр <Repeat> к объекту класса
@@ -446,7 +549,7 @@ class DateConditionParser(StringParser):
       @returns: новый объект класса L{DateCondition<DateCondition.DateCondition>}
         или C{cond}, если парсер не вызывался (в строке не был указан параметр <Repeat>).
       '''
-      return cond if self.repeat is None else \
+      return cond if self.repeat is None or self.unit is not None else \
         CombinedDateCondition(cond, RepeatDateCondition(self.repeat))
 
 
@@ -518,6 +621,39 @@ class DateConditionParser(StringParser):
       s = '2010-01-12 **5'
       self.assertRaises(FormatError, lambda: self.parser.parse(s))
 
+    def test_omit(self):
+      from .OmitCalendar import OmitCalendar
+      parser = DateConditionParser(ChainData(omitCalendar=OmitCalendar(dates=[datetime.date(2010, 4, 30)])))
+      # 2010-05-01 is Saturday
+      for s, date in (
+          ('2010-05-01 -1', datetime.date(2010, 4, 29)),
+          ('2010-05-01 --1', datetime.date(2010, 4, 30)),
+          ('2010-05-03 -1 OMIT Sat Sun', datetime.date(2010, 4, 29)),
+          ('2010-05-03 -1 FROM 2010-01-01 OMIT Sun', datetime.date(2010, 5, 1))):
+        self.assertEqual(list(parser.parse(s).scan(self.startDate)), [date])
+      self.assertEqual(list(self.parser.parse('2010-05-03 -1 OMIT Sat Sun').scan(self.startDate)),
+        [datetime.date(2010, 4, 30)])
+      self.assertRaises(FormatError, lambda: self.parser.parse('2010-05-03 -1 OMIT 2010'))
+
+    def test_repeatWeeks(self):
+      cond = self.parser.parse('Mon Thu 2010-01-07 *2w')
+      self.assertEqual(list(itertools.islice(cond.scan(self.startDate), 4)), [
+        datetime.date(2010, 1, 7),
+        datetime.date(2010, 1, 18),
+        datetime.date(2010, 1, 21),
+        datetime.date(2010, 2, 1),
+      ])
+
+    def test_repeatMonths(self):
+      cond = self.parser.parse('2009-12-31 -1 *2m')
+      self.assertEqual(list(itertools.islice(cond.scan(self.startDate), 3)), [
+        datetime.date(2010, 2, 27),
+        datetime.date(2010, 4, 29),
+        datetime.date(2010, 6, 29),
+      ])
+      self.assertRaises(FormatError, lambda: self.parser.parse('Mon 2010-01-04 *1m'))
+      self.assertRaises(FormatError, lambda: self.parser.parse('Mon 4 *1w'))
+
     def test_unparsedRemainder(self):
       s = 'REM 2010-01-12 MSG Unparsed remainder'
       self.assertRaises(FormatError, lambda: self.parser.parse(s))
@@ -578,16 +714,21 @@ class ReminderParser(StringParser):
       '''
       return self.adv
 
-  def __init__(self, chainFactory=DateConditionParser, chainData=None):
+  def __init__(self, chainFactory=DateConditionParser, chainData=None, omitCalendar=None):
     '''Конструктор
 
     @param chainFactory: callable, при вызове c параметром C{chainData}
       возвращающий объект класса L{StringParser}, который будет обёрнут
     @param chainData: объект класса L{ChainData}
+    @param omitCalendar: если не C{None}, объект класса
+      L{OmitCalendar<OmitCalendar.OmitCalendar>}, записываемый в атрибут
+      L{omitCalendar<ChainData.omitCalendar>} объекта C{chainData}
     '''
     super(ReminderParser, self).__init__()
 
     chainData = copy.copy(chainData) if chainData is not None else ChainData()
+    if omitCalendar is not None:
+      chainData.omitCalendar = omitCalendar
     self.advParser = self._AdvanceWarningParser()
     chainData.optionHandlers.append(('+', self.advParser))
     if chainData.unparsedRemainderHandler is not None:
@@ -641,6 +782,58 @@ class ReminderParser(StringParser):
       self.assertEqual(self.parser.message(), 'New Year')
 
 
+class ParseCache:
+  '''Кэш результатов разбора строк напоминалок.  Позволяет не разбирать
+  повторно одинаковые строки, например, при пакетной обработке файлов многих
+  пользователей, в которые включены общие списки праздников.
+
+  Закэшированные парсер и условие разделяются между всеми, кто запросил разбор
+  одной и той же строки, поэтому их нельзя изменять.  Объекты классов
+  L{DateCondition<DateCondition.DateCondition>} из этого пакета не изменяют
+  своего состояния при поиске дат, так что разделять их безопасно.
+  '''
+
+  def __init__(self):
+    super(ParseCache, self).__init__()
+    self.entries = {}
+
+  def parse(self, string, parserFactory, *factoryArgs):
+    '''Разобрать строку или взять результат разбора из кэша
+
+    @param string: строка для разбора
+    @param parserFactory: callable, возвращающий объект класса L{StringParser}
+    @param factoryArgs: параметры, передаваемые в C{parserFactory}.  Вместе с
+      C{parserFactory} и C{string} входят в ключ кэша, поэтому должны быть
+      hashable.
+    @returns: кортеж из объекта класса L{StringParser}, уже выполнившего
+      разбор, и объекта класса L{DateCondition<DateCondition.DateCondition>}
+    @raise L{FormatError<utils.FormatError>}: строка имеет неправильный формат
+    '''
+    key = (parserFactory, factoryArgs, string)
+    entry = self.entries.get(key)
+    if entry is None:
+      parser = parserFactory(*factoryArgs)
+      entry = (parser, parser.parse(string))
+      self.entries[key] = entry
+    return entry
+
+
+  class Test(unittest.TestCase):
+    '''Набор unit-тестов'''
+
+    def test_shared(self):
+      cache = ParseCache()
+      parser, cond = cache.parse('REM Jan 1 MSG New Year', ReminderParser)
+      parser2, cond2 = cache.parse('REM Jan 1 MSG New Year', ReminderParser)
+      self.assertTrue(parser is parser2 and cond is cond2)
+      self.assertEqual(parser.message(), 'New Year')
+
+    def test_formatError(self):
+      cache = ParseCache()
+      self.assertRaises(FormatError, lambda: cache.parse('2010-01-12 **5', ReminderParser))
+      self.assertEqual(cache.entries, {})
+
+
 from .DateCondition import *
 
 
@@ -5,7 +5,7 @@ import itertools
 import unittest
 
 from rempy.DateCondition import \
-  CombinedDateCondition, DateCondition, \
+  CombinedDateCondition, DateCondition, Reachability, \
   RepeatDateCondition, SimpleDateCondition
 from rempy.Runner import RunnerMode
 
@@ -17,8 +17,11 @@ class DeferrableDateCondition(DateCondition):
   последнего невыполненного события в прошлом.  Преждевременное предупреждение
   не учитывается, если запуск напоминалок происходит в режиме
   L{RunnerMode.EVENTS<rempy.Runner.RunnerMode.EVENTS>}.  Все даты, которые не
-  превышают дату последнего выполнение, выводится не будут.  Реализовано только
-  сканирование в направлении будущего.'''
+  превышают дату последнего выполнение, выводится не будут.  При сканировании
+  в направлении прошлого выводятся все даты обёрнутого условия, превышающие
+  дату последнего выполнения.'''
+
+  __slots__ = ('cond', 'mode', 'doneDate', 'adv')
 
   def __init__(self, cond, runnerMode, doneDate=None, advanceWarningValue=0):
     '''Конструктор
@@ -72,10 +75,37 @@ class DeferrableDateCondition(DateCondition):
       yield date
 
   def scanBack(self, startDate):
-    '''Не реализовано: выбрасывает C{NotImplementedError}'''
-    raise NotImplementedError()
+    gen = self.cond.scanBack(startDate)
+    if self.doneDate is not None:
+      gen = itertools.takewhile(lambda date: date > self.doneDate, gen)
+    return gen
+
+  def _reachability(self):
+    r = self.cond.reachability()
+    if r.isEmpty() or self.doneDate is not None \
+        and r.until is not None and r.until <= self.doneDate:
+      return Reachability.empty()
+    if self.mode == RunnerMode.REMIND:
+      # the last undone date may precede any start date
+      return Reachability()
+    from_ = self.doneDate + datetime.timedelta(days=1) \
+      if self.doneDate is not None else None
+    return r.restricted(from_=from_)
+
+  def _compile(self):
+    # the last undone date found in REMIND mode depends on the start date
+    if self.mode == RunnerMode.REMIND:
+      return None
+    inner = self.cond.compile()
+    if inner is None or self.doneDate is None:
+      return inner
+    lo = self.doneDate.toordinal() + 1
+    return lambda ordinal: inner(ordinal if ordinal > lo else lo)
 
   def __getattr__(self, name):
+    # private attributes (e.g. caches) must not be taken from the wrapped object
+    if name.startswith('_'):
+      raise AttributeError(name)
     return getattr(self.cond, name)
 
 
@@ -120,6 +150,30 @@ class DeferrableDateCondition(DateCondition):
         RunnerMode.EVENTS)
 
 
+    def test_compile(self):
+      doneDate = datetime.date(2010, 6, 14)
+      self.assertIsNone(DeferrableDateCondition(self.simpleCond, RunnerMode.REMIND,
+        doneDate=doneDate).compile())
+      nxt = DeferrableDateCondition(self.simpleCond, RunnerMode.EVENTS,
+        doneDate=doneDate).compile()
+      self.assertEqual(nxt(self.startDate.toordinal()), datetime.date(2010, 7, 14).toordinal())
+
+    def test_scanBack(self):
+      cond = DeferrableDateCondition(self.simpleCond, RunnerMode.REMIND,
+        doneDate=datetime.date(2010, 2, 14))
+      self.assertEqual(list(cond.scanBack(self.startDate)), [
+        datetime.date(2010, 4, 14),
+        datetime.date(2010, 3, 14),
+      ])
+
+    def test_reachability(self):
+      cond = DeferrableDateCondition(SimpleDateCondition(2010, 4, 14),
+        RunnerMode.REMIND, doneDate=datetime.date(2010, 4, 14))
+      self.assertTrue(cond.reachability().isEmpty())
+      cond = DeferrableDateCondition(SimpleDateCondition(2010, 4, 14),
+        RunnerMode.REMIND)
+      self.assertTrue(cond.reachability().intersects(self.startDate, self.startDate))
+
     def test_repeated(self):
       cond = DeferrableDateCondition(
         CombinedDateCondition(
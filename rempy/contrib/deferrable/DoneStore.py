@@ -0,0 +1,161 @@
+'''Содержит класс L{DoneDateStore}'''
+
+import datetime
+import sqlite3
+import unittest
+
+from rempy.utils import FormatError
+
+from .Reminder import DeferrableReminder
+
+
+class DoneDateStore:
+  '''Хранилище дат последнего выполнения событий в базе данных SQLite.
+
+  Даты хранятся по ключу напоминалки (см.
+  L{DeferrableReminder.key<Reminder.DeferrableReminder.key>}) в таблице,
+  упорядоченной по ключу, поэтому поиск и изменение одной записи требуют
+  логарифмического времени, и отметить выполнение события можно без
+  редактирования файла напоминалок.
+
+  Использование:
+
+    - сконструировать
+    - при загрузке напоминалок вызвать L{apply}, который получает даты для
+      всех напоминалок пакетными запросами
+    - при выполнении события вызвать L{markDone}
+    - вызвать L{close} (или использовать объект как контекстный менеджер)
+  '''
+
+  BATCH_SIZE = 500
+  '''Количество ключей в одном запросе (SQLite ограничивает количество
+  параметров запроса)'''
+
+  def __init__(self, filename):
+    '''Конструктор
+
+    @param filename: имя файла базы данных (создаётся, если его нет) или
+      C{':memory:'}
+    '''
+    super(DoneDateStore, self).__init__()
+    self.connection = sqlite3.connect(filename)
+    self.connection.execute('CREATE TABLE IF NOT EXISTS done ('
+      'key TEXT PRIMARY KEY, date TEXT NOT NULL) WITHOUT ROWID')
+
+  def close(self):
+    '''Закрыть базу данных'''
+    self.connection.close()
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *exc):
+    self.close()
+
+  def lookup(self, keys):
+    '''Получить даты последнего выполнения для заданных ключей
+
+    @param keys: Iterable по строкам ключей
+    @returns: словарь, отображающий ключи, для которых в хранилище есть
+      запись, в объекты класса C{datetime.date}
+    '''
+    keys = list(keys)
+    dates = {}
+    for i in range(0, len(keys), self.BATCH_SIZE):
+      batch = keys[i:i + self.BATCH_SIZE]
+      query = 'SELECT key, date FROM done WHERE key IN (%s)' % ','.join('?' * len(batch))
+      for key, date in self.connection.execute(query, batch):
+        dates[key] = datetime.date.fromisoformat(date)
+    return dates
+
+  def markDone(self, key, date):
+    '''Записать дату последнего выполнения события
+
+    @param key: строка ключа напоминалки
+    @param date: объект класса C{datetime.date}
+    '''
+    with self.connection:
+      self.connection.execute('INSERT OR REPLACE INTO done (key, date) VALUES (?, ?)',
+        (key, date.isoformat()))
+
+  def remove(self, key):
+    '''Удалить запись для ключа, если она есть
+
+    @param key: строка ключа напоминалки
+    @returns: C{True}, если запись была удалена
+    '''
+    with self.connection:
+      return self.connection.execute('DELETE FROM done WHERE key = ?', (key,)).rowcount > 0
+
+  def apply(self, reminders):
+    '''Установить даты последнего выполнения напоминалкам из хранилища.
+    Учитываются только объекты класса
+    L{DeferrableReminder<Reminder.DeferrableReminder>} с ключом; дата
+    из хранилища используется, если она позже даты, заданной в самой
+    напоминалке.
+
+    @param reminders: Iterable по объектам класса L{Reminder<rempy.Reminder.Reminder>}
+    @returns: количество напоминалок, которым была установлена дата
+    @raise FormatError: у двух напоминалок одинаковый ключ
+    '''
+    byKey = {}
+    for reminder in reminders:
+      if isinstance(reminder, DeferrableReminder) and reminder.key is not None:
+        if reminder.key in byKey:
+          raise FormatError('Duplicate reminder key: %s' % reminder.key)
+        byKey[reminder.key] = reminder
+    count = 0
+    for key, date in self.lookup(byKey).items():
+      reminder = byKey[key]
+      if reminder.doneDate is None or reminder.doneDate < date:
+        reminder.doneDate = date
+        count += 1
+    return count
+
+
+  class Test(unittest.TestCase):
+    '''Набор unit-тестов'''
+
+    def setUp(self):
+      self.store = DoneDateStore(':memory:')
+
+    def tearDown(self):
+      self.store.close()
+
+    def test_lookup(self):
+      D = datetime.date
+      for i in range(1200):
+        self.store.markDone('task%d' % i, D(2010, 1, 1) + datetime.timedelta(days=i))
+      self.store.markDone('task7', D(2011, 1, 1))
+      dates = self.store.lookup(['task%d' % i for i in range(0, 1500, 7)])
+      self.assertEqual(len(dates), 172)
+      self.assertEqual(dates['task7'], D(2011, 1, 1))
+      self.assertEqual(dates['task14'], D(2010, 1, 15))
+      self.assertTrue(self.store.remove('task7'))
+      self.assertFalse(self.store.remove('task7'))
+      self.assertEqual(self.store.lookup(['task7']), {})
+
+    def test_apply(self):
+      D = datetime.date
+      reminders = [
+        DeferrableReminder.fromString('REM 14 MSG Water plants', key='plants'),
+        DeferrableReminder.fromString('REM 14 DONE 2010-06-14 MSG Pay rent', key='rent'),
+        DeferrableReminder.fromString('REM Sat MSG Backup', key='backup'),
+        DeferrableReminder.fromString('REM 1 MSG Backup'),
+      ]
+      self.store.markDone('plants', D(2010, 4, 14))
+      self.store.markDone('rent', D(2010, 5, 14))
+      self.store.markDone('backup', D(2010, 5, 8))
+      # the reminder without a key doesn't share the done date of the one
+      # with the same message
+      self.store.markDone('Backup', D(2010, 5, 8))
+      self.assertEqual(self.store.apply(reminders), 2)
+      self.assertEqual([r.doneDate for r in reminders],
+        [D(2010, 4, 14), D(2010, 6, 14), D(2010, 5, 8), None])
+
+    def test_duplicateKey(self):
+      reminders = [
+        DeferrableReminder.fromString('REM 14 MSG Water plants', key='plants'),
+        DeferrableReminder.fromString('REM 28 MSG Water plants', key='plants'),
+      ]
+      self.assertRaises(FormatError, self.store.apply, reminders)
@@ -1,7 +1,13 @@
 '''Содержит класс L{DeferrableReminder}'''
 
+import datetime
+import itertools
+import unittest
+
 from rempy.Reminder import Reminder, ShortcutReminder
+from rempy.Runner import RunnerMode
 from rempy.StringParser import ReminderParser
+from rempy.utils import FormatError
 
 from .DateCondition import DeferrableDateCondition
 from .StringParser import DeferrableParser
@@ -12,20 +18,43 @@ class DeferrableReminder(Reminder):
   связанного с напоминалкой.  Более подробное описание поведения см. в
   документации L{DeferrableDateCondition<DateCondition.DeferrableDateCondition>}.
 
+  Дату последнего выполнения можно хранить не в строке напоминалки, а в
+  хранилище L{DoneDateStore<DoneStore.DoneDateStore>}, где она ищется по
+  ключу напоминалки.
+
+  @ivar key: строка, по которой дата последнего выполнения ищется в
+    хранилище L{DoneDateStore<DoneStore.DoneDateStore>}, или C{None}
+
   @see: L{DeferrableDateCondition<DateCondition.DeferrableDateCondition>}
   '''
 
-  def __init__(self, reminder, doneDate):
+  __slots__ = ('reminder', '_doneDate', 'source', 'key')
+
+  def __init__(self, reminder, doneDate, key=None):
     '''Конструктор
 
     @param reminder: оборачиваемый объект класса L{Reminder<rempy.Reminder.Reminder>}
     @param doneDate: объект класса C{datetime.date}, задающий дату последнего выполнения, или C{None}
+    @param key: ключ напоминалки для хранилища L{DoneDateStore<DoneStore.DoneDateStore>} или C{None}
     '''
     super(DeferrableReminder, self).__init__()
     self.reminder = reminder
     self.doneDate = doneDate
+    self.source = None
+    self.key = key
+
+  @property
+  def doneDate(self):
+    '''Дата последнего выполнения (объект класса C{datetime.date}) или
+    C{None}.  При изменении даты запомненные условия сбрасываются.'''
+    return self._doneDate
+
+  @doneDate.setter
+  def doneDate(self, doneDate):
+    self._doneDate = doneDate
+    self._invalidateConditions()
 
-  def condition(self, runnerMode):
+  def _makeCondition(self, runnerMode):
     return DeferrableDateCondition(self.reminder.condition(runnerMode),
       runnerMode, self.doneDate, self.advanceWarningValue())
 
@@ -35,12 +64,20 @@ class DeferrableReminder(Reminder):
   def execute(self, date):
     return self.reminder.execute(date)
 
+  def fingerprint(self):
+    fingerprint = self.source
+    if fingerprint is None:
+      fingerprint = self.reminder.fingerprint()
+    if fingerprint is None:
+      return None
+    return repr((fingerprint, self.doneDate))
+
 
   @staticmethod
   def fromString(dateCondition, doneDate=None,
       chainReminderFactory=ShortcutReminder.fromParser,
       chainParserFactory=ReminderParser,
-      *args, **kwargs):
+      *args, parseCache=None, omitCalendar=None, key=None, **kwargs):
     '''Альтернативный метод конструирования объекта класса L{DeferrableReminder}.
     Позволяет задать всё одной строкой.  Формат строки описан в документации
     парсера L{DeferrableParser<StringParser.DeferrableParser>}.
@@ -64,19 +101,41 @@ class DeferrableReminder(Reminder):
       передать в C{chainReminderFactory}
 
     @param args: дополнительные параметры, которые будут переданы в C{chainReminderFactory}
+    @param parseCache: если не C{None}, объект класса
+      L{ParseCache<rempy.StringParser.ParseCache>}, через который выполняется
+      разбор строки C{dateCondition}
+    @param omitCalendar: если не C{None}, объект класса
+      L{OmitCalendar<rempy.OmitCalendar.OmitCalendar>}, задающий пропускаемые дни
+    @param key: ключ напоминалки для хранилища
+      L{DoneDateStore<DoneStore.DoneDateStore>}.  Если не задан, дата
+      последнего выполнения в хранилище не ищется: ключ по умолчанию (например,
+      сообщение) совпал бы у разных напоминалок с одинаковым текстом.
     @param kwargs: дополнительные параметры, которые будут переданы в C{chainReminderFactory}
     @returns: объект класса L{DeferrableReminder}
 
     @see: L{DeferrableParser<StringParser.DeferrableParser>}
     '''
-    parser = DeferrableParser(chainFactory=chainParserFactory)
-    cond = parser.parse(dateCondition)
-    return DeferrableReminder.fromParser(parser, cond, doneDate,
-      chainReminderFactory, *args, **kwargs)
+    factoryArgs = (chainParserFactory, None, omitCalendar) if omitCalendar is not None \
+      else (chainParserFactory,)
+    if parseCache is not None:
+      parser, cond = parseCache.parse(dateCondition, DeferrableParser, *factoryArgs)
+    else:
+      parser = DeferrableParser(*factoryArgs)
+      cond = parser.parse(dateCondition)
+    reminder = DeferrableReminder.fromParser(parser, cond, doneDate,
+      chainReminderFactory, *args, key=key, **kwargs)
+    plain = (str, int, datetime.date, type(None))
+    if chainReminderFactory is ShortcutReminder.fromParser \
+        and chainParserFactory is ReminderParser \
+        and all(isinstance(arg, plain) for arg in itertools.chain(args, kwargs.values())):
+      reminder.source = repr((dateCondition, doneDate, args, sorted(kwargs.items())))
+      if omitCalendar is not None and not omitCalendar.isEmpty():
+        reminder.source = repr((reminder.source, omitCalendar.fingerprint()))
+    return reminder
 
   @staticmethod
   def fromParser(parser, dateCondition, doneDate=None,
-      chainReminderFactory=ShortcutReminder.fromParser, *args, **kwargs):
+      chainReminderFactory=ShortcutReminder.fromParser, *args, key=None, **kwargs):
     '''Вспомогательный метод для конструирования объекта класса
     L{DeferrableReminder}.  Слабо полезен конечному пользователю, но может
     быть необходим для реализации сторонних классов напоминалок.
@@ -86,6 +145,7 @@ class DeferrableReminder(Reminder):
     @param doneDate: см. документацию L{fromString}
     @param chainReminderFactory: см. документацию L{fromString}
     @param args: см. документацию L{fromString}
+    @param key: см. документацию L{fromString}
     @param kwargs: см. документацию L{fromString}
 
     @returns: объект класса L{DeferrableReminder}
@@ -98,4 +158,24 @@ class DeferrableReminder(Reminder):
       done = done2
 
     chainReminder = chainReminderFactory(parser, dateCondition, *args, **kwargs)
-    return DeferrableReminder(chainReminder, done)
+    return DeferrableReminder(chainReminder, done, key)
+
+
+  class Test(unittest.TestCase):
+    '''Набор unit-тестов'''
+
+    def setUp(self):
+      self.reminder = DeferrableReminder.fromString('REM 14 DONE 2010-04-14 MSG Task')
+
+    def test_conditionCached(self):
+      cond = self.reminder.condition(RunnerMode.REMIND)
+      self.assertTrue(self.reminder.condition(RunnerMode.REMIND) is cond)
+      self.assertFalse(self.reminder.condition(RunnerMode.EVENTS) is cond)
+
+    def test_doneDateInvalidates(self):
+      cond = self.reminder.condition(RunnerMode.REMIND)
+      self.reminder.doneDate = datetime.date(2010, 5, 14)
+      cond2 = self.reminder.condition(RunnerMode.REMIND)
+      self.assertFalse(cond2 is cond)
+      self.assertEqual(next(iter(cond2.scan(datetime.date(2010, 5, 12)))),
+        datetime.date(2010, 6, 14))
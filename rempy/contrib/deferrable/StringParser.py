@@ -1,5 +1,6 @@
 '''Содержит класс L{DeferrableParser}'''
 
+import copy
 import datetime
 import unittest
 
@@ -20,9 +21,11 @@ class DeferrableParser(StringParser):
       метод L{doneDate} и аналогичные геттеры в обёрнутом классе
   '''
 
-  def __init__(self, chainFactory=ReminderParser, chainData=None):
+  def __init__(self, chainFactory=ReminderParser, chainData=None, omitCalendar=None):
     super(DeferrableParser, self).__init__()
     chainData = copy.copy(chainData) if chainData is not None else ChainData()
+    if omitCalendar is not None:
+      chainData.omitCalendar = omitCalendar
     self.doneParser = DateNamedOptionParser()
     chainData.namedOptionHandlers.update({'done': self.doneParser})
     self.chain = chainFactory(chainData=chainData)
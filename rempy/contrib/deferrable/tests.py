@@ -3,6 +3,8 @@
 '''
 
 from .DateCondition import DeferrableDateCondition
+from .DoneStore import DoneDateStore
+from .Reminder import DeferrableReminder
 from .StringParser import DeferrableParser
 
 import unittest
@@ -17,7 +19,9 @@ def additional_tests():
   loader = unittest.TestLoader()
   testCases = [
     DeferrableDateCondition.Test,
+    DoneDateStore.Test,
     DeferrableParser.Test,
+    DeferrableReminder.Test,
   ]
   for testCase in testCases:
     subsuites.append(loader.loadTestsFromTestCase(testCase))
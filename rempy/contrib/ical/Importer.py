@@ -0,0 +1,552 @@
+'''Содержит класс L{IcalImporter} и вспомогательные функции для разбора файлов
+iCalendar (RFC 5545)'''
+
+import datetime
+import io
+import itertools
+import sys
+import unittest
+
+from rempy.DateCondition import SimpleDateCondition, RepeatDateCondition, \
+  LimitedDateCondition, CombinedDateCondition, SatisfyDateCondition, \
+  NthWeekdayDateCondition, WeeklyDateCondition, MonthlyDateCondition
+from rempy.Reminder import ShortcutReminder
+from rempy.utils import FormatError
+from rempy.utils.dates import NonExistingDaysHandling
+from rempy.utils import dates as dateutils
+
+
+_WEEKDAYS = {'MO': 0, 'TU': 1, 'WE': 2, 'TH': 3, 'FR': 4, 'SA': 5, 'SU': 6}
+
+_RULE_PARTS = frozenset(('FREQ', 'INTERVAL', 'BYDAY', 'BYMONTHDAY', 'BYMONTH',
+  'UNTIL', 'COUNT', 'WKST'))
+
+
+class UnsupportedRule(FormatError):
+  '''Класс исключения, означающий, что правило повторения C{RRULE} корректно,
+  но не может быть выражено условиями из модуля
+  L{DateCondition<rempy.DateCondition>}'''
+  pass
+
+
+def unfoldLines(lines):
+  '''Склеить строки, перенесённые по правилам iCalendar (строка,
+  начинающаяся с пробела или табуляции, продолжает предыдущую).  Строки
+  обрабатываются по одной, весь файл в памяти не держится.
+
+  @param lines: Iterable по строкам файла
+  @returns: Iterable по кортежам (номер первой физической строки, логическая
+    строка без символов конца строки)
+  '''
+  current = None
+  currentLineno = 0
+  for lineno, line in enumerate(lines, 1):
+    line = line.rstrip('\r\n')
+    if line[:1] in (' ', '\t') and current is not None:
+      current += line[1:]
+      continue
+    if current:
+      yield currentLineno, current
+    current, currentLineno = line, lineno
+  if current:
+    yield currentLineno, current
+
+
+def parseContentLine(line):
+  '''Разобрать логическую строку iCalendar вида C{NAME;PARAM=VALUE:VALUE}
+
+  @param line: строка
+  @returns: кортеж (имя в верхнем регистре, словарь параметров с именами в
+    верхнем регистре, значение)
+  @raise FormatError: в строке нет двоеточия
+  '''
+  quoted = False
+  for i, c in enumerate(line):
+    if c == '"':
+      quoted = not quoted
+    elif c == ':' and not quoted:
+      break
+  else:
+    raise FormatError('Property value expected: %s' % line)
+  head, value = line[:i], line[i + 1:]
+  name, *params = head.split(';')
+  paramDict = {}
+  for param in params:
+    key, _, paramValue = param.partition('=')
+    paramDict[key.upper()] = paramValue.strip('"')
+  return name.upper(), paramDict, value
+
+
+def unescapeText(value):
+  '''Раскрыть escape-последовательности в значении типа TEXT'''
+  out = []
+  chars = iter(value)
+  for c in chars:
+    if c == '\\':
+      c = next(chars, '')
+      c = '\n' if c in ('n', 'N') else c
+    out.append(c)
+  return ''.join(out)
+
+
+def parseDateValue(value):
+  '''Получить дату из значения типа DATE или DATE-TIME.  Время и часовой пояс
+  отбрасываются.
+
+  @param value: строка вида C{YYYYMMDD} или C{YYYYMMDDTHHMMSS[Z]}
+  @returns: объект класса C{datetime.date}
+  @raise FormatError: строка имеет неправильный формат
+  '''
+  try:
+    if len(value) < 8 or not value[:8].isdigit() or value[8:9] not in ('', 'T'):
+      raise ValueError()
+    return datetime.date(int(value[:4]), int(value[4:6]), int(value[6:8]))
+  except ValueError:
+    raise FormatError('Can\'t parse date: %s' % value)
+
+
+class VEvent:
+  '''Компонент C{VEVENT}: свойства, считанные из файла.  Свойства вложенных
+  компонентов (например, C{VALARM}) не сохраняются.
+
+  @ivar lineno: номер строки, с которой начинается компонент
+  @ivar properties: словарь, отображающий имя свойства в список кортежей
+    (словарь параметров, значение) в порядке следования в файле
+  '''
+
+  __slots__ = ('lineno', 'properties')
+
+  def __init__(self, lineno):
+    super(VEvent, self).__init__()
+    self.lineno = lineno
+    self.properties = {}
+
+  def value(self, name, default=None):
+    '''Получить значение первого свойства с заданным именем или C{default}'''
+    values = self.properties.get(name)
+    return values[0][1] if values else default
+
+  def values(self, name):
+    '''Получить значения всех свойств с заданным именем; значения-списки
+    через запятую разбиваются на элементы'''
+    return [item for _, value in self.properties.get(name, ())
+      for item in value.split(',') if item]
+
+
+def iterEvents(lines):
+  '''Перебрать компоненты C{VEVENT} файла iCalendar.  В памяти одновременно
+  держится только текущий компонент, поэтому файл любого размера можно
+  обработать в ограниченной памяти.
+
+  @param lines: Iterable по строкам файла
+  @returns: Iterable по объектам класса L{VEvent}
+  @raise FormatError: файл имеет неправильный формат
+  '''
+  event = None
+  depth = 0
+  for lineno, line in unfoldLines(lines):
+    try:
+      name, params, value = parseContentLine(line)
+    except FormatError as e:
+      raise FormatError('line %d: %s' % (lineno, e))
+    if name == 'BEGIN':
+      if event is not None:
+        depth += 1
+      elif value.upper() == 'VEVENT':
+        event = VEvent(lineno)
+    elif name == 'END':
+      if event is None:
+        continue
+      if depth > 0:
+        depth -= 1
+      else:
+        yield event
+        event = None
+    elif event is not None and depth == 0:
+      event.properties.setdefault(name, []).append((params, value))
+
+
+def parseRule(string):
+  '''Разобрать значение свойства C{RRULE}
+
+  @param string: строка вида C{FREQ=WEEKLY;BYDAY=MO,WE}
+  @returns: словарь, отображающий имена частей правила в верхнем регистре
+    в значения
+  @raise UnsupportedRule: в правиле есть части, которые не поддерживаются
+  '''
+  rule = {}
+  for part in string.split(';'):
+    if not part:
+      continue
+    key, _, value = part.partition('=')
+    key = key.upper()
+    if key not in _RULE_PARTS:
+      raise UnsupportedRule('%s is not supported' % key)
+    rule[key] = value.upper()
+  return rule
+
+
+def _parseInts(values, what, low, high):
+  try:
+    ints = [int(value) for value in values.split(',')]
+  except ValueError:
+    raise FormatError('Can\'t parse %s: %s' % (what, values))
+  for i in ints:
+    if i == 0 or not low <= abs(i) <= high:
+      raise FormatError('%s out of range: %d' % (what, i))
+  return ints
+
+def _parseByDay(values):
+  byday = []
+  for value in values.split(','):
+    weekday = _WEEKDAYS.get(value[-2:])
+    if weekday is None:
+      raise FormatError('Can\'t parse weekday: %s' % value)
+    n = None
+    if len(value) > 2:
+      n = _parseInts(value[:-2], 'weekday number', 1, 53)[0]
+    byday.append((n, weekday))
+  return byday
+
+def _single(values, what):
+  if values is None:
+    return None
+  if len(values) > 1:
+    raise UnsupportedRule('Several values of %s are not supported' % what)
+  return values[0]
+
+
+def conditionFromRule(dtstart, rule):
+  '''Построить условие по правилу повторения.  Поддерживаются правила
+  C{DAILY}, C{WEEKLY}, C{MONTHLY} и C{YEARLY} с частями C{INTERVAL},
+  C{BYDAY}, C{BYMONTHDAY}, C{BYMONTH}, C{UNTIL}, C{COUNT} и C{WKST}, если
+  выбранные ими даты можно выразить одним условием из модуля
+  L{DateCondition<rempy.DateCondition>}.  Несуществующие даты (например,
+  30 февраля) пропускаются, как того требует RFC 5545.
+
+  @param dtstart: объект класса C{datetime.date}, дата начала события
+  @param rule: словарь, возвращённый функцией L{parseRule}
+  @returns: объект класса L{DateCondition<rempy.DateCondition.DateCondition>}
+  @raise UnsupportedRule: правило не поддерживается
+  @raise FormatError: правило имеет неправильный формат
+  '''
+  freq = rule.get('FREQ')
+  try:
+    interval = int(rule.get('INTERVAL', '1'))
+    if interval <= 0:
+      raise ValueError()
+  except ValueError:
+    raise FormatError('Can\'t parse interval: %s' % rule.get('INTERVAL'))
+  byday = _parseByDay(rule['BYDAY']) if 'BYDAY' in rule else None
+  bymonthday = _parseInts(rule['BYMONTHDAY'], 'month day', 1, 31) if 'BYMONTHDAY' in rule else None
+  bymonth = _parseInts(rule['BYMONTH'], 'month', 1, 12) if 'BYMONTH' in rule else None
+  if bymonth is not None and any(month < 0 for month in bymonth):
+    raise FormatError('month out of range: %s' % rule['BYMONTH'])
+  weekdays = None
+  nthWeekday = None
+  if byday is not None:
+    if all(n is None for n, _ in byday):
+      weekdays = [weekday for _, weekday in byday]
+    else:
+      nthWeekday = _single(byday, 'BYDAY with a number')
+  month = _single(bymonth, 'BYMONTH')
+  day = _single(bymonthday, 'BYMONTHDAY')
+  if interval > 1 and rule.get('WKST', 'MO') != 'MO' and freq == 'WEEKLY':
+    raise UnsupportedRule('WKST other than MO is not supported')
+  if (weekdays is not None or nthWeekday is not None) and day is not None:
+    raise UnsupportedRule('BYDAY together with BYMONTHDAY is not supported')
+  SKIP = NonExistingDaysHandling.SKIP
+
+  if freq == 'DAILY':
+    if nthWeekday is not None:
+      raise UnsupportedRule('BYDAY with a number is not supported in DAILY rules')
+    if interval == 1:
+      if day is not None and day < 0:
+        raise UnsupportedRule('Negative BYMONTHDAY is not supported in DAILY rules')
+      cond = _monthDay(month, day, weekdays)
+    elif byday is None and bymonthday is None and bymonth is None:
+      cond = CombinedDateCondition(
+        SimpleDateCondition(dtstart.year, dtstart.month, dtstart.day),
+        RepeatDateCondition(interval))
+    else:
+      raise UnsupportedRule('BY* parts are not supported in DAILY rules with INTERVAL')
+  elif freq == 'WEEKLY':
+    if nthWeekday is not None or bymonthday is not None or bymonth is not None:
+      raise UnsupportedRule('Only BYDAY without numbers is supported in WEEKLY rules')
+    cond = WeeklyDateCondition(weekdays or [dtstart.weekday()], interval, dtstart)
+  elif freq == 'MONTHLY':
+    if interval > 1 and (byday is not None or bymonth is not None):
+      raise UnsupportedRule('BYDAY and BYMONTH are not supported in MONTHLY rules with INTERVAL')
+    if nthWeekday is not None:
+      cond = _nth(nthWeekday, month)
+    elif weekdays is not None:
+      cond = SimpleDateCondition(None, month, None, weekdays)
+    elif day is not None and day < 0:
+      if interval > 1:
+        raise UnsupportedRule('Negative BYMONTHDAY is not supported in MONTHLY rules with INTERVAL')
+      cond = NthWeekdayDateCondition(range(7), day, None, month, SKIP)
+    elif month is not None:
+      cond = _monthDay(month, day or dtstart.day)
+    else:
+      cond = MonthlyDateCondition(day or dtstart.day, interval, dtstart, SKIP)
+  elif freq == 'YEARLY':
+    if weekdays is not None:
+      raise UnsupportedRule('BYDAY without a number is not supported in YEARLY rules')
+    if day is not None and day < 0:
+      raise UnsupportedRule('Negative BYMONTHDAY is not supported in YEARLY rules')
+    month = month or dtstart.month
+    if day is not None and bymonth is None:
+      # without BYMONTH, BYMONTHDAY expands the rule to every month
+      if interval > 1:
+        raise UnsupportedRule('BYMONTHDAY without BYMONTH is not supported in YEARLY rules with INTERVAL')
+      cond = _monthDay(None, day)
+    elif nthWeekday is not None:
+      if interval > 1 or bymonth is None:
+        raise UnsupportedRule('BYDAY in YEARLY rules is supported only with BYMONTH and without INTERVAL')
+      cond = _nth(nthWeekday, month)
+    else:
+      if day is None:
+        day = dtstart.day
+      if interval == 1:
+        cond = _monthDay(month, day)
+      elif month == dtstart.month:
+        cond = MonthlyDateCondition(day, 12 * interval, dtstart, SKIP)
+      else:
+        raise UnsupportedRule('BYMONTH is not supported in YEARLY rules with INTERVAL')
+  else:
+    raise UnsupportedRule('FREQ=%s is not supported' % freq)
+
+  until = parseDateValue(rule['UNTIL']) if 'UNTIL' in rule else None
+  cond = LimitedDateCondition(cond, dtstart, until)
+  if 'COUNT' in rule:
+    if until is not None:
+      raise FormatError('UNTIL and COUNT must not be used together')
+    count = _parseInts(rule['COUNT'], 'count', 1, sys.maxsize)[0]
+    if count < 0:
+      raise FormatError('count out of range: %d' % count)
+    # the n-th date is found once here, and the rule becomes start-independent
+    last = None
+    for last in itertools.islice(cond.scan(dtstart), count):
+      pass
+    cond = LimitedDateCondition(cond.cond, dtstart, last)
+  return cond
+
+def _monthDay(month, day, weekdays=None):
+  # a day that no month has would make the scan run forever
+  if day is not None and day > dateutils.monthLength(2000, month or 1):
+    raise UnsupportedRule('Day %d does not exist in month %d' % (day, month or 1))
+  return SimpleDateCondition(None, month, day, weekdays, NonExistingDaysHandling.SKIP)
+
+def _nth(nthWeekday, month):
+  n, weekday = nthWeekday
+  try:
+    return NthWeekdayDateCondition.nth([weekday], n, None, month)
+  except ValueError:
+    raise UnsupportedRule('BYDAY=%d%s is not supported' % (n,
+      [k for k, v in _WEEKDAYS.items() if v == weekday][0]))
+
+
+class IcalImporter:
+  '''Класс, создающий напоминалки по событиям из файла iCalendar.
+
+  Для каждого компонента C{VEVENT} создаётся объект класса
+  L{ShortcutReminder<rempy.Reminder.ShortcutReminder>}, который печатает
+  значение свойства C{SUMMARY}.  Правила повторения C{RRULE} переводятся
+  функцией L{conditionFromRule} в условия из модуля
+  L{DateCondition<rempy.DateCondition>}, даты C{EXDATE} исключаются.  Если
+  правило не поддерживается, напоминалка создаётся только на дату
+  C{DTSTART}, и об этом сообщается методом L{_handleUnsupported}.  Свойства
+  C{RDATE} игнорируются (тоже с сообщением).
+
+  Файл читается построчно, а напоминалки выдаются по мере чтения, поэтому
+  время импорта пропорционально размеру файла, а память расходуется только
+  на создаваемые напоминалки.
+
+  @ivar unsupported: количество событий, для которых сработал запасной
+    вариант
+  '''
+
+  def __init__(self):
+    super(IcalImporter, self).__init__()
+    self.unsupported = 0
+
+  def importFile(self, filename):
+    '''Создать напоминалки по событиям из файла
+
+    @param filename: имя файла
+    @returns: Iterable по объектам класса L{ShortcutReminder<rempy.Reminder.ShortcutReminder>}
+    @raise FormatError: файл имеет неправильный формат
+    '''
+    with open(filename, encoding='utf-8', newline='') as f:
+      yield from self.importLines(f, filename)
+
+  def importLines(self, lines, filename='<ical>'):
+    '''Создать напоминалки по событиям из последовательности строк
+
+    @param lines: Iterable по строкам файла iCalendar
+    @param filename: имя файла для сообщений об ошибках
+    @returns: Iterable по объектам класса L{ShortcutReminder<rempy.Reminder.ShortcutReminder>}
+    @raise FormatError: файл имеет неправильный формат
+    '''
+    for event in iterEvents(lines):
+      try:
+        reminder = self.reminderFromEvent(event, filename)
+      except FormatError as e:
+        raise FormatError('%s:%d: %s' % (filename, event.lineno, e))
+      if reminder is not None:
+        yield reminder
+
+  def reminderFromEvent(self, event, filename='<ical>'):
+    '''Создать напоминалку по событию
+
+    @param event: объект класса L{VEvent}
+    @param filename: имя файла для сообщений
+    @returns: объект класса L{ShortcutReminder<rempy.Reminder.ShortcutReminder>}
+      или C{None}, если у события нет даты начала
+    @raise FormatError: событие имеет неправильный формат
+    '''
+    summary = unescapeText(event.value('SUMMARY', ''))
+    value = event.value('DTSTART')
+    if value is None:
+      self.unsupported += 1
+      self._handleUnsupported(filename, event, summary, 'DTSTART is missing, event skipped')
+      return None
+    dtstart = parseDateValue(value)
+    rrule = event.value('RRULE')
+    exdates = frozenset(parseDateValue(v) for v in event.values('EXDATE'))
+
+    cond = None
+    if rrule is not None:
+      try:
+        cond = conditionFromRule(dtstart, parseRule(rrule))
+      except UnsupportedRule as e:
+        self.unsupported += 1
+        self._handleUnsupported(filename, event, summary,
+          '%s, only the first occurrence is imported' % e)
+        rrule = None
+    if cond is None:
+      cond = SimpleDateCondition(dtstart.year, dtstart.month, dtstart.day)
+    if exdates:
+      cond = SatisfyDateCondition(cond, lambda date: date not in exdates)
+    if 'RDATE' in event.properties:
+      self._handleUnsupported(filename, event, summary, 'RDATE is ignored')
+
+    reminder = ShortcutReminder(cond, summary)
+    reminder.source = repr((dtstart, rrule, sorted(exdates), summary))
+    return reminder
+
+  def _handleUnsupported(self, filename, event, summary, reason):
+    '''Метод для переопределения в наследнике.  Вызывается, когда событие
+    не удаётся импортировать полностью.  Реализация по умолчанию печатает
+    сообщение в C{sys.stderr}.
+
+    @param filename: имя файла
+    @param event: объект класса L{VEvent}
+    @param summary: значение свойства C{SUMMARY}
+    @param reason: строка с описанием проблемы
+    '''
+    print('%s:%d: "%s": %s' % (filename, event.lineno, summary, reason), file=sys.stderr)
+
+
+  class Test(unittest.TestCase):
+    '''Набор unit-тестов'''
+
+    def setUp(self):
+      class Importer(IcalImporter):
+        def __init__(self, log):
+          super(Importer, self).__init__()
+          self.log = log
+        def _handleUnsupported(self, filename, event, summary, reason):
+          self.log.append((event.lineno, summary))
+      self.log = []
+      self.importer = Importer(self.log)
+
+    def __import(self, *events):
+      lines = ['BEGIN:VCALENDAR\r\n']
+      for event in events:
+        lines.append('BEGIN:VEVENT\r\n')
+        lines.extend(line + '\r\n' for line in event)
+        lines.append('END:VEVENT\r\n')
+      lines.append('END:VCALENDAR\r\n')
+      return list(self.importer.importLines(io.StringIO(''.join(lines))))
+
+    def __dates(self, reminder, fromDate, count):
+      cond = reminder.condition(None)
+      return list(itertools.islice(cond.scan(fromDate), count))
+
+    def __rule(self, dtstart, rrule, count=6):
+      reminder, = self.__import(['DTSTART;VALUE=DATE:' + dtstart, 'RRULE:' + rrule,
+        'SUMMARY:x'])
+      return self.__dates(reminder, datetime.date(2000, 1, 1), count)
+
+    def test_unfold(self):
+      lines = ['SUMMARY:Long\r\n', ' er\r\n', '\tline\r\n', 'UID:1\r\n']
+      self.assertEqual(list(unfoldLines(lines)), [(1, 'SUMMARY:Longerline'), (4, 'UID:1')])
+
+    def test_single(self):
+      reminder, = self.__import([
+        'DTSTART:20100514T093000Z',
+        'SUMMARY:Meeting\\, room 5',
+        'BEGIN:VALARM', 'TRIGGER:-PT15M', 'SUMMARY:Alarm', 'END:VALARM',
+      ])
+      self.assertEqual(reminder.action.message, 'Meeting, room 5')
+      self.assertEqual(self.__dates(reminder, datetime.date(2010, 1, 1), 2),
+        [datetime.date(2010, 5, 14)])
+
+    def test_daily(self):
+      D = datetime.date
+      self.assertEqual(self.__rule('20100530', 'FREQ=DAILY;INTERVAL=2;COUNT=3'),
+        [D(2010, 5, 30), D(2010, 6, 1), D(2010, 6, 3)])
+      self.assertEqual(self.__rule('20100530', 'FREQ=DAILY;BYDAY=SA,SU;UNTIL=20100606', 10),
+        [D(2010, 5, 30), D(2010, 6, 5), D(2010, 6, 6)])
+
+    def test_weekly(self):
+      D = datetime.date
+      self.assertEqual(self.__rule('20100503', 'FREQ=WEEKLY;INTERVAL=2;BYDAY=MO,FR;COUNT=5', 10),
+        [D(2010, 5, 3), D(2010, 5, 7), D(2010, 5, 17), D(2010, 5, 21), D(2010, 5, 31)])
+
+    def test_monthly(self):
+      D = datetime.date
+      self.assertEqual(self.__rule('20100131', 'FREQ=MONTHLY;COUNT=3'),
+        [D(2010, 1, 31), D(2010, 3, 31), D(2010, 5, 31)])
+      self.assertEqual(self.__rule('20100101', 'FREQ=MONTHLY;BYDAY=-1FR', 2),
+        [D(2010, 1, 29), D(2010, 2, 26)])
+      self.assertEqual(self.__rule('20100101', 'FREQ=MONTHLY;BYMONTHDAY=-1', 2),
+        [D(2010, 1, 31), D(2010, 2, 28)])
+
+    def test_yearly(self):
+      D = datetime.date
+      self.assertEqual(self.__rule('20080229', 'FREQ=YEARLY', 2),
+        [D(2008, 2, 29), D(2012, 2, 29)])
+      self.assertEqual(self.__rule('20100101', 'FREQ=YEARLY;BYMONTH=11;BYDAY=4TH', 2),
+        [D(2010, 11, 25), D(2011, 11, 24)])
+      self.assertEqual(self.__rule('20100315', 'FREQ=YEARLY;INTERVAL=3', 2),
+        [D(2010, 3, 15), D(2013, 3, 15)])
+      self.assertEqual(self.__rule('20100101', 'FREQ=YEARLY;BYMONTHDAY=15', 3),
+        [D(2010, 1, 15), D(2010, 2, 15), D(2010, 3, 15)])
+      self.assertEqual(self.__rule('20100101', 'FREQ=YEARLY;BYMONTH=6;BYMONTHDAY=15', 2),
+        [D(2010, 6, 15), D(2011, 6, 15)])
+      self.assertRaises(UnsupportedRule, conditionFromRule, D(2010, 1, 1),
+        parseRule('FREQ=YEARLY;INTERVAL=2;BYMONTHDAY=15'))
+
+    def test_exdate(self):
+      D = datetime.date
+      reminder, = self.__import(['DTSTART;VALUE=DATE:20100503', 'RRULE:FREQ=WEEKLY',
+        'EXDATE;VALUE=DATE:20100510,20100524', 'SUMMARY:x'])
+      self.assertEqual(self.__dates(reminder, D(2010, 1, 1), 3),
+        [D(2010, 5, 3), D(2010, 5, 17), D(2010, 5, 31)])
+
+    def test_unsupported(self):
+      reminders = self.__import(
+        ['DTSTART:20100503', 'RRULE:FREQ=MONTHLY;BYSETPOS=-1;BYDAY=MO,TU', 'SUMMARY:a'],
+        ['SUMMARY:b'],
+        ['DTSTART:20100503', 'RRULE:FREQ=HOURLY', 'SUMMARY:c'],
+      )
+      self.assertEqual(self.log, [(2, 'a'), (7, 'b'), (10, 'c')])
+      self.assertEqual(self.importer.unsupported, 3)
+      self.assertEqual([self.__dates(reminder, datetime.date(2010, 1, 1), 2) for reminder in reminders],
+        [[datetime.date(2010, 5, 3)]] * 2)
+
+    def test_formatError(self):
+      self.assertRaises(FormatError, self.__import, ['DTSTART:2010', 'SUMMARY:x'])
+      self.assertRaises(FormatError, self.__import, ['DTSTART:20100101', 'RRULE:FREQ=DAILY;INTERVAL=x'])
@@ -0,0 +1,4 @@
+'''Позволяет импортировать напоминалки из файлов iCalendar (.ics).
+
+@see: класс L{IcalImporter<contrib.ical.Importer.IcalImporter>}
+'''
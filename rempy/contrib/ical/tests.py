@@ -0,0 +1,25 @@
+'''При запуске из командной строки запускает все unit-тесты,
+объявленные в пакете C{rempy.contrib.ical}.  Создан просто для удобства.
+'''
+
+from .Importer import IcalImporter
+
+import unittest
+
+
+def additional_tests():
+  '''Получить экземпляр класса C{unittest.TestSuite} со всеми тестами
+
+  @returns: экземпляр класса C{unittest.TestSuite}
+  '''
+  subsuites = []
+  loader = unittest.TestLoader()
+  testCases = [
+    IcalImporter.Test,
+  ]
+  for testCase in testCases:
+    subsuites.append(loader.loadTestsFromTestCase(testCase))
+  return unittest.TestSuite(subsuites)
+
+if __name__ == '__main__':
+  unittest.TextTestRunner().run(additional_tests())
@@ -0,0 +1,207 @@
+'''Содержит класс L{TimedReminder}'''
+
+import datetime
+import itertools
+import unittest
+
+from rempy.Reminder import Reminder, ShortcutReminder
+from rempy.Runner import RunnerMode
+from rempy.StringParser import ReminderParser
+from rempy.utils import FormatError
+
+from .StringParser import TimedParser
+
+
+class TimedReminder(Reminder):
+  '''Класс-декоратор, добавляющий к напоминалке время суток.  Даты событий
+  напоминалки определяются обёрнутой напоминалкой, а в каждую такую дату
+  напоминалка срабатывает в заданное время, а также, как в Remind, за
+  C{delta} минут до него и затем каждые C{repeat} минут до наступления
+  заданного времени.  Сработавшие напоминалки обрабатывает объект класса
+  L{TimedScheduler<Scheduler.TimedScheduler>}.
+
+  @see: L{TimedParser<StringParser.TimedParser>}
+  '''
+
+  __slots__ = ('reminder', 'time', 'delta', 'repeat', 'source')
+
+  def __init__(self, reminder, time, delta=0, repeat=None):
+    '''Конструктор
+
+    @param reminder: оборачиваемый объект класса L{Reminder<rempy.Reminder.Reminder>}
+    @param time: объект класса C{datetime.time}, время срабатывания
+    @param delta: неотрицательное количество минут, за которое нужно
+      начинать напоминать о событии
+    @param repeat: положительное количество минут между повторными
+      напоминаниями или C{None}
+    @raise ValueError: C{delta} отрицательно или C{repeat} не положительно
+    '''
+    if delta < 0:
+      raise ValueError('Time delta must not be negative')
+    if repeat is not None and repeat <= 0:
+      raise ValueError('Time repeat must be positive')
+    super(TimedReminder, self).__init__()
+    self.reminder = reminder
+    self.time = time
+    self.delta = delta
+    self.repeat = repeat
+    self.source = None
+
+  def firings(self):
+    '''Получить моменты срабатывания в течение дня события.  Напоминания,
+    которые пришлись бы на предыдущий день, отбрасываются.
+
+    @returns: упорядоченный кортеж объектов класса C{datetime.time}
+    '''
+    at = self.time.hour * 60 + self.time.minute
+    first = at - self.delta
+    minutes = range(first, at, self.repeat) if self.repeat is not None \
+      else (first,) if self.delta > 0 else ()
+    minutes = [m for m in minutes if m >= 0] + [at]
+    return tuple(datetime.time(*divmod(m, 60)) for m in minutes)
+
+  def nextFiring(self, since):
+    '''Найти ближайший момент срабатывания.  Дни событий перебираются
+    условием обёрнутой напоминалки в режиме
+    L{EVENTS<rempy.Runner.RunnerMode.EVENTS>}, при этом просматривается не
+    больше двух дней: если в первый из них все моменты срабатывания уже
+    прошли, напоминалка сработает в первый момент следующего.
+
+    @param since: объект класса C{datetime.datetime}
+    @returns: объект класса C{datetime.datetime}, первый момент срабатывания
+      не раньше C{since}, или C{None}, если событий больше нет
+    '''
+    cond = self.condition(RunnerMode.EVENTS)
+    try:
+      for date in itertools.islice(cond.scan(since.date()), 2):
+        for time in self.firings():
+          when = datetime.datetime.combine(date, time)
+          if when >= since:
+            return when
+    except OverflowError:
+      pass
+    return None
+
+  def _makeCondition(self, runnerMode):
+    return self.reminder.condition(runnerMode)
+
+  def advanceWarningValue(self):
+    return self.reminder.advanceWarningValue()
+
+  def execute(self, date):
+    return self.reminder.execute(date)
+
+  def fingerprint(self):
+    fingerprint = self.source
+    if fingerprint is None:
+      fingerprint = self.reminder.fingerprint()
+    if fingerprint is None:
+      return None
+    return repr((fingerprint, self.time, self.delta, self.repeat))
+
+
+  @staticmethod
+  def fromString(dateCondition, time=None,
+      chainReminderFactory=ShortcutReminder.fromParser,
+      chainParserFactory=ReminderParser,
+      *args, parseCache=None, omitCalendar=None, **kwargs):
+    '''Альтернативный метод конструирования объекта класса L{TimedReminder}.
+    Позволяет задать всё одной строкой.  Формат строки описан в документации
+    парсера L{TimedParser<StringParser.TimedParser>}.
+
+    @param dateCondition: строка для разбора
+    @param time: Если не C{None} и в строке C{dateCondition} не задано время
+      срабатывания, в качестве такого времени будет использовано значение
+      этого параметра.  Параметр должен быть объектом класса C{datetime.time}.
+
+    @param chainReminderFactory: Фабрика для создания оборачиваемого объекта,
+      см. документацию L{DeferrableReminder.fromString<rempy.contrib.deferrable.Reminder.DeferrableReminder.fromString>}
+    @param chainParserFactory: Фабрика для создания парсера, который можно
+      передать в C{chainReminderFactory}
+
+    @param args: дополнительные параметры, которые будут переданы в C{chainReminderFactory}
+    @param parseCache: если не C{None}, объект класса
+      L{ParseCache<rempy.StringParser.ParseCache>}, через который выполняется
+      разбор строки C{dateCondition}
+    @param omitCalendar: если не C{None}, объект класса
+      L{OmitCalendar<rempy.OmitCalendar.OmitCalendar>}, задающий пропускаемые дни
+    @param kwargs: дополнительные параметры, которые будут переданы в C{chainReminderFactory}
+    @returns: объект класса L{TimedReminder}
+    @raise FormatError: время срабатывания не задано или задано дважды
+
+    @see: L{TimedParser<StringParser.TimedParser>}
+    '''
+    factoryArgs = (chainParserFactory, None, omitCalendar) if omitCalendar is not None \
+      else (chainParserFactory,)
+    if parseCache is not None:
+      parser, cond = parseCache.parse(dateCondition, TimedParser, *factoryArgs)
+    else:
+      parser = TimedParser(*factoryArgs)
+      cond = parser.parse(dateCondition)
+    reminder = TimedReminder.fromParser(parser, cond, time,
+      chainReminderFactory, *args, **kwargs)
+    plain = (str, int, datetime.date, datetime.time, type(None))
+    if chainReminderFactory is ShortcutReminder.fromParser \
+        and chainParserFactory is ReminderParser \
+        and all(isinstance(arg, plain) for arg in itertools.chain(args, kwargs.values())):
+      reminder.source = repr((dateCondition, time, args, sorted(kwargs.items())))
+      if omitCalendar is not None and not omitCalendar.isEmpty():
+        reminder.source = repr((reminder.source, omitCalendar.fingerprint()))
+    return reminder
+
+  @staticmethod
+  def fromParser(parser, dateCondition, time=None,
+      chainReminderFactory=ShortcutReminder.fromParser, *args, **kwargs):
+    '''Вспомогательный метод для конструирования объекта класса
+    L{TimedReminder}.  Слабо полезен конечному пользователю, но может
+    быть необходим для реализации сторонних классов напоминалок.
+
+    @param parser: объект класса L{TimedParser<StringParser.TimedParser>}
+    @param dateCondition: объект класса L{DateCondition<rempy.DateCondition.DateCondition>}
+    @param time: см. документацию L{fromString}
+    @param chainReminderFactory: см. документацию L{fromString}
+    @param args: см. документацию L{fromString}
+    @param kwargs: см. документацию L{fromString}
+
+    @returns: объект класса L{TimedReminder}
+    '''
+    at = parser.time()
+    if at is not None and time is not None:
+      raise FormatError('Time is already specified in reminder string')
+    if at is None:
+      at = time
+    if at is None:
+      raise FormatError('Time is not specified')
+
+    chainReminder = chainReminderFactory(parser, dateCondition, *args, **kwargs)
+    return TimedReminder(chainReminder, at, parser.timeDelta(), parser.timeRepeat())
+
+
+  class Test(unittest.TestCase):
+    '''Набор unit-тестов'''
+
+    def test_firings(self):
+      reminder = TimedReminder.fromString('REM 14 AT 00:10 +25 *10 MSG Task')
+      self.assertEqual(reminder.firings(), (datetime.time(0, 5), datetime.time(0, 10)))
+      reminder = TimedReminder.fromString('REM 14 AT 17:00 +15 MSG Task')
+      self.assertEqual(reminder.firings(), (datetime.time(16, 45), datetime.time(17, 0)))
+
+    def test_nextFiring(self):
+      reminder = TimedReminder.fromString('REM 14 AT 17:00 +10 *5 MSG Task')
+      at = lambda *args: datetime.datetime(2010, 4, *args)
+      self.assertEqual(reminder.nextFiring(at(1, 12, 0)), at(14, 16, 50))
+      self.assertEqual(reminder.nextFiring(at(14, 16, 51)), at(14, 16, 55))
+      self.assertEqual(reminder.nextFiring(at(14, 17, 0)), at(14, 17, 0))
+      self.assertEqual(reminder.nextFiring(at(14, 17, 1)),
+        datetime.datetime(2010, 5, 14, 16, 50))
+
+    def test_finite(self):
+      reminder = TimedReminder.fromString('REM 2010-04-14 AT 09:30 MSG Task')
+      self.assertEqual(reminder.nextFiring(datetime.datetime(2010, 4, 14, 9, 30)),
+        datetime.datetime(2010, 4, 14, 9, 30))
+      self.assertEqual(reminder.nextFiring(datetime.datetime(2010, 4, 14, 9, 31)), None)
+
+    def test_timeRequired(self):
+      self.assertRaises(FormatError, TimedReminder.fromString, 'REM 14 MSG Task')
+      reminder = TimedReminder.fromString('REM 14 MSG Task', datetime.time(8, 0))
+      self.assertEqual(reminder.time, datetime.time(8, 0))
@@ -0,0 +1,277 @@
+'''Содержит класс L{TimedScheduler} и функцию L{main}
+
+При запуске из командной строки запускает функцию L{main}.'''
+
+import datetime
+import getopt
+from heapq import heappop, heappush
+import locale
+import sys
+import time
+import unittest
+
+from rempy.Action import outputStream
+
+from .TimingWheel import TimingWheel
+
+
+# the smallest step of datetime, to find the firing strictly after a moment
+_RESOLUTION = datetime.timedelta(microseconds=1)
+
+
+class TimedScheduler:
+  '''Планировщик, выполняющий действия напоминалок
+  L{TimedReminder<Reminder.TimedReminder>} в моменты их срабатывания.
+  Предназначен для работы в долго живущем процессе.
+
+  Для каждой напоминалки в колесе таймеров L{TimingWheel<TimingWheel.TimingWheel>}
+  хранится ровно один таймер - на ближайший момент срабатывания.  Когда
+  таймер срабатывает, выполняется действие напоминалки и планируется
+  следующий момент срабатывания (см.
+  L{TimedReminder.nextFiring<Reminder.TimedReminder.nextFiring>}), так что
+  каждый такт обходится в постоянное время независимо от количества
+  напоминалок.  Если между вызовами L{runPending} прошло несколько моментов
+  срабатывания напоминалки (процесс спал, часы были переведены), действия
+  выполняются для каждого из них по порядку.
+
+  Использование:
+
+    - сконструировать
+    - добавить напоминалки с использованием метода L{add}
+    - периодически вызывать метод L{runPending} или один раз вызвать метод
+      L{run}
+  '''
+
+  def __init__(self, now, tick=datetime.timedelta(minutes=1)):
+    '''Конструктор
+
+    @param now: объект класса C{datetime.datetime}, текущее время.  Моменты
+      срабатывания до этого времени пропускаются.
+    @param tick: объект класса C{datetime.timedelta}, длина такта колеса
+      таймеров
+    '''
+    super(TimedScheduler, self).__init__()
+    self.now = now
+    self.wheel = TimingWheel(now.replace(second=0, microsecond=0), tick)
+    self.timers = {}
+
+  def __len__(self):
+    '''Количество напоминалок, которые ещё должны сработать'''
+    return len(self.timers)
+
+  def add(self, reminder):
+    '''Добавить напоминалку.  Если напоминалка уже добавлена, она
+    планируется заново.
+
+    @param reminder: объект класса L{TimedReminder<Reminder.TimedReminder>}
+    '''
+    self.remove(reminder)
+    self.__schedule(reminder, self.now)
+
+  def remove(self, reminder):
+    '''Удалить напоминалку, если она была добавлена
+
+    @param reminder: объект класса L{TimedReminder<Reminder.TimedReminder>}
+    '''
+    timer = self.timers.pop(reminder, None)
+    if timer is not None:
+      self.wheel.cancel(timer)
+
+  def runPending(self, now):
+    '''Выполнить действия напоминалок для всех моментов срабатывания не
+    позже заданного времени
+
+    @param now: объект класса C{datetime.datetime}, текущее время
+    @returns: список кортежей (момент срабатывания, напоминалка) в порядке
+      срабатывания
+    '''
+    # the wheel can't take timers for ticks it has already passed, so the
+    # firings missed in the meantime are drained through a heap
+    heap = []
+    for seq, (_, (when, reminder)) in enumerate(self.wheel.advance(now)):
+      del self.timers[reminder]
+      heappush(heap, (when, seq, reminder))
+    seq = len(heap)
+    self.now = max(self.now, now)
+    fired = []
+    while heap:
+      when, _, reminder = heappop(heap)
+      fired.append((when, reminder))
+      self._executeReminder(reminder, when)
+      nextWhen = reminder.nextFiring(when + _RESOLUTION)
+      if nextWhen is not None and nextWhen <= now:
+        heappush(heap, (nextWhen, seq, reminder))
+        seq += 1
+      elif nextWhen is not None:
+        self.timers[reminder] = self.wheel.schedule(nextWhen, (nextWhen, reminder))
+    return fired
+
+  def run(self, clock=datetime.datetime.now, sleep=time.sleep):
+    '''Выполнять действия напоминалок, пока не останется напоминалок,
+    которые ещё должны сработать.  Между тактами колеса таймеров процесс
+    спит.
+
+    @param clock: функция, возвращающая текущее время
+    @param sleep: функция, ожидающая заданное количество секунд
+    '''
+    while len(self.timers) > 0:
+      self.runPending(clock())
+      delay = self.wheel.timeOf(self.wheel.now) - clock()
+      sleep(max(delay.total_seconds(), 0))
+
+  def _executeReminder(self, reminder, when):
+    '''Метод для переопределения в наследнике.  Вызывается, когда требуется
+    выполнить действие, связанное с напоминалкой.  Реализация по умолчанию
+    печатает время срабатывания и выполняет действие для даты срабатывания.
+
+    @param reminder: объект класса L{TimedReminder<Reminder.TimedReminder>}
+    @param when: объект класса C{datetime.datetime}, момент срабатывания
+    '''
+    print('Reminder for %s' % when.strftime('%Y-%m-%d %H:%M'), file=outputStream())
+    reminder.execute(when.date())
+
+  def __schedule(self, reminder, since):
+    when = reminder.nextFiring(since)
+    if when is not None:
+      self.timers[reminder] = self.wheel.schedule(when, (when, reminder))
+
+
+  class Test(unittest.TestCase):
+    '''Набор unit-тестов'''
+
+    def setUp(self):
+      from .Reminder import TimedReminder
+
+      class Scheduler(TimedScheduler):
+        def __init__(self, now, log):
+          super(Scheduler, self).__init__(now)
+          self.log = log
+        def _executeReminder(self, reminder, when):
+          self.log.append((when, reminder.reminder.action.message))
+
+      self.log = []
+      self.scheduler = Scheduler(datetime.datetime(2010, 4, 14, 16, 52, 30), self.log)
+      self.reminders = [
+        TimedReminder.fromString('REM 14 AT 17:00 +10 *5 MSG a'),
+        TimedReminder.fromString('REM 2010-04-15 AT 09:00 MSG b'),
+        TimedReminder.fromString('REM 2010-04-01 AT 09:00 MSG c'),
+      ]
+      for reminder in self.reminders:
+        self.scheduler.add(reminder)
+
+    def __at(self, day, hour, minute):
+      return datetime.datetime(2010, 4, day, hour, minute)
+
+    def test_runPending(self):
+      self.assertEqual(len(self.scheduler), 2)
+      self.scheduler.runPending(self.__at(14, 16, 59))
+      self.assertEqual(self.log, [(self.__at(14, 16, 55), 'a')])
+      self.scheduler.runPending(self.__at(15, 12, 0))
+      self.assertEqual(self.log[1:], [(self.__at(14, 17, 0), 'a'), (self.__at(15, 9, 0), 'b')])
+      self.assertEqual(len(self.scheduler), 1)
+      self.scheduler.runPending(datetime.datetime(2010, 5, 14, 16, 50))
+      self.assertEqual(self.log[3:], [(datetime.datetime(2010, 5, 14, 16, 50), 'a')])
+
+    def test_addTwice(self):
+      self.scheduler.add(self.reminders[1])
+      self.assertEqual(len(self.scheduler), 2)
+      self.scheduler.runPending(self.__at(16, 0, 0))
+      self.assertEqual([message for _, message in self.log], ['a', 'a', 'b'])
+
+    def test_remove(self):
+      self.scheduler.remove(self.reminders[0])
+      self.scheduler.runPending(self.__at(16, 0, 0))
+      self.assertEqual(self.log, [(self.__at(15, 9, 0), 'b')])
+      self.assertEqual(len(self.scheduler), 0)
+
+    def test_run(self):
+      self.scheduler.remove(self.reminders[0])
+      now = [self.scheduler.now]
+      def sleep(seconds):
+        now[0] += datetime.timedelta(seconds=seconds)
+      self.scheduler.run(lambda: now[0], sleep)
+      self.assertEqual(self.log, [(self.__at(15, 9, 0), 'b')])
+      self.assertEqual(now[0], self.__at(15, 9, 1))
+
+    def test_clockJump(self):
+      from .Reminder import TimedReminder
+      for reminder in self.reminders:
+        self.scheduler.remove(reminder)
+      self.scheduler.add(TimedReminder.fromString('REM AT 09:00 MSG daily'))
+      self.scheduler.add(TimedReminder.fromString('REM 2010-04-16 AT 10:00 MSG once'))
+      self.scheduler.runPending(self.__at(15, 8, 0))
+      self.assertEqual(self.log, [])
+      # the clock jumps over several days: every firing runs in order with
+      # its own time
+      fired = self.scheduler.runPending(self.__at(18, 12, 0))
+      self.assertEqual(self.log, [
+        (self.__at(15, 9, 0), 'daily'),
+        (self.__at(16, 9, 0), 'daily'),
+        (self.__at(16, 10, 0), 'once'),
+        (self.__at(17, 9, 0), 'daily'),
+        (self.__at(18, 9, 0), 'daily'),
+      ])
+      self.assertEqual([when for when, _ in fired], [when for when, _ in self.log])
+      self.scheduler.runPending(self.__at(19, 9, 0))
+      self.assertEqual(self.log[5:], [(self.__at(19, 9, 0), 'daily')])
+      self.assertEqual(len(self.scheduler), 1)
+
+
+def main(args=sys.argv, schedulerFactory=TimedScheduler):
+  '''Функция main()
+
+  Выполняет пользовательские файлы напоминалок так же, как функция
+  L{main<rempy.Runner.main>}, и затем, пока есть напоминалки, которые ещё
+  должны сработать, выполняет действия напоминалок, добавленных функцией
+  C{timed}, в моменты их срабатывания.  Остальные напоминалки игнорируются.
+
+  @param args: Аргументы командной строки
+  @param schedulerFactory: callable, при вызове с текущим временем
+    возвращающий объект класса L{TimedScheduler}
+  @returns: код возврата: 0 при успешном выполнении, 1 в случае ошибки
+  '''
+  assert len(args) > 0
+
+  locale.setlocale(locale.LC_ALL, '')
+
+  USAGE = 'Usage: %s FILENAMES' % args[0]
+
+  try:
+    options, args = getopt.gnu_getopt(args[1:], 'h', ['help', 'usage'])
+  except getopt.GetoptError as err:
+    print(repr(err), file=sys.stderr)
+    print(USAGE, file=sys.stderr)
+    return 1
+  for option, value in options:
+    if option in ('-h', '--help', '--usage'):
+      print(USAGE)
+      return 0
+    else:
+      assert False, 'unhandled command-line option'
+
+  if len(args) == 0:
+    print('Filename is required', file=sys.stderr)
+    print(USAGE, file=sys.stderr)
+    return 1
+
+  from rempy.Runner import Runner, _loadFiles
+  from .Reminder import TimedReminder
+  runner = Runner()
+  _loadFiles(runner, args)
+  scheduler = schedulerFactory(datetime.datetime.now())
+  for reminder in runner.reminders:
+    if isinstance(reminder, TimedReminder):
+      scheduler.add(reminder)
+  try:
+    scheduler.run()
+  except KeyboardInterrupt:
+    self.remove(reminder)
+  return 0
+
+
+def _cli():
+  sys.exit(main())
+
+
+if __name__ == '__main__':
+  _cli()
@@ -0,0 +1,133 @@
+'''Содержит класс L{TimedParser}'''
+
+import copy
+import datetime
+import unittest
+
+from rempy.StringParser import StringParser, ReminderParser, ChainData
+from rempy.utils import FormatError
+
+
+class TimedParser(StringParser):
+  '''Класс-декоратор для разбора строки напоминалки с временем срабатывания.
+  К опциям, которые поддерживает обёрнутый класс, добавляется длинная опция
+  в стиле Remind::
+
+    AT <hh:mm> [+<TimeDelta>] [*<TimeRepeat>]
+
+  Здесь C{<TimeDelta>} - за сколько минут до заданного времени начинать
+  напоминать о событии, C{<TimeRepeat>} - с каким интервалом в минутах
+  повторять напоминание до наступления заданного времени.
+
+  Использование:
+    - сконструировать объект
+    - вызвать L{parse}
+    - использовать возвращённое значение и значения, которые возвращают
+      методы L{time}, L{timeDelta}, L{timeRepeat} и аналогичные геттеры в
+      обёрнутом классе
+  '''
+
+  class _AtParser:
+    '''Парсер длинной опции C{AT}
+
+    Использование:
+      - добавить в словарь L{namedOptionHandlers<rempy.StringParser.ChainData.namedOptionHandlers>}
+        объекта класса L{ChainData<rempy.StringParser.ChainData>}
+      - выполнить разбор строки
+      - получить считанные значения из атрибутов C{time}, C{delta} и C{repeat}
+    '''
+
+    def __init__(self):
+      object.__init__(self)
+      self.time = None
+      self.delta = 0
+      self.repeat = None
+
+    def __call__(self, token, tokens):
+      if self.time is not None:
+        raise FormatError('at "%s": "AT" already specified' % token)
+      self.time = self.__parseTime(token)
+      for token in tokens:
+        if token[:1] == '+' and self.delta == 0:
+          self.delta = self.__parseMinutes(token, 'time delta')
+        elif token[:1] == '*' and self.repeat is None:
+          self.repeat = self.__parseMinutes(token, 'time repeat')
+          if self.repeat == 0:
+            raise FormatError('at "%s": Time repeat must be positive' % token)
+        else:
+          return token
+      return None
+
+    @staticmethod
+    def __parseTime(token):
+      try:
+        hours, minutes = token.string().split(':')
+        return datetime.time(int(hours), int(minutes))
+      except ValueError:
+        raise FormatError('at "%s": Can\'t parse time' % token)
+
+    @staticmethod
+    def __parseMinutes(token, what):
+      try:
+        minutes = int(token[1:].string())
+        if minutes < 0:
+          raise ValueError()
+      except ValueError:
+        raise FormatError('at "%s": Can\'t parse %s' % (token, what))
+      return minutes
+
+  def __init__(self, chainFactory=ReminderParser, chainData=None, omitCalendar=None):
+    super(TimedParser, self).__init__()
+    chainData = copy.copy(chainData) if chainData is not None else ChainData()
+    if omitCalendar is not None:
+      chainData.omitCalendar = omitCalendar
+    self.atParser = self._AtParser()
+    chainData.namedOptionHandlers.update({'at': self.atParser})
+    self.chain = chainFactory(chainData=chainData)
+
+  def parse(self, string):
+    return self.chain.parse(string)
+
+  def time(self):
+    '''Получить считанное время срабатывания в виде объекта класса
+    C{datetime.time} или C{None}, если опция C{AT} отсутствовала в исходной
+    строке
+    '''
+    return self.atParser.time
+
+  def timeDelta(self):
+    '''Получить считанное значение C{<TimeDelta>} в минутах (0, если оно
+    отсутствовало в исходной строке)'''
+    return self.atParser.delta
+
+  def timeRepeat(self):
+    '''Получить считанное значение C{<TimeRepeat>} в минутах или C{None},
+    если оно отсутствовало в исходной строке'''
+    return self.atParser.repeat
+
+  def __getattr__(self, name):
+    return getattr(self.chain, name)
+
+
+  class Test(unittest.TestCase):
+    '''Набор unit-тестов'''
+
+    def setUp(self):
+      self.parser = TimedParser()
+
+    def test_noTime(self):
+      self.parser.parse('REM 2010-12-10 +2 MSG Message')
+      self.assertEqual(self.parser.time(), None)
+      self.assertEqual(self.parser.advanceWarningValue(), 2)
+
+    def test_time(self):
+      self.parser.parse('REM 2010-12-10 +2 AT 17:05 +30 *10 UNTIL 2010-12-31 MSG Message')
+      self.assertEqual(self.parser.time(), datetime.time(17, 5))
+      self.assertEqual(self.parser.timeDelta(), 30)
+      self.assertEqual(self.parser.timeRepeat(), 10)
+      self.assertEqual(self.parser.advanceWarningValue(), 2)
+      self.assertEqual(self.parser.message(), 'Message')
+
+    def test_formatError(self):
+      self.assertRaises(FormatError, self.parser.parse, 'REM 10 AT 25:00 MSG Message')
+      self.assertRaises(FormatError, TimedParser().parse, 'REM 10 AT 10:00 *0 MSG Message')
@@ -0,0 +1,233 @@
+'''Содержит класс L{TimingWheel}'''
+
+import datetime
+import unittest
+
+
+# marks a cancelled timer
+_CANCELLED = object()
+
+
+class Timer:
+  '''Таймер, запланированный в L{TimingWheel}.  Возвращается методом
+  L{TimingWheel.schedule} и может быть передан в L{TimingWheel.cancel}.
+
+  @ivar tick: номер такта, на котором таймер срабатывает
+  @ivar item: объект, переданный в L{TimingWheel.schedule}
+  '''
+
+  __slots__ = ('tick', 'seq', 'item')
+
+  def __init__(self, tick, seq, item):
+    super(Timer, self).__init__()
+    self.tick = tick
+    self.seq = seq
+    self.item = item
+
+  def cancelled(self):
+    '''Проверить, был ли таймер отменён'''
+    return self.item is _CANCELLED
+
+
+class TimingWheel:
+  '''Иерархическое колесо таймеров (hierarchical timing wheel).
+
+  Время разбивается на такты заданной длины.  Колесо состоит из нескольких
+  уровней: на нижнем уровне каждая ячейка соответствует одному такту, на
+  каждом следующем - целому обороту предыдущего уровня (по умолчанию уровни -
+  минуты часа, часы суток и сутки).  Таймер помещается на самый нижний
+  уровень, оборот которого ещё не истёк к моменту срабатывания; когда нижний
+  уровень заканчивает оборот, ячейка следующего уровня раскладывается по
+  нижним уровням.  Таймеры, которые не помещаются на верхний уровень, хранятся
+  в отдельном списке и раскладываются заново, когда верхний уровень
+  заканчивает оборот.
+
+  Планирование и отмена таймера выполняются за постоянное время, а каждый
+  такт обходится в постоянное время плюс время на сработавшие и переложенные
+  таймеры, независимо от общего количества таймеров.  Таймеры, срабатывающие
+  на одном такте, возвращаются в порядке планирования.
+  '''
+
+  def __init__(self, start, tick=datetime.timedelta(minutes=1), sizes=(60, 24, 64)):
+    '''Конструктор
+
+    @param start: объект класса C{datetime.datetime}, время начала нулевого такта
+    @param tick: объект класса C{datetime.timedelta}, длина такта
+    @param sizes: количество ячеек на каждом уровне, начиная с нижнего
+    @raise ValueError: длина такта не положительна или список уровней пуст
+    '''
+    if tick <= datetime.timedelta(0):
+      raise ValueError('Tick must be positive')
+    if not sizes:
+      raise ValueError('At least one level is required')
+    super(TimingWheel, self).__init__()
+    self.start = start
+    self.tick = tick
+    self.sizes = tuple(sizes)
+    # number of ticks covered by one slot of each level (and by the whole wheel)
+    self.spans = [1]
+    for size in self.sizes:
+      self.spans.append(self.spans[-1] * size)
+    self.wheels = [[[] for _ in range(size)] for size in self.sizes]
+    self.overflow = []
+    self.now = 0
+    self.__seq = 0
+    self.__count = 0
+
+  def __len__(self):
+    '''Количество запланированных и ещё не сработавших таймеров'''
+    return self.__count
+
+  def tickOf(self, when):
+    '''Получить номер первого такта, начинающегося не раньше заданного времени
+
+    @param when: объект класса C{datetime.datetime}
+    @returns: целое число
+    '''
+    return -((self.start - when) // self.tick)
+
+  def timeOf(self, tick):
+    '''Получить время начала такта
+
+    @param tick: номер такта
+    @returns: объект класса C{datetime.datetime}
+    '''
+    return self.start + self.tick * tick
+
+  def schedule(self, when, item):
+    '''Запланировать таймер.  Таймер срабатывает на первом такте, который
+    начинается не раньше C{when}; если это время уже прошло - на ближайшем
+    необработанном такте.
+
+    @param when: объект класса C{datetime.datetime}
+    @param item: произвольный объект, возвращаемый при срабатывании
+    @returns: объект класса L{Timer}
+    '''
+    timer = Timer(self.tickOf(when), self.__seq, item)
+    self.__seq += 1
+    self.__count += 1
+    self.__place(timer)
+    return timer
+
+  def cancel(self, timer):
+    '''Отменить таймер.  Таймер остаётся в своей ячейке и отбрасывается, когда
+    до неё доходит очередь.
+
+    @param timer: объект класса L{Timer}, возвращённый методом L{schedule}
+    '''
+    if not timer.cancelled():
+      timer.item = _CANCELLED
+      self.__count -= 1
+
+  def advance(self, when):
+    '''Обработать все такты, начавшиеся не позже заданного времени
+
+    @param when: объект класса C{datetime.datetime}
+    @returns: список кортежей (время начала такта, объект) для сработавших
+      таймеров в порядке срабатывания
+    '''
+    last = (when - self.start) // self.tick
+    fired = []
+    while self.now <= last:
+      self.__step(fired)
+    return fired
+
+  def __place(self, timer):
+    tick = max(timer.tick, self.now)
+    ahead = tick - self.now
+    for level, size in enumerate(self.sizes):
+      if ahead < self.spans[level + 1]:
+        self.wheels[level][tick // self.spans[level] % size].append(timer)
+        return
+    self.overflow.append(timer)
+
+  def __step(self, fired):
+    now = self.now
+    # at the end of a turn of a level, spread the next slot of the level above
+    level = 1
+    while level <= len(self.sizes) and now % self.spans[level] == 0:
+      if level < len(self.sizes):
+        slot = now // self.spans[level] % self.sizes[level]
+        timers, self.wheels[level][slot] = self.wheels[level][slot], []
+      else:
+        timers, self.overflow = self.overflow, []
+      for timer in timers:
+        if not timer.cancelled():
+          self.__place(timer)
+      level += 1
+
+    slot = now % self.sizes[0]
+    timers, self.wheels[0][slot] = self.wheels[0][slot], []
+    timers = [timer for timer in timers if not timer.cancelled()]
+    timers.sort(key=lambda timer: timer.seq)
+    if timers:
+      start = self.timeOf(now)
+      for timer in timers:
+        fired.append((start, timer.item))
+      self.__count -= len(timers)
+    self.now = now + 1
+
+
+  class Test(unittest.TestCase):
+    '''Набор unit-тестов'''
+
+    def setUp(self):
+      self.start = datetime.datetime(2010, 5, 12, 9, 30)
+      self.wheel = TimingWheel(self.start, sizes=(4, 3, 2))
+
+    def __at(self, minutes):
+      return self.start + datetime.timedelta(minutes=minutes)
+
+    def test_order(self):
+      for minutes in (30, 1, 5, 12, 1, 0):
+        self.wheel.schedule(self.__at(minutes), minutes)
+      self.assertEqual(len(self.wheel), 6)
+      self.assertEqual(self.wheel.advance(self.__at(11)), [
+        (self.__at(0), 0),
+        (self.__at(1), 1),
+        (self.__at(1), 1),
+        (self.__at(5), 5),
+      ])
+      self.assertEqual(self.wheel.advance(self.__at(40)), [
+        (self.__at(12), 12),
+        (self.__at(30), 30),
+      ])
+      self.assertEqual(len(self.wheel), 0)
+
+    def test_roundUp(self):
+      self.wheel.schedule(self.__at(2) + datetime.timedelta(seconds=1), 'a')
+      self.assertEqual(self.wheel.advance(self.__at(2)), [])
+      self.assertEqual(self.wheel.advance(self.__at(3)), [(self.__at(3), 'a')])
+
+    def test_cancel(self):
+      timer = self.wheel.schedule(self.__at(7), 'a')
+      self.wheel.schedule(self.__at(7), 'b')
+      self.wheel.cancel(timer)
+      self.assertEqual(len(self.wheel), 1)
+      self.assertEqual(self.wheel.advance(self.__at(7)), [(self.__at(7), 'b')])
+
+    def test_past(self):
+      self.wheel.advance(self.__at(5))
+      self.wheel.schedule(self.__at(2), 'a')
+      self.assertEqual(self.wheel.advance(self.__at(6)), [(self.__at(6), 'a')])
+
+    def test_random(self):
+      import random
+      rand = random.Random(1)
+      expected = []
+      now = 0
+      for _ in range(300):
+        minutes = now + 1 + rand.randrange(60)
+        self.wheel.schedule(self.__at(minutes), minutes)
+        expected.append(minutes)
+        if rand.random() < 0.3:
+          now += rand.randrange(10)
+          fired = [item for _, item in self.wheel.advance(self.__at(now))]
+          due = sorted(minutes for minutes in expected if minutes <= now)
+          expected = [minutes for minutes in expected if minutes > now]
+          self.assertEqual(sorted(fired), due)
+          self.assertEqual(fired, sorted(fired))
+
+
+if __name__ == '__main__':
+  unittest.main()
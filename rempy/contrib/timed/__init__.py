@@ -0,0 +1,6 @@
+'''Позволяет создавать напоминалки со временем суток и выполнять их в долго
+работающем процессе.
+
+@see: класс L{TimedReminder<contrib.timed.Reminder.TimedReminder>}
+@see: класс L{TimedScheduler<contrib.timed.Scheduler.TimedScheduler>}
+'''
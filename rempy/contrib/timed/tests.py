@@ -0,0 +1,31 @@
+'''При запуске из командной строки запускает все unit-тесты,
+объявленные в пакете C{rempy.contrib.timed}.  Создан просто для удобства.
+'''
+
+from .Reminder import TimedReminder
+from .Scheduler import TimedScheduler
+from .StringParser import TimedParser
+from .TimingWheel import TimingWheel
+
+import unittest
+
+
+def additional_tests():
+  '''Получить экземпляр класса C{unittest.TestSuite} со всеми тестами
+
+  @returns: экземпляр класса C{unittest.TestSuite}
+  '''
+  subsuites = []
+  loader = unittest.TestLoader()
+  testCases = [
+    TimingWheel.Test,
+    TimedParser.Test,
+    TimedReminder.Test,
+    TimedScheduler.Test,
+  ]
+  for testCase in testCases:
+    subsuites.append(loader.loadTestsFromTestCase(testCase))
+  return unittest.TestSuite(subsuites)
+
+if __name__ == '__main__':
+  unittest.TextTestRunner().run(additional_tests())
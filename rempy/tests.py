@@ -4,10 +4,22 @@
 Запуск: `PYTHONPATH=. python rempy/tests.py` в корне проекта.
 '''
 
+from rempy import Checkpoint
 from rempy import DateCondition
+from rempy import ColumnarStore
+from rempy import DateIndex
+from rempy import OccurrenceDatabase
+from rempy import OccurrenceMatrix
+from rempy import OmitCalendar
+from rempy import RemFile
+from rempy import Snapshot
+from rempy import Runner
 from rempy import StringParser
 from rempy.utils import dates as dateutils
+from rempy.utils import files as fileutils
 from rempy.contrib.deferrable import tests as contrib_deferrable_tests
+from rempy.contrib.ical import tests as contrib_ical_tests
+from rempy.contrib.timed import tests as contrib_timed_tests
 
 import unittest
 
@@ -19,19 +31,45 @@ def additional_tests():
   '''
   subsuites = [
     contrib_deferrable_tests.additional_tests(),
+    contrib_ical_tests.additional_tests(),
+    contrib_timed_tests.additional_tests(),
   ]
   loader = unittest.TestLoader()
   testCases = [
+    Checkpoint.Checkpoint.Test,
+    DateCondition.Reachability.Test,
     DateCondition.SimpleDateCondition.Test,
     DateCondition.RepeatDateCondition.Test,
     DateCondition.ShiftDateCondition.Test,
     DateCondition.SatisfyDateCondition.Test,
     DateCondition.CombinedDateCondition.Test,
+    DateCondition.NthWeekdayDateCondition.Test,
+    DateCondition.WeeklyDateCondition.Test,
+    DateCondition.MonthlyDateCondition.Test,
+    ColumnarStore.ColumnarStore.Test,
+    DateIndex.DateIndex.Test,
+    OmitCalendar.OmitCalendar.Test,
+    OccurrenceDatabase.DatabaseRunner.Test,
+    OccurrenceMatrix._Test_occurrenceMatrix,
+    RemFile.RemFileLoader.Test,
+    Snapshot.SnapshotRunner.Test,
+    Runner.Runner.Test,
+    Runner.AsyncRunner.Test,
+    Runner.PrintRunner.Test,
+    Runner._Test_runBatch,
     StringParser.DateConditionParser.Test,
     StringParser.ReminderParser.Test,
+    StringParser.ParseCache.Test,
+    dateutils._Test_countWeekdays,
     dateutils._Test_dayOfYear,
     dateutils._Test_isoweekno,
+    dateutils._Test_monthLength,
+    dateutils._Test_parseIsoDate,
+    dateutils._Test_periods,
+    dateutils._Test_UnsafeDate,
     dateutils._Test_weekno,
+    dateutils._Test_wrapDate,
+    fileutils._Test_atomicWrite,
   ]
   for testCase in testCases:
     subsuites.append(loader.loadTestsFromTestCase(testCase))
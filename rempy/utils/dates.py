@@ -1,6 +1,8 @@
 '''Функции и классы для работы с датами'''
 
+import collections
 import datetime
+import functools
 import re
 import time
 import unittest
@@ -24,6 +26,48 @@ class _Test_dayOfYear(unittest.TestCase):
     self.assertEqual(dayOfYear(datetime.date(2010, 12, 31)), 365)
 
 
+# Lengths of months in a common year
+_MONTH_LENGTHS = (31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31)
+
+def isLeapYear(year):
+  '''Проверить, является ли год високосным (по григорианскому календарю)
+
+  @param year: целочисленное значение, номер года
+  @returns: C{True}, если год високосный
+  '''
+  return year % 4 == 0 and (year % 100 != 0 or year % 400 == 0)
+
+def monthLength(year, month):
+  '''Получить количество дней в месяце.  Вычисляется по таблице, без
+  построения дат.
+
+  @param year: целочисленное значение, номер года
+  @param month: целочисленное значение, номер месяца (1-12)
+  @returns: количество дней в месяце
+  @raise ValueError: номер месяца вне диапазона 1-12
+  '''
+  if not 1 <= month <= 12:
+    raise ValueError('month must be in 1..12')
+  if month == 2 and isLeapYear(year):
+    return 29
+  return _MONTH_LENGTHS[month - 1]
+
+class _Test_monthLength(unittest.TestCase):
+  '''Набор unit-тестов для функции L{monthLength}'''
+
+  def test_basic(self):
+    self.assertEqual([monthLength(2010, month) for month in range(1, 13)],
+      [31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31])
+
+  def test_leapYears(self):
+    self.assertEqual(monthLength(2008, 2), 29)
+    self.assertEqual(monthLength(1900, 2), 28)
+    self.assertEqual(monthLength(2000, 2), 29)
+
+  def test_badMonth(self):
+    self.assertRaises(ValueError, monthLength, 2010, 13)
+
+
 def lastDayOfMonth(year, month):
   '''Получить последний день месяца
 
@@ -31,12 +75,7 @@ def lastDayOfMonth(year, month):
   @param month: целочисленное значение, номер месяца (1-12)
   @returns: объект класса C{datetime.date}
   '''
-  if month == 12:
-    year = year+1
-    month = 1
-  else:
-    month = month+1
-  return datetime.date(year, month, 1) - datetime.timedelta(days=1)
+  return datetime.date(year, month, monthLength(year, month))
 
 
 def isoweekno(date):
@@ -103,20 +142,17 @@ class _Test_weekno(unittest.TestCase):
     self.assertEqual(weekno(datetime.date(2008, 1, 7), 3), 2)
 
 
-class UnsafeDate:
-  '''Класс, который хранит год, месяц и день, но не проверяет, составляют ли
-  они существующую дату
+class UnsafeDate(collections.namedtuple('UnsafeDate', ('year', 'month', 'day'))):
+  '''Неизменяемый кортеж из года, месяца и дня, которые не обязательно
+  составляют существующую дату.  Объекты можно сравнивать (сначала по году,
+  затем по месяцу и дню) и использовать как ключи словарей.
 
   @ivar year: полный номер года
   @ivar month: месяц (1-12)
   @ivar day: день (1-31)
   '''
 
-  def __init__(self, year, month, day):
-    super(UnsafeDate, self).__init__()
-    self.year = year
-    self.month = month
-    self.day = day
+  __slots__ = ()
 
   @staticmethod
   def fromDate(date):
@@ -128,12 +164,28 @@ class UnsafeDate:
     '''
     return UnsafeDate(date.year, date.month, date.day)
 
-  def __cmp__(self, other):
-    if self.year < other.year: return -1
-    elif self.year > other.year: return 1
-    if self.month < other.month: return -1
-    elif self.month > other.month: return 1
-    return self.day - other.day
+  def exists(self):
+    '''Проверить, существует ли дата
+
+    @returns: C{True}, если день не выходит за пределы месяца
+    '''
+    return 1 <= self.day <= monthLength(self.year, self.month)
+
+class _Test_UnsafeDate(unittest.TestCase):
+  '''Набор unit-тестов для класса L{UnsafeDate}'''
+
+  def test_order(self):
+    self.assertLess(UnsafeDate(2010, 2, 31), UnsafeDate(2010, 3, 1))
+    self.assertGreater(UnsafeDate(2011, 1, 1), UnsafeDate(2010, 12, 31))
+    self.assertEqual(UnsafeDate.fromDate(datetime.date(2010, 2, 28)), UnsafeDate(2010, 2, 28))
+
+  def test_hash(self):
+    self.assertEqual(len({UnsafeDate(2010, 2, 31), UnsafeDate(2010, 2, 31)}), 1)
+
+  def test_exists(self):
+    self.assertTrue(UnsafeDate(2008, 2, 29).exists())
+    self.assertFalse(UnsafeDate(2010, 2, 29).exists())
+    self.assertFalse(UnsafeDate(2010, 4, 31).exists())
 
 
 class NonExistingDaysHandling:
@@ -148,6 +200,31 @@ class NonExistingDaysHandling:
   RAISE = 2
   '''Выбросить C{ValueError}'''
 
+def wrapDay(year, month, day, nonexistingDaysHandling=NonExistingDaysHandling.WRAP):
+  '''Получить номер существующего дня месяца, соответствующего заданному.
+  Несуществующие дни распознаются по таблице длин месяцев, без построения
+  дат и перехвата исключений.
+
+  @param year: целочисленное значение, номер года
+  @param month: целочисленное значение, номер месяца (1-12)
+  @param day: целочисленное значение, номер дня, возможно, несуществующего
+  @param nonexistingDaysHandling: элемент «перечисления»
+    L{NonExistingDaysHandling} (см. L{wrapDate})
+  @returns: номер дня или C{None} (в случае C{SKIP})
+  @raise ValueError: день не существует и задан способ обработки C{RAISE}
+  '''
+  length = monthLength(year, month)
+  if 1 <= day <= length:
+    return day
+  case = nonexistingDaysHandling
+  enum = NonExistingDaysHandling
+  if case == enum.WRAP:
+    return length
+  elif case == enum.SKIP:
+    return None
+  elif case == enum.RAISE:
+    raise ValueError('day is out of range for month')
+
 def wrapDate(unsafeDate, nonexistingDaysHandling=NonExistingDaysHandling.WRAP):
   '''Преобразовать объект класса L{UnsafeDate} в объект класса C{datetime.date}.
 
@@ -163,17 +240,11 @@ def wrapDate(unsafeDate, nonexistingDaysHandling=NonExistingDaysHandling.WRAP):
   @returns: объект класса C{datetime.date} или, если C{unsafeDate} содержит
     несуществующую дату, в завимости от значения C{nonexistingDaysHandling}
   '''
-  try:
-    return datetime.date(unsafeDate.year, unsafeDate.month, unsafeDate.day)
-  except ValueError:
-    case = nonexistingDaysHandling
-    enum = NonExistingDaysHandling
-    if case == enum.WRAP:
-      return lastDayOfMonth(unsafeDate.year, unsafeDate.month)
-    elif case == enum.SKIP:
-      return None
-    elif case == enum.RAISE:
-      raise
+  year, month, day = unsafeDate
+  day = wrapDay(year, month, day, nonexistingDaysHandling)
+  if day is None:
+    return None
+  return datetime.date(year, month, day)
 
 # returns tuple (date, skip)
 def wrapDate_noFail(unsafeDate, nonexistingDaysHandling):
@@ -190,18 +261,171 @@ def wrapDate_noFail(unsafeDate, nonexistingDaysHandling):
     - объект класса C{datetime.date}
     - логическое значение, равное C{True}, если эту дату следует «пропусить»
   '''
-  date = wrapDate(unsafeDate, nonexistingDaysHandling=NonExistingDaysHandling.WRAP)
-  if date is None:
-    return (lastDayOfMonth(unsafeDate.year, unsafeDate.month), True)
-  else:
-    return (date, False)
+  year, month, day = unsafeDate
+  length = monthLength(year, month)
+  if 1 <= day <= length:
+    return (datetime.date(year, month, day), False)
+  return (datetime.date(year, month, length),
+    nonexistingDaysHandling == NonExistingDaysHandling.SKIP)
 
+class _Test_wrapDate(unittest.TestCase):
+  '''Набор unit-тестов для функций L{wrapDate} и L{wrapDate_noFail}'''
 
+  def test_existing(self):
+    self.assertEqual(wrapDate(UnsafeDate(2010, 2, 28)), datetime.date(2010, 2, 28))
+
+  def test_wrap(self):
+    self.assertEqual(wrapDate(UnsafeDate(2010, 2, 31)), datetime.date(2010, 2, 28))
+    self.assertEqual(wrapDate(UnsafeDate(2008, 2, 31)), datetime.date(2008, 2, 29))
+
+  def test_skip(self):
+    self.assertEqual(wrapDate(UnsafeDate(2010, 4, 31), NonExistingDaysHandling.SKIP), None)
+    self.assertEqual(wrapDate_noFail(UnsafeDate(2010, 4, 31), NonExistingDaysHandling.SKIP),
+      (datetime.date(2010, 4, 30), True))
+
+  def test_raise(self):
+    self.assertRaises(ValueError, wrapDate, UnsafeDate(2010, 4, 31),
+      NonExistingDaysHandling.RAISE)
+
+
+def countWeekdays(fromDate, toDate, weekdays=None):
+  '''Подсчитать количество дат в диапазоне, приходящихся на заданные дни недели
+
+  @param fromDate: объект класса C{datetime.date}, начальная дата диапазона
+  @param toDate: объект класса C{datetime.date}, конечная дата диапазона (включительно)
+  @param weekdays: коллекция дней недели (0 - понедельник, 6 - воскресенье)
+    или C{None}, если подходит любой день недели
+  @returns: количество дат как целое число
+  '''
+  days = (toDate - fromDate).days + 1
+  if days <= 0:
+    return 0
+  if weekdays is None:
+    return days
+  weeks, remainder = divmod(days, 7)
+  start = fromDate.weekday()
+  ret = 0
+  for weekday in set(weekdays):
+    ret += weeks
+    if (weekday - start) % 7 < remainder:
+      ret += 1
+  return ret
+
+class _Test_countWeekdays(unittest.TestCase):
+  '''Набор unit-тестов для функции L{countWeekdays}'''
+
+  def test_basic(self):
+    # 2010-01-01 is Friday
+    self.assertEqual(countWeekdays(datetime.date(2010, 1, 1), datetime.date(2010, 1, 31), [4, 6]), 10)
+    self.assertEqual(countWeekdays(datetime.date(2010, 1, 2), datetime.date(2010, 1, 7), [0]), 1)
+    self.assertEqual(countWeekdays(datetime.date(2010, 1, 2), datetime.date(2010, 1, 1)), 0)
+
+
+class Period:
+  '''Длины периодов, по которым группируются даты'''
+
+  DAY = 0
+  '''День'''
+
+  WEEK = 1
+  '''Неделя (с понедельника по воскресенье)'''
+
+  MONTH = 2
+  '''Календарный месяц'''
+
+  YEAR = 3
+  '''Календарный год'''
+
+def periodStart(date, period):
+  '''Получить начальную дату периода, которому принадлежит дата
+
+  @param date: объект класса C{datetime.date}
+  @param period: элемент «перечисления» L{Period}
+  @returns: объект класса C{datetime.date}
+  '''
+  if period == Period.DAY:
+    return date
+  elif period == Period.WEEK:
+    return date - datetime.timedelta(days=date.weekday())
+  elif period == Period.MONTH:
+    return date.replace(day=1)
+  elif period == Period.YEAR:
+    return date.replace(month=1, day=1)
+  raise ValueError('Unknown period: %s' % period)
+
+def periods(fromDate, toDate, period):
+  '''Разбить диапазон дат на периоды
+
+  @param fromDate: объект класса C{datetime.date}, начальная дата диапазона
+  @param toDate: объект класса C{datetime.date}, конечная дата диапазона (включительно)
+  @param period: элемент «перечисления» L{Period}
+  @returns: Iterable по кортежам (начальная дата периода, первая дата
+    периода в диапазоне, последняя дата периода в диапазоне)
+  '''
+  start = periodStart(fromDate, period)
+  while start <= toDate:
+    if period == Period.DAY:
+      end = start
+    elif period == Period.WEEK:
+      end = start + datetime.timedelta(days=6)
+    elif period == Period.MONTH:
+      end = lastDayOfMonth(start.year, start.month)
+    else:
+      end = datetime.date(start.year, 12, 31)
+    yield (start, max(start, fromDate), min(end, toDate))
+    if end >= toDate:
+      return
+    start = end + datetime.timedelta(days=1)
+
+class _Test_periods(unittest.TestCase):
+  '''Набор unit-тестов для функции L{periods}'''
+
+  def test_month(self):
+    self.assertEqual(list(periods(datetime.date(2010, 1, 10), datetime.date(2010, 2, 3), Period.MONTH)), [
+      (datetime.date(2010, 1, 1), datetime.date(2010, 1, 10), datetime.date(2010, 1, 31)),
+      (datetime.date(2010, 2, 1), datetime.date(2010, 2, 1), datetime.date(2010, 2, 3)),
+    ])
+
+  def test_week(self):
+    dates = [start for start, _, _ in periods(datetime.date(2010, 1, 1), datetime.date(2010, 1, 11), Period.WEEK)]
+    self.assertEqual(dates, [datetime.date(2009, 12, 28), datetime.date(2010, 1, 4), datetime.date(2010, 1, 11)])
+
+
+_ISO_DATE = re.compile('[0-9]{4}-[0-9]{2}-[0-9]{2}')
+
+@functools.lru_cache(maxsize=4096)
 def parseIsoDate(string):
-  '''Разобрать строку даты в формате ISO
+  '''Разобрать строку даты в формате ISO.
+
+  Строки канонического вида разбираются функцией
+  C{datetime.date.fromisoformat}; остальные строки, а также строки, которые
+  она не приняла, разбираются функцией C{time.strptime}, так что множество
+  допустимых строк и сообщения об ошибках остаются такими же, как при разборе
+  только функцией C{time.strptime}.  Результаты разбора кэшируются.
 
   @param string: строка вида YYYY-mm-dd
   @returns: объект класса C{datetime.date}
   @raise C{ValueError}: строка имеет неправильный формат
   '''
+  if _ISO_DATE.fullmatch(string):
+    try:
+      return datetime.date.fromisoformat(string)
+    except ValueError:
+      pass
   return datetime.date(*(time.strptime(string, '%Y-%m-%d')[:3]))
+
+class _Test_parseIsoDate(unittest.TestCase):
+  '''Набор unit-тестов для функции L{parseIsoDate}'''
+
+  def test_basic(self):
+    self.assertEqual(parseIsoDate('2010-03-05'), datetime.date(2010, 3, 5))
+    self.assertEqual(parseIsoDate('2010-3-5'), datetime.date(2010, 3, 5))
+
+  def test_errors(self):
+    for string in ('2010-02-31', '0000-01-01', '2010-03-05x', ' 2010-03-05', '20100305',
+        '2010-W10-1', '2010-03-0\u0665'):
+      with self.assertRaises(ValueError) as fast:
+        parseIsoDate(string)
+      with self.assertRaises(ValueError) as slow:
+        datetime.date(*(time.strptime(string, '%Y-%m-%d')[:3]))
+      self.assertEqual(str(fast.exception), str(slow.exception))
@@ -0,0 +1,76 @@
+'''Функции для работы с файлами'''
+
+import contextlib
+import os
+import secrets
+import tempfile
+import unittest
+
+
+@contextlib.contextmanager
+def atomicWrite(filename, mode='wb', encoding=None):
+  '''Контекстный менеджер для атомарной записи файла.  Данные пишутся во
+  временный файл в том же каталоге, который при успешном выходе из блока
+  сбрасывается на диск и переименовывается в C{filename}, так что читатели
+  видят либо старое, либо новое содержимое целиком.  При исключении
+  временный файл удаляется, а C{filename} не изменяется.
+
+  Временный файл создаётся с правами C{0o666}, к которым ядро применяет umask,
+  поэтому права доступа к файлу такие же, какие получил бы файл, созданный
+  функцией C{open}, а не только для владельца, как у файлов C{tempfile}.
+
+  @param filename: имя файла
+  @param mode: режим открытия: C{'wb'} или C{'w'}
+  @param encoding: кодировка для режима C{'w'}
+  @returns: объект файла, открытый на запись
+  '''
+  dirname = os.path.dirname(os.path.abspath(filename))
+  tmpname = os.path.join(dirname, '.%s-%s' % (os.path.basename(filename), secrets.token_hex(8)))
+  fd = os.open(tmpname, os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, 'O_BINARY', 0), 0o666)
+  try:
+    with os.fdopen(fd, mode, encoding=encoding) as f:
+      yield f
+      f.flush()
+      os.fsync(f.fileno())
+    os.replace(tmpname, filename)
+  except BaseException:
+    os.unlink(tmpname)
+    raise
+  # make the rename itself durable where directories can be synced
+  if hasattr(os, 'O_DIRECTORY'):
+    dirfd = os.open(dirname, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+      os.fsync(dirfd)
+    finally:
+      os.close(dirfd)
+
+class _Test_atomicWrite(unittest.TestCase):
+  '''Набор unit-тестов для функции L{atomicWrite}'''
+
+  def setUp(self):
+    self.dir = tempfile.TemporaryDirectory()
+    self.filename = os.path.join(self.dir.name, 'file')
+
+  def tearDown(self):
+    self.dir.cleanup()
+
+  def test_write(self):
+    with atomicWrite(self.filename, 'w', encoding='utf-8') as f:
+      f.write('Привет')
+    with open(self.filename, encoding='utf-8') as f:
+      self.assertEqual(f.read(), 'Привет')
+    self.assertEqual(os.listdir(self.dir.name), ['file'])
+    plain = os.path.join(self.dir.name, 'plain')
+    open(plain, 'w').close()
+    self.assertEqual(os.stat(self.filename).st_mode & 0o777, os.stat(plain).st_mode & 0o777)
+
+  def test_error(self):
+    with atomicWrite(self.filename) as f:
+      f.write(b'old')
+    with self.assertRaises(ValueError):
+      with atomicWrite(self.filename) as f:
+        f.write(b'new')
+        raise ValueError()
+    with open(self.filename, 'rb') as f:
+      self.assertEqual(f.read(), b'old')
+    self.assertEqual(os.listdir(self.dir.name), ['file'])